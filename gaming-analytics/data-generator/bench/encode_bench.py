@@ -0,0 +1,48 @@
+import json
+import random
+from datetime import datetime
+from typing import Any, Dict, List
+
+from harness import DATA_GENERATOR, load_module, result, time_per_call
+
+
+def _per_event(suite_name: str, fn, **params) -> Dict[str, Any]:
+    return result("encode", suite_name, {"encode_ns": time_per_call(fn) * 1e9}, **params)
+
+
+def run() -> List[Dict[str, Any]]:
+    client = load_module("fluvio_client", DATA_GENERATOR / "fluvio-client" / "main.py")
+    from encoders import TimestampCache
+
+    random.seed(0)
+    results = []
+    for event_type in ("player_event", "purchase_event", "server_metric"):
+        generate = getattr(client, f"generate_{event_type}")
+        encode = getattr(client, f"encode_{event_type}")
+        results.append(_per_event(f"{event_type}/json", lambda: client.encode_record(generate()),
+                                  event_type=event_type, encoder="dict + json.dumps"))
+        results.append(_per_event(f"{event_type}/template", encode,
+                                  event_type=event_type, encoder="encoders template"))
+
+    # Encoders and validators compiled from the dataflow's types, on the same generated events
+    from schema import load_schema
+    schema = load_schema()
+    for event_type, topic in (("player_event", "player-events"), ("purchase_event", "purchase-events")):
+        event = getattr(client, f"generate_{event_type}")()["event"]
+        encode = schema.encoder(schema.type_of(topic))
+        validate = schema.validator(schema.type_of(topic))
+        results.append(_per_event(f"{event_type}/schema", lambda: encode(event),
+                                  event_type=event_type, encoder="dataflow schema"))
+        results.append(_per_event(f"{event_type}/validate", lambda: validate(event),
+                                  event_type=event_type, encoder="dataflow schema validator"))
+
+    timestamps = TimestampCache()
+    results.append(_per_event("timestamp/isoformat", lambda: datetime.utcnow().isoformat().encode("ascii")))
+    results.append(_per_event("timestamp/cache", timestamps.now))
+
+    simulator_event = {
+        "event_type": "player_progression", "player_id": "player_42", "map": "Forest",
+        "current_level": 3, "success": True, "difficulty": 0.55, "timestamp": 17, "new_level": 4,
+    }
+    results.append(_per_event("simulator_event/json", lambda: json.dumps(simulator_event).encode("utf-8")))
+    return results
@@ -0,0 +1,127 @@
+import importlib.util
+import os
+import resource
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+DATA_GENERATOR = Path(__file__).resolve().parent.parent
+
+# Shared generator modules live in data-generator/common
+sys.path.insert(0, str(DATA_GENERATOR / "common"))
+
+# Metric name suffixes that are better when smaller, unless they are a rate
+LOWER_IS_BETTER = ("_s", "_ms", "_us", "_ns", "_bytes")
+RATE = "_per_s"
+
+
+def load_module(name: str, path: Path):
+    """
+    Import a data generator script under its own module name.
+
+    The apps are all called main.py, so each is loaded under name instead. Its
+    directory is put on sys.path for its own imports.
+    """
+    if str(path.parent) not in sys.path:
+        sys.path.insert(0, str(path.parent))
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def result(suite: str, name: str, metrics: Dict[str, float], **params) -> Dict[str, Any]:
+    return {"suite": suite, "name": f"{suite}/{name}", "params": params, "metrics": metrics}
+
+
+def rss_bytes() -> int:
+    """
+    Current resident set size of this process.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # ru_maxrss is the peak, in kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def time_per_call(fn: Callable[[], Any], min_time: float = 0.1, repeat: int = 5) -> float:
+    """
+    Seconds per call of fn: the best of repeat runs of at least min_time each,
+    since noise from other processes only ever makes a run slower.
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed == 0 else max(2, int(min_time / elapsed) + 1)
+
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """
+    Compare every metric with the same benchmark and metric in baseline.
+
+    Returns one row per metric found in both, with the relative change (positive
+    is an improvement) and whether it is worse than threshold.
+    """
+    previous = {entry["name"]: entry["metrics"] for entry in baseline.get("results", [])}
+    rows = []
+    for entry in results:
+        old_metrics = previous.get(entry["name"])
+        if old_metrics is None:
+            continue
+        for metric, value in entry["metrics"].items():
+            old = old_metrics.get(metric)
+            if not old:
+                continue
+            change = (value - old) / old
+            if metric.endswith(LOWER_IS_BETTER) and not metric.endswith(RATE):
+                change = -change
+            rows.append({
+                "name": entry["name"],
+                "metric": metric,
+                "baseline": old,
+                "value": value,
+                "change": change,
+                "regression": change < -threshold,
+            })
+    return rows
+
+
+def environment() -> Dict[str, Any]:
+    return {
+        "python": sys.version.split()[0],
+        "platform": sys.platform,
+        "cpus": os.cpu_count(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def format_metrics(metrics: Dict[str, float]) -> str:
+    return ", ".join(f"{metric}={value:,.6g}" for metric, value in metrics.items())
+
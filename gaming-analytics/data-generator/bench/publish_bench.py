@@ -0,0 +1,79 @@
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import standin
+from harness import DATA_GENERATOR, load_module, result
+
+
+def _publish(records: int, flush_latency: float, publish) -> Dict[str, float]:
+    sink = standin.LimitedSink(records, latency=flush_latency)
+    start = time.perf_counter()
+    # Quiet the publishers' progress reports, and the error the single-event loop logs when it stops
+    logging.disable(logging.ERROR)
+    try:
+        publish(sink)
+    except standin.BenchmarkDone:
+        pass
+    finally:
+        logging.disable(logging.NOTSET)
+    elapsed = time.perf_counter() - start
+    return {
+        "records_per_s": sink.records_sent() / elapsed,
+        "mb_per_s": sink.bytes_sent() / elapsed / 1e6,
+    }
+
+
+def run(records: int = 200_000, flush_latency: float = 0.0) -> List[Dict[str, Any]]:
+    client = load_module("fluvio_client", DATA_GENERATOR / "fluvio-client" / "main.py")
+    from corpus import open_replay, write_corpus
+    from pacing import ConstantRate, Pacer
+
+    params = {"flush_latency": flush_latency}
+
+    # Single mode sends three records, one per topic, for each paced event
+    single = _publish(records // 10, flush_latency,
+                      lambda sink: client.publish_events(Pacer(ConstantRate(1_000_000)), sink))
+    results = [result("publish", "single", single, records=records // 10, **params)]
+
+    batched = _publish(records, flush_latency,
+                       lambda sink: client.publish_events_batched(sink, batch_size=1000, report_interval=3600))
+    results.append(result("publish", "batched", batched, records=records, **params))
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.corpus")
+        write_corpus(path, client.corpus_records(records), source="benchmark")
+        for rewrite in (False, True):
+            replay = open_replay(path, rewrite_timestamps=rewrite)
+            replayed = _publish(records, flush_latency, lambda sink: client.publish_events_batched(
+                sink,
+                batch_size=1000,
+                report_interval=3600,
+                make_batch=lambda count: client.replay_batch(replay, count),
+                topics=replay.corpus.topics,
+            ))
+            name = "replay/rewrite_timestamps" if rewrite else "replay"
+            results.append(result("publish", name, replayed, records=records, **params))
+
+    # The simulator's events through the staged pipeline, encoded by threads and by processes
+    from event_stream import PLAYER_TOPIC, SERVER_TOPIC, create_simulator, encode_topic_records, topic_chunks
+    from pipeline import StagedPipeline
+
+    for executor in ("thread", "process"):
+        simulator = create_simulator(players=100_000, seed=0)
+        pipeline = StagedPipeline(topic_chunks(simulator), encode_topic_records, executor=executor, name="bench")
+        simulated = _publish(records, flush_latency, lambda sink: client.publish_events_batched(
+            sink,
+            batch_size=1000,
+            report_interval=3600,
+            make_batch=lambda count: client.pipeline_batch(pipeline, count),
+            topics=[PLAYER_TOPIC, SERVER_TOPIC],
+        ))
+        stats = pipeline.stats()
+        pipeline.close()
+        simulator.close()
+        simulated["source_blocked_s"] = stats["source_blocked_s"]
+        results.append(result("publish", f"simulator/{executor}", simulated, records=records, **params))
+    return results
@@ -0,0 +1,83 @@
+import argparse
+import json
+import logging
+import os
+import sys
+
+from harness import compare, environment, format_metrics
+
+SUITES = ("simulator", "encode", "stream", "publish", "windows")
+
+
+def run_suite(suite: str, args):
+    if suite == "simulator":
+        import sim_bench
+        return sim_bench.run(args.players)
+    if suite == "encode":
+        import encode_bench
+        return encode_bench.run()
+    if suite == "stream":
+        import stream_bench
+        return stream_bench.run(args.clients, rate=args.stream_rate, duration=args.duration)
+    if suite == "publish":
+        import publish_bench
+        return publish_bench.run(records=args.records, flush_latency=args.flush_latency_ms / 1000)
+    import windows_bench
+    return windows_bench.run(events=args.records)
+
+
+def int_list(value: str):
+    return [int(item) for item in value.split(",")]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=os.environ.get('PY_LOG', 'WARNING').upper()
+    )
+
+    parser = argparse.ArgumentParser(description="Benchmark the data generators offline")
+    parser.add_argument("--suite", default=",".join(SUITES),
+                        help=f"comma separated suites to run, from {', '.join(SUITES)}")
+    parser.add_argument("--full", action="store_true", help="include the largest sizes (1M players, 500 clients)")
+    parser.add_argument("--players", type=int_list, default=None, help="simulator player counts, e.g. 1000,10000")
+    parser.add_argument("--clients", type=int_list, default=None, help="concurrent stream clients, e.g. 1,10,100")
+    parser.add_argument("--stream-rate", default="50000", help="offered /stream_events rate or profile")
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds per stream benchmark")
+    parser.add_argument("--records", type=int, default=200_000, help="records per publisher benchmark")
+    parser.add_argument("--flush-latency-ms", type=float, default=0.0, help="stand-in producer flush latency")
+    parser.add_argument("--out", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against results from an earlier --out")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="relative change flagged as a regression, e.g. 0.15 for 15%%")
+    args = parser.parse_args()
+
+    if args.players is None:
+        args.players = [1_000, 10_000, 100_000, 1_000_000] if args.full else [1_000, 10_000, 100_000]
+    if args.clients is None:
+        args.clients = [1, 10, 100, 500] if args.full else [1, 10, 100]
+
+    results = []
+    for suite in args.suite.split(","):
+        if suite not in SUITES:
+            parser.error(f"unknown suite {suite!r}")
+        for entry in run_suite(suite, args):
+            print(f"{entry['name']}: {format_metrics(entry['metrics'])}", flush=True)
+            results.append(entry)
+
+    report = dict(environment(), results=results)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare(results, baseline, args.threshold)
+        regressions = [row for row in rows if row["regression"]]
+        for row in rows:
+            flag = "REGRESSION" if row["regression"] else ""
+            print(f"{row['name']} {row['metric']}: {row['baseline']:,.6g} -> {row['value']:,.6g} "
+                  f"({row['change']:+.1%}) {flag}".rstrip())
+        print(f"{len(regressions)} regressions in {len(rows)} compared metrics")
+        if regressions:
+            sys.exit(1)
@@ -0,0 +1,67 @@
+import copy
+import importlib.util
+import multiprocessing
+import time
+from typing import Any, Dict, List, Sequence
+
+from harness import DATA_GENERATOR, load_module, result, rss_bytes
+
+GS_FUNNEL = DATA_GENERATOR / "gs-funnel" / "main.py"
+
+
+def _measure(conn, backend: str, players: int, min_events: int, max_seconds: float):
+    """
+    Build one simulator and time its steps, in a fresh process so memory is its own.
+    """
+    simulator_module = load_module("gs_funnel", GS_FUNNEL)
+    config = copy.deepcopy(simulator_module.EXAMPLE_SIM_CONFIG)
+    config["backend"] = backend
+    config["player_init"]["num_players"] = players
+    config["event_log"] = {"policy": "disabled"}
+    # Twice the slots the population needs, or draws would keep finding every server full
+    config["servers"] = [
+        {"server_id": f"server_{i + 1}", "initial_state": "ONLINE", "max_players": 100}
+        for i in range(max(1, players // 50))
+    ]
+
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    simulator = simulator_module.GameEventSimulator(config, seed=0)
+    init_s = time.perf_counter() - start
+    population_bytes = rss_bytes() - rss_before
+
+    events = steps = 0
+    start = time.perf_counter()
+    while steps == 0 or (events < min_events and time.perf_counter() - start < max_seconds):
+        events += len(simulator.run_step())
+        steps += 1
+    elapsed = time.perf_counter() - start
+    simulator.close()
+    conn.send({
+        "init_s": init_s,
+        "events_per_s": events / elapsed,
+        "step_ms": elapsed / steps * 1000,
+        "per_player_bytes": population_bytes / players,
+        "rss_bytes": rss_bytes(),
+    })
+    conn.close()
+
+
+def run(player_counts: Sequence[int], min_events: int = 200_000, max_seconds: float = 10.0) -> List[Dict[str, Any]]:
+    backends = ["python"]
+    if importlib.util.find_spec("numpy") is not None:
+        backends.append("numpy")
+
+    context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+    results = []
+    for backend in backends:
+        for players in player_counts:
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(target=_measure, args=(child_conn, backend, players, min_events, max_seconds))
+            process.start()
+            child_conn.close()
+            metrics = parent_conn.recv()
+            process.join()
+            results.append(result("simulator", f"{backend}/players={players}", metrics,
+                                  backend=backend, players=players))
+    return results
@@ -0,0 +1,37 @@
+from sinks import MemorySink
+
+
+class BenchmarkDone(Exception):
+    """
+    Raised by the stand-in sink once it has taken the records a run asked for.
+    """
+
+
+class LimitedSink(MemorySink):
+    """
+    In-memory stand-in sink that raises BenchmarkDone after limit records, so a
+    publisher's endless loop can be benchmarked for a fixed amount of work.
+    """
+
+    def __init__(self, limit: int, latency: float = 0.0):
+        super().__init__(latency=latency)
+        self.limit = limit
+
+    def topic_producer(self, topic, batch_size=None, linger_ms=None):
+        producer = super().topic_producer(topic, batch_size, linger_ms)
+        send_all = producer.send_all
+
+        def limited_send_all(records):
+            outputs = send_all(records)
+            if self.records_sent() >= self.limit:
+                raise BenchmarkDone()
+            return outputs
+
+        producer.send_all = limited_send_all
+        return producer
+
+    def records_sent(self) -> int:
+        return sum(counts["records"] for counts in self.counts.values())
+
+    def bytes_sent(self) -> int:
+        return sum(counts["bytes"] for counts in self.counts.values())
@@ -0,0 +1,117 @@
+import asyncio
+import time
+import zlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+from harness import DATA_GENERATOR, load_module, percentile, result
+
+TIMESTAMP_FIELD = b'"event_timestamp": "'
+
+
+class StreamClient:
+    """
+    In-process ASGI client that reads a streaming response chunk by chunk.
+
+    Test clients that go through a transport buffer the whole body before
+    returning, which never happens for an endless stream, so the app is called
+    directly and each body message is handled as it is sent.
+    """
+
+    def __init__(self, encoding: Optional[str] = None):
+        self.encoding = encoding
+        self.events = 0
+        self.bytes = 0
+        self.wire_bytes = 0
+        self.latencies: List[float] = []
+        # gzip streams are decoded to count their events; other codings aren't benchmarked
+        self.decompressor = zlib.decompressobj(31) if encoding == "gzip" else None
+
+    def on_chunk(self, chunk: bytes):
+        self.wire_bytes += len(chunk)
+        if self.decompressor is not None:
+            chunk = self.decompressor.decompress(chunk)
+        self.events += chunk.count(b"\n\n")
+        self.bytes += len(chunk)
+        # Time from the first event of the chunk being generated to receiving it
+        field = chunk.find(TIMESTAMP_FIELD)
+        if field >= 0:
+            start = field + len(TIMESTAMP_FIELD)
+            generated = datetime.fromisoformat(chunk[start:chunk.index(b'"', start)].decode("ascii"))
+            self.latencies.append((datetime.utcnow() - generated).total_seconds())
+
+    async def get(self, app, path: str, duration: float):
+        disconnected = asyncio.Event()
+        requested = False
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.body" and message.get("body"):
+                self.on_chunk(bytes(message["body"]))
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0", "spec_version": "2.3"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode("ascii"),
+            "root_path": "",
+            "query_string": b"",
+            "headers": [(b"accept-encoding", self.encoding.encode("ascii"))] if self.encoding else [],
+            "client": ("127.0.0.1", 50000),
+            "server": ("127.0.0.1", 8000),
+        }
+        asyncio.get_running_loop().call_later(duration, disconnected.set)
+        await app(scope, receive, send)
+
+
+async def _run_clients(web_api, num_clients: int, duration: float, encoding: Optional[str] = None) -> Dict[str, float]:
+    clients = [StreamClient(encoding) for _ in range(num_clients)]
+    cpu_start, start = time.process_time(), time.perf_counter()
+    await asyncio.gather(*[client.get(web_api.app, "/stream_events", duration) for client in clients])
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+
+    delivered = sum(client.events for client in clients)
+    latencies = [latency for client in clients for latency in client.latencies]
+    return {
+        "delivered_events_per_s": delivered / elapsed,
+        "client_events_per_s": delivered / num_clients / elapsed,
+        "generated_events_per_s": web_api.broadcaster.events / elapsed,
+        "delivered_event_cpu_us": cpu / max(delivered, 1) * 1e6,
+        "latency_p50_ms": percentile(latencies, 0.5) * 1000,
+        "latency_p99_ms": percentile(latencies, 0.99) * 1000,
+        "event_wire_bytes": sum(client.wire_bytes for client in clients) / max(delivered, 1),
+    }
+
+
+def run(client_counts: Sequence[int], rate: str = "50000", duration: float = 3.0) -> List[Dict[str, Any]]:
+    web_api = load_module("web_api", DATA_GENERATOR / "web-api" / "main.py")
+    from broadcast import Broadcaster
+    from pacing import parse_profile
+
+    results = []
+    # Every client count uncompressed, then one gzip client for the bytes on the wire
+    for num_clients, encoding in [(num_clients, None) for num_clients in client_counts] + [(1, "gzip")]:
+        web_api.STREAM_DURATION = duration
+        web_api.broadcaster = Broadcaster(
+            web_api.encode_chunk,
+            parse_profile(rate),
+            queue_size=web_api.STREAM_QUEUE_CHUNKS,
+            slow_client_policy=web_api.SLOW_CLIENT_POLICY,
+            flush_interval=web_api.STREAM_FLUSH_MS / 1000,
+        )
+        metrics = asyncio.run(_run_clients(web_api, num_clients, duration, encoding))
+        name = f"clients={num_clients}" + (f"/{encoding}" if encoding else "")
+        results.append(result("stream", name, metrics,
+                              clients=num_clients, rate=rate, duration=duration, encoding=encoding or "identity"))
+    return results
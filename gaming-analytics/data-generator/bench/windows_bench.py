@@ -0,0 +1,55 @@
+import time
+from typing import Any, Dict, List
+
+from harness import DATA_GENERATOR, load_module, result
+
+# Event time advanced per generated event, so windows keep closing as they would live
+EVENT_SPACING_NS = 50_000
+
+
+def _events(client, encode, count: int, clock_ns: int):
+    """
+    count encoded event values, with event_timestamp following a simulated clock,
+    and the same times in epoch milliseconds as record timestamps.
+    """
+    times = [(clock_ns + i * EVENT_SPACING_NS) // 1_000_000 for i in range(count)]
+    clock = iter(range(clock_ns, clock_ns + count * EVENT_SPACING_NS, EVENT_SPACING_NS))
+    client.timestamps.clock = clock.__next__
+    try:
+        values = [encode()[1] for _ in range(count)]
+    finally:
+        client.timestamps.clock = time.time_ns
+    return values, times
+
+
+def _events_per_s(service, values, times, batch_size: int, record_times: bool, repeat: int = 3) -> float:
+    from windows import TumblingWindows
+
+    best = float("inf")
+    for _ in range(repeat):
+        windows = TumblingWindows(service)
+        start = time.perf_counter()
+        for i in range(0, len(values), batch_size):
+            windows.process(values[i:i + batch_size], times[i:i + batch_size] if record_times else None)
+        windows.finish()
+        best = min(best, time.perf_counter() - start)
+    return len(values) / best
+
+
+def run(events: int = 200_000, batch_size: int = 1000) -> List[Dict[str, Any]]:
+    client = load_module("fluvio_client", DATA_GENERATOR / "fluvio-client" / "main.py")
+    from windows import PLAYER_SESSION_ANALYTICS, PURCHASE_ANALYTICS
+
+    clock_ns = time.time_ns()
+    inputs = [
+        (PLAYER_SESSION_ANALYTICS, _events(client, client.ENCODERS["player-events"], events, clock_ns)),
+        (PURCHASE_ANALYTICS, _events(client, client.ENCODERS["purchase-events"], events, clock_ns)),
+    ]
+
+    results = []
+    for service, (values, times) in inputs:
+        for record_times in (False, True):
+            name = f"{service.name}/{'record_time' if record_times else 'event_timestamp'}"
+            metrics = {"events_per_s": _events_per_s(service, values, times, batch_size, record_times)}
+            results.append(result("windows", name, metrics, events=events, batch_size=batch_size))
+    return results
@@ -0,0 +1,261 @@
+import json
+import mmap
+import struct
+from array import array
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+from encoders import KEYED_EVENT, TIMESTAMP_WIDTH, TimestampCache
+
+MAGIC = b"GSCORP01"
+_TRAILER = struct.Struct("<QQ")
+
+DELIMITER = b"\n\n"
+TIMESTAMP_FIELD = b'"event_timestamp": "'
+NO_TIMESTAMP = 0xFFFFFFFF
+
+# Per-record index columns. start is the record's offset in the data region;
+# the others are relative to the record start.
+INDEX_COLUMNS = [
+    ("start", "Q"),
+    ("key_start", "I"),
+    ("key_end", "I"),
+    ("value_start", "I"),
+    ("value_end", "I"),
+    ("timestamp", "I"),
+    ("topic", "B"),
+]
+
+
+def write_corpus(path: str, records: Iterable[Tuple[str, bytes, bytes]], source: str = "") -> int:
+    """
+    Write (topic, key, value) records to a corpus file and return the record count.
+
+    Each record is stored as the line /stream_events sends, {"key": ..., "event": ...}
+    followed by the delimiter, and the index gives the key and value position
+    inside it. The same bytes can then be sent to Fluvio as key and value slices,
+    or streamed over HTTP as one contiguous range, without re-encoding.
+
+    File layout: magic, the records back to back, the index columns, a JSON header,
+    then the header's offset and length. event_timestamp values are padded to the
+    fixed TIMESTAMP_WIDTH form so they can be rewritten in place on replay.
+    Keys must not need JSON escaping.
+    """
+    topics: List[str] = []
+    topic_ids = {}
+    index = {name: array(typecode) for name, typecode in INDEX_COLUMNS}
+    key_start = len(KEYED_EVENT.format.split(b"%s")[0])
+
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        position = 0
+        for topic, key, value in records:
+            if topic not in topic_ids:
+                topic_ids[topic] = len(topics)
+                topics.append(topic)
+
+            timestamp = NO_TIMESTAMP
+            field = value.find(TIMESTAMP_FIELD)
+            if field >= 0:
+                ts_start = field + len(TIMESTAMP_FIELD)
+                ts_end = value.index(b'"', ts_start)
+                if ts_end - ts_start == TIMESTAMP_WIDTH - 7:
+                    # isoformat() dropped a zero fraction
+                    value = value[:ts_end] + b".000000" + value[ts_end:]
+                    ts_end += 7
+                if ts_end - ts_start == TIMESTAMP_WIDTH:
+                    timestamp = ts_start
+
+            record = KEYED_EVENT.format % (key, value) + DELIMITER
+            value_start = len(record) - len(DELIMITER) - 1 - len(value)
+            index["start"].append(position)
+            index["key_start"].append(key_start)
+            index["key_end"].append(key_start + len(key))
+            index["value_start"].append(value_start)
+            index["value_end"].append(value_start + len(value))
+            index["timestamp"].append(timestamp if timestamp == NO_TIMESTAMP else value_start + timestamp)
+            index["topic"].append(topic_ids[topic])
+            f.write(record)
+            position += len(record)
+
+        count = len(index["start"])
+        index["start"].append(position)
+        data_length = position
+
+        layout = []
+        offset = len(MAGIC) + data_length
+        for name, typecode in INDEX_COLUMNS:
+            # Keep every column aligned so the reader can cast it in place
+            padding = -offset % 8
+            f.write(b"\0" * padding)
+            offset += padding
+            column = index[name]
+            f.write(column.tobytes())
+            layout.append([name, typecode, offset, len(column)])
+            offset += column.itemsize * len(column)
+
+        header = json.dumps({
+            "count": count,
+            "topics": topics,
+            "data_offset": len(MAGIC),
+            "data_length": data_length,
+            "delimiter": DELIMITER.decode("ascii"),
+            "timestamp_width": TIMESTAMP_WIDTH,
+            "source": source,
+            "columns": layout,
+        }).encode("utf-8")
+        f.write(header)
+        f.write(_TRAILER.pack(offset, len(header)))
+    return count
+
+
+class Corpus:
+    """
+    Memory-mapped corpus file written by write_corpus.
+
+    Records and index are read straight from the read-only mapping; chunk() and
+    records() return memoryview slices of it, so nothing is copied or decoded per
+    event. The slices stay valid until close(), which raises BufferError while
+    any of them is still referenced.
+
+    With rewrite_timestamps, each range handed out is first copied, and the
+    copy's event_timestamp values are overwritten with the current time. A
+    replay that wraps around then never changes bytes handed out earlier, and
+    the copies do not hold the mapping open.
+    """
+
+    def __init__(self, path: str, rewrite_timestamps: bool = False):
+        self.path = path
+        self.rewrite_timestamps = rewrite_timestamps
+        with open(path, "rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mmap[:len(MAGIC)] != MAGIC:
+            self.mmap.close()
+            raise ValueError(f"{path} is not an event corpus")
+        header_offset, header_length = _TRAILER.unpack_from(self.mmap, len(self.mmap) - _TRAILER.size)
+        self.header = json.loads(self.mmap[header_offset:header_offset + header_length])
+
+        self.view = memoryview(self.mmap)
+        self.topics: List[str] = self.header["topics"]
+        self.count: int = self.header["count"]
+        data_offset = self.header["data_offset"]
+        self.data = self.view[data_offset:data_offset + self.header["data_length"]]
+        self.index = {}
+        for name, typecode, offset, length in self.header["columns"]:
+            size = struct.calcsize(typecode) * length
+            self.index[name] = self.view[offset:offset + size].cast(typecode)
+        self.timestamps = TimestampCache(fixed_width=True)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _stamped(self, start: int, end: int) -> bytes:
+        # A copy of records start to end, with their timestamps set to now, joined
+        # from the slices between the timestamps
+        now = self.timestamps.now()
+        data, starts, timestamps = self.data, self.index["start"], self.index["timestamp"]
+        parts = []
+        copied = starts[start]
+        for i in range(start, end):
+            timestamp = timestamps[i]
+            if timestamp != NO_TIMESTAMP:
+                position = starts[i] + timestamp
+                parts.append(data[copied:position])
+                parts.append(now)
+                copied = position + TIMESTAMP_WIDTH
+        parts.append(data[copied:starts[end]])
+        return b"".join(parts)
+
+    def chunk(self, start: int, count: int) -> Union[memoryview, bytes]:
+        """
+        Records start to start + count as one contiguous range of stream lines: a
+        slice of the mapping, or a stamped copy with rewrite_timestamps.
+        """
+        end = min(start + count, self.count)
+        if self.rewrite_timestamps:
+            return self._stamped(start, end)
+        starts = self.index["start"]
+        return self.data[starts[start]:starts[end]]
+
+    def records(self, start: int, count: int) -> Iterator[Tuple[str, memoryview, memoryview]]:
+        """
+        Yield (topic, key, value) slices for records start to start + count, of
+        the mapping, or of a stamped copy with rewrite_timestamps.
+        """
+        end = min(start + count, self.count)
+        data, topics = self.data, self.topics
+        starts, topic_ids = self.index["start"], self.index["topic"]
+        base = 0
+        if self.rewrite_timestamps:
+            data, base = memoryview(self._stamped(start, end)), starts[start]
+        key_starts, key_ends = self.index["key_start"], self.index["key_end"]
+        value_starts, value_ends = self.index["value_start"], self.index["value_end"]
+        for i in range(start, end):
+            record = starts[i] - base
+            yield (
+                topics[topic_ids[i]],
+                data[record + key_starts[i]:record + key_ends[i]],
+                data[record + value_starts[i]:record + value_ends[i]],
+            )
+
+    def close(self) -> None:
+        for column in self.index.values():
+            column.release()
+        self.data.release()
+        self.view.release()
+        try:
+            self.mmap.close()
+        except BufferError:
+            raise BufferError(
+                f"{self.path} closed while slices of it are still referenced"
+            ) from None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CorpusReplay:
+    """
+    Endless cursor over a corpus, starting again from the first record at the end.
+    """
+
+    def __init__(self, corpus: Corpus, start: int = 0):
+        if len(corpus) == 0:
+            raise ValueError(f"{corpus.path} has no records to replay")
+        self.corpus = corpus
+        self.position = start % len(corpus)
+        self.loops = 0
+
+    def _advance(self, count: int) -> List[Tuple[int, int]]:
+        spans = []
+        while count > 0:
+            take = min(count, len(self.corpus) - self.position)
+            spans.append((self.position, take))
+            count -= take
+            self.position += take
+            if self.position == len(self.corpus):
+                self.position = 0
+                self.loops += 1
+        return spans
+
+    def next_chunk(self, count: int) -> Union[memoryview, bytes]:
+        """
+        The next count records as stream lines; a copy is made only when the
+        chunk wraps around the end of the corpus or timestamps are rewritten.
+        """
+        chunks = [self.corpus.chunk(start, take) for start, take in self._advance(count)]
+        if len(chunks) == 1:
+            return chunks[0]
+        return b"".join(chunks)
+
+    def next_records(self, count: int) -> Iterator[Tuple[str, memoryview, memoryview]]:
+        for start, take in self._advance(count):
+            yield from self.corpus.records(start, take)
+
+
+def open_replay(path: Optional[str], rewrite_timestamps: bool = False) -> Optional[CorpusReplay]:
+    if not path:
+        return None
+    return CorpusReplay(Corpus(path, rewrite_timestamps=rewrite_timestamps))
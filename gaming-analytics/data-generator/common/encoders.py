@@ -0,0 +1,216 @@
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Any, Iterable, Iterator, List, Tuple
+
+EPOCH = datetime(1970, 1, 1)
+
+# Length of an isoformat() timestamp with microseconds, e.g. 2024-01-02T03:04:05.123456
+TIMESTAMP_WIDTH = 26
+
+
+class Field:
+    """
+    Placeholder for a per-event value in an event template.
+    """
+    conversion = b"%s"
+
+    def __init__(self, name: str):
+        self.name = name
+
+
+class Text(Field):
+    """
+    String value, passed as bytes that need no JSON escaping (see text_table).
+    """
+    conversion = b'"%s"'
+
+
+class Int(Field):
+    conversion = b"%d"
+
+
+class Float(Field):
+    # %r of a float is float.__repr__, which is what json.dumps writes
+    conversion = b"%r"
+
+
+class Raw(Field):
+    """
+    Already encoded JSON, e.g. an event encoded by another template.
+    """
+    conversion = b"%s"
+
+
+class EventEncoder:
+    """
+    Encoder compiled from an event template into one bytes format string.
+
+    The template is the event dict with Field placeholders where per-event values
+    go. Static parts are encoded once, with the same separators as json.dumps, so
+    encode() only has to interpolate the values:
+
+        encoder = EventEncoder({"id": Text("id"), "n": Int("n")})
+        encoder.encode((b"abc", 3)) == json.dumps({"id": "abc", "n": 3}).encode()
+
+    fields lists the placeholder names in the order encode() expects them; a
+    placeholder used twice in the template appears twice.
+    """
+
+    def __init__(self, template: Any):
+        self.fields: List[str] = []
+        self.format = self._compile(template)
+
+    def _compile(self, value: Any) -> bytes:
+        if isinstance(value, Field):
+            self.fields.append(value.name)
+            return value.conversion
+        if isinstance(value, dict):
+            items = [
+                json.dumps(key).encode("utf-8").replace(b"%", b"%%") + b": " + self._compile(item)
+                for key, item in value.items()
+            ]
+            return b"{" + b", ".join(items) + b"}"
+        if isinstance(value, (list, tuple)):
+            return b"[" + b", ".join(self._compile(item) for item in value) + b"]"
+        return json.dumps(value).encode("utf-8").replace(b"%", b"%%")
+
+    def encode(self, values: Tuple) -> bytes:
+        return self.format % values
+
+
+def text_table(strings: Iterable[str]) -> List[bytes]:
+    """
+    Encode strings for Text fields, checking that none of them needs JSON escaping.
+    """
+    table = []
+    for s in strings:
+        encoded = json.dumps(s)
+        if encoded[1:-1] != s:
+            raise ValueError(f"{s!r} needs JSON escaping and cannot be used as a Text value")
+        table.append(s.encode("ascii"))
+    return table
+
+
+class TimestampCache:
+    """
+    datetime.utcnow().isoformat() as bytes, formatted once per millisecond.
+
+    Only the microsecond digits change within a millisecond, so they are looked
+    up from a table instead of formatting the whole timestamp per event. With
+    fixed_width the fraction is always written, so every timestamp is
+    TIMESTAMP_WIDTH bytes.
+    """
+    MICROS = [b"%03d" % micros for micros in range(1000)]
+
+    def __init__(self, clock=time.time_ns, fixed_width: bool = False):
+        self.clock = clock
+        self.fixed_width = fixed_width
+        self._millis = None
+        self._second = b""
+        self._prefix = b""
+
+    def now(self) -> bytes:
+        ns = self.clock()
+        millis, micros = divmod(ns // 1000, 1000)
+        if millis != self._millis:
+            self._millis = millis
+            self._second = (EPOCH + timedelta(milliseconds=millis)).strftime("%Y-%m-%dT%H:%M:%S").encode("ascii")
+            self._prefix = self._second + b".%03d" % (millis % 1000)
+        if micros == 0 and millis % 1000 == 0 and not self.fixed_width:
+            # isoformat() leaves out a zero fraction
+            return self._second
+        return self._prefix + self.MICROS[micros]
+
+
+class BatchBuffer:
+    """
+    Reusable buffer that encoded events are written into back to back.
+
+    Each event is followed by delimiter. getbuffer() returns the whole batch for a
+    single write; records() yields each event as a zero-copy memoryview.
+    """
+
+    def __init__(self, delimiter: bytes = b""):
+        self.delimiter = delimiter
+        self.buffer = bytearray()
+        self.offsets = [0]
+
+    def clear(self) -> None:
+        del self.buffer[:]
+        del self.offsets[1:]
+
+    def append(self, encoded: bytes) -> None:
+        self.buffer += encoded
+        self.buffer += self.delimiter
+        self.offsets.append(len(self.buffer))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def getbuffer(self) -> memoryview:
+        return memoryview(self.buffer)
+
+    def records(self) -> Iterator[memoryview]:
+        view = memoryview(self.buffer)
+        cut = len(self.delimiter)
+        for start, end in zip(self.offsets, self.offsets[1:]):
+            yield view[start:end - cut]
+
+
+# Templates for the events produced by the generate_* functions. Each encoder's
+# fields list gives the order of the values tuple.
+PLAYER_EVENT = EventEncoder({
+    "event_name": "player_action",
+    "parameters": {
+        "player_id": Text("player_id"),
+        "session_id": Text("session_id"),
+        "event_type": Text("event_type"),
+        "level_id": Text("level_id"),
+        "map_id": Text("map_id"),
+    },
+    "event_timestamp": Text("event_timestamp"),
+    "user_data": {
+        "user_id": Text("player_id"),
+        "platform": Text("platform"),
+    },
+})
+
+PURCHASE_EVENT = EventEncoder({
+    "event_name": "transaction",
+    "parameters": {
+        "transaction_id": Text("transaction_id"),
+        "transaction_type": "purchase",
+        "currency": "USD",
+        "amount": Float("amount"),
+        "item_id": Text("item_id"),
+        "item_type": "skin",
+    },
+    "event_timestamp": Text("event_timestamp"),
+    "user_data": {
+        "user_id": Text("player_id"),
+        "platform": Text("platform"),
+    },
+})
+
+SERVER_METRIC = EventEncoder({
+    "event_name": "server_metric",
+    "parameters": {
+        "server_id": Text("server_id"),
+        "cpu_load": Int("cpu_load"),
+        "memory_usage": Int("memory_usage"),
+        "latency": Int("latency"),
+    },
+    "event_timestamp": Text("event_timestamp"),
+    "server_data": {
+        "region": "us-west",
+        "server_type": "dedicated",
+    },
+})
+
+# {"key": ..., "event": ...} as streamed by the web API
+KEYED_EVENT = EventEncoder({
+    "key": Text("key"),
+    "event": Raw("event"),
+})
+
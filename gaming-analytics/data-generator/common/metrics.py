@@ -0,0 +1,400 @@
+import bisect
+import logging
+import math
+import os
+import signal
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter as _Tally
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlparse
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds, from 10us to 10s
+DEFAULT_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        name + '="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for name, value in labels
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self.children[()] = self._child()
+
+    @abstractmethod
+    def _child(self):
+        ...
+
+    def labels(self, *values: str):
+        """
+        The child for these label values. Look it up once and keep it: updating
+        a child is a single attribute increment.
+        """
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values}")
+        child = self.children.get(values)
+        if child is None:
+            child = self.children[values] = self._child()
+        return child
+
+    @abstractmethod
+    def _samples(self) -> List[Tuple[str, Tuple[Tuple[str, str], ...], float]]:
+        ...
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self._samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class _CounterChild:
+    __slots__ = ("value", "function")
+
+    def __init__(self):
+        self.value = 0
+        self.function = None
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def set_function(self, function: Callable[[], float]):
+        """
+        Read the value from function when the metrics are rendered, for a count
+        kept elsewhere. It must only ever go up.
+        """
+        self.function = function
+
+    def get(self) -> float:
+        return self.function() if self.function is not None else self.value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        self.children[()].inc(amount)
+
+    def set_function(self, function: Callable[[], float]):
+        self.children[()].set_function(function)
+
+    def _samples(self):
+        return [
+            ("_total", tuple(zip(self.labelnames, values)), child.get())
+            for values, child in self.children.items()
+        ]
+
+
+class _GaugeChild:
+    __slots__ = ("value", "function")
+
+    def __init__(self):
+        self.value = 0
+        self.function = None
+
+    def set(self, value: float):
+        self.value = value
+
+    def set_function(self, function: Callable[[], float]):
+        """
+        Read the value from function when the metrics are rendered.
+        """
+        self.function = function
+
+    def get(self) -> float:
+        return self.function() if self.function is not None else self.value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self.children[()].set(value)
+
+    def set_function(self, function: Callable[[], float]):
+        self.children[()].set_function(function)
+
+    def _samples(self):
+        return [
+            ("", tuple(zip(self.labelnames, values)), child.get())
+            for values, child in self.children.items()
+        ]
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.children[()].observe(value)
+
+    def time(self):
+        return self.children[()].time()
+
+    def _samples(self):
+        samples = []
+        for values, child in self.children.items():
+            labels = tuple(zip(self.labelnames, values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), child.counts):
+                cumulative += count
+                samples.append(("_bucket", labels + (("le", _format_value(float(bound))),), cumulative))
+            samples.append(("_sum", labels, child.sum))
+            samples.append(("_count", labels, child.count))
+        return samples
+
+
+class Registry:
+    """
+    The metrics of one process, rendered together in the Prometheus text format.
+
+    Updates are plain attribute increments without locks: a render that races
+    an update may be one observation behind, which scraping tolerates.
+    """
+
+    def __init__(self):
+        self.metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        return "".join(metric.render() for metric in self.metrics.values())
+
+
+REGISTRY = Registry()
+
+
+class SampledLog:
+    """
+    Log at most one message per interval, with the number of calls since the last
+    one, in place of a line per event.
+    """
+
+    def __init__(self, interval: float = 5.0, logger: logging.Logger = logging.getLogger(), clock=time.monotonic):
+        self.interval = interval
+        self.logger = logger
+        self.clock = clock
+        self.last = None
+        self.calls = 0
+
+    def __call__(self, message: Callable[[], str], level: int = logging.INFO):
+        """
+        Count a call; message is only formatted when it is actually logged.
+        """
+        self.calls += 1
+        now = self.clock()
+        if self.last is None or now - self.last >= self.interval:
+            self.logger.log(level, f"{message()} ({self.calls} since last report)")
+            self.calls = 0
+            self.last = now
+
+
+class SamplingProfiler:
+    """
+    Opt-in wall-clock sampling profiler over all threads.
+
+    While running, a background thread records every thread's stack each interval
+    seconds. collapsed() returns them in the collapsed format ("a;b;c count" per
+    line) that flamegraph.pl, speedscope and inferno read.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks = _Tally()
+        self.samples = 0
+        self.thread: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self.thread is not None
+
+    def start(self):
+        if self.running:
+            return
+        self.stacks.clear()
+        self.samples = 0
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._sample, name="sampling-profiler", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> str:
+        if self.running:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+        return self.collapsed()
+
+    def toggle(self) -> Optional[str]:
+        """
+        Start the profiler, or stop it and return the collapsed stacks.
+        """
+        if self.running:
+            return self.stop()
+        self.start()
+        return None
+
+    def _sample(self):
+        own = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def profile(self, seconds: float) -> str:
+        """
+        Profile for seconds, blocking, and return the collapsed stacks.
+        """
+        self.start()
+        time.sleep(seconds)
+        return self.stop()
+
+
+def toggle_profiler_on_signal(profiler: SamplingProfiler, directory: str = ".", signum: int = signal.SIGUSR1):
+    """
+    Start the profiler on the first signal and write its collapsed stacks to
+    directory on the next one, e.g. with kill -USR1 <pid>. Call from the main thread.
+    """
+
+    def handler(signum, frame):
+        stacks = profiler.toggle()
+        if stacks is None:
+            logging.info("Sampling profiler started")
+            return
+        path = os.path.join(directory, f"profile-{os.getpid()}-{int(time.time())}.folded")
+        with open(path, "w") as f:
+            f.write(stacks)
+        logging.info(f"Sampling profiler stopped after {profiler.samples} samples, wrote {path}")
+
+    signal.signal(signum, handler)
+
+
+def serve_metrics(port: int, registry: Registry = REGISTRY, profiler: Optional[SamplingProfiler] = None,
+                  host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """
+    Serve registry on GET /metrics from a background thread. With a profiler,
+    GET /debug/profile?seconds=N also returns N seconds of collapsed stacks.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/metrics":
+                self._reply(200, registry.render(), CONTENT_TYPE)
+            elif url.path == "/debug/profile" and profiler is not None:
+                seconds = float(parse_qs(url.query).get("seconds", ["10"])[0])
+                self._reply(200, profiler.profile(seconds), "text/plain; charset=utf-8")
+            else:
+                self._reply(404, "not found\n", "text/plain; charset=utf-8")
+
+        def _reply(self, status: int, body: str, content_type: str):
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            logging.debug(format % args)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logging.info(f"Serving metrics on port {server.server_address[1]}")
+    return server
@@ -0,0 +1,235 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+
+MIN_RATE = 1
+MAX_RATE = 1_000_000
+
+# Never sleep longer than this, so profile changes and stop requests are noticed
+MAX_SLEEP = 0.1
+
+
+class RateProfile(ABC):
+    """
+    Target rate over time, in events per second since the start of the run.
+
+    scheduled(t) is the number of events that should have been sent by time t,
+    i.e. the integral of the rate from 0 to t.
+    """
+
+    @abstractmethod
+    def rate_at(self, t: float) -> float:
+        ...
+
+    @abstractmethod
+    def scheduled(self, t: float) -> float:
+        ...
+
+
+def _check_rate(rate: float) -> float:
+    if not MIN_RATE <= rate <= MAX_RATE:
+        raise ValueError(f"Rate {rate} is outside {MIN_RATE}..{MAX_RATE} events/s")
+    return rate
+
+
+class ConstantRate(RateProfile):
+    def __init__(self, rate: float):
+        self.rate = _check_rate(rate)
+
+    def rate_at(self, t: float) -> float:
+        return self.rate
+
+    def scheduled(self, t: float) -> float:
+        return self.rate * t
+
+
+class RampRate(RateProfile):
+    """
+    Linear ramp from start to end over duration seconds, then hold at end.
+    """
+
+    def __init__(self, start: float, end: float, duration: float):
+        self.start = _check_rate(start)
+        self.end = _check_rate(end)
+        self.duration = duration
+
+    def rate_at(self, t: float) -> float:
+        if t >= self.duration:
+            return self.end
+        return self.start + (self.end - self.start) * t / self.duration
+
+    def scheduled(self, t: float) -> float:
+        ramp = min(t, self.duration)
+        total = self.start * ramp + (self.end - self.start) * ramp * ramp / (2 * self.duration)
+        return total + self.end * max(0.0, t - self.duration)
+
+
+class StepRate(RateProfile):
+    """
+    Piecewise constant rate: steps is a list of (start time, rate), the first at 0.
+    """
+
+    def __init__(self, steps):
+        steps = sorted(steps)
+        if not steps or steps[0][0] != 0:
+            raise ValueError("Step profile must start at time 0")
+        self.steps = [(start, _check_rate(rate)) for start, rate in steps]
+
+    def rate_at(self, t: float) -> float:
+        rate = self.steps[0][1]
+        for start, step_rate in self.steps:
+            if t < start:
+                break
+            rate = step_rate
+        return rate
+
+    def scheduled(self, t: float) -> float:
+        total = 0.0
+        for (start, rate), (end, _) in zip(self.steps, self.steps[1:] + [(float("inf"), 0)]):
+            if t <= start:
+                break
+            total += rate * (min(t, end) - start)
+        return total
+
+
+class BurstRate(RateProfile):
+    """
+    base rate, with a burst at peak rate for burst seconds at the start of every period.
+    """
+
+    def __init__(self, base: float, peak: float, period: float, burst: float):
+        if not 0 < burst <= period:
+            raise ValueError("Burst length must be within the burst period")
+        self.base = _check_rate(base)
+        self.peak = _check_rate(peak)
+        self.period = period
+        self.burst = burst
+
+    def rate_at(self, t: float) -> float:
+        return self.peak if t % self.period < self.burst else self.base
+
+    def scheduled(self, t: float) -> float:
+        periods, offset = divmod(t, self.period)
+        per_period = self.peak * self.burst + self.base * (self.period - self.burst)
+        in_period = self.peak * min(offset, self.burst) + self.base * max(0.0, offset - self.burst)
+        return periods * per_period + in_period
+
+
+class ScaledRate(RateProfile):
+    """
+    A fixed fraction of another profile, e.g. one worker's share of a topic's rate.
+    """
+
+    def __init__(self, profile: RateProfile, factor: float):
+        if not factor > 0:
+            raise ValueError(f"Rate factor must be positive, got {factor}")
+        self.profile = profile
+        self.factor = factor
+
+    def rate_at(self, t: float) -> float:
+        return self.profile.rate_at(t) * self.factor
+
+    def scheduled(self, t: float) -> float:
+        return self.profile.scheduled(t) * self.factor
+
+
+def parse_profile(spec: str) -> RateProfile:
+    """
+    Parse a rate profile spec:
+
+        1000                     constant 1000 events/s
+        constant:1000
+        ramp:100:50000:60        100 to 50000 events/s over 60s
+        step:0=100,30=1000       100 events/s, then 1000 from 30s
+        burst:1000:50000:10:1    1000 events/s with a 1s burst at 50000 every 10s
+    """
+    kind, _, args = spec.partition(":")
+    try:
+        if not args:
+            return ConstantRate(float(kind))
+        if kind == "constant":
+            return ConstantRate(float(args))
+        if kind == "ramp":
+            start, end, duration = args.split(":")
+            return RampRate(float(start), float(end), float(duration))
+        if kind == "step":
+            steps = [step.split("=") for step in args.split(",")]
+            return StepRate([(float(start), float(rate)) for start, rate in steps])
+        if kind == "burst":
+            base, peak, period, burst = args.split(":")
+            return BurstRate(float(base), float(peak), float(period), float(burst))
+    except ValueError as e:
+        raise ValueError(f"Invalid rate profile {spec!r}: {e}") from None
+    raise ValueError(f"Unknown rate profile {spec!r}")
+
+
+class Pacer:
+    """
+    Open-loop pacer that releases events on a fixed schedule.
+
+    The schedule comes from the rate profile and the start time only, never from
+    how long the work took, so serialization and I/O time do not lower the rate.
+    Each call to next_batch() waits until at least one event is due and returns
+    how many are due now (at most max_batch), so high rates are sent in batches.
+    If the caller falls behind, the backlog is released in batches and the lag
+    behind the schedule is tracked instead of silently lowering the offered load.
+    """
+
+    def __init__(self, profile: RateProfile, max_batch: int = 10_000, clock=time.perf_counter):
+        self.profile = profile
+        self.max_batch = max_batch
+        self.clock = clock
+        self.start = None
+        self.sent = 0
+        self.lag = 0.0
+        self.max_lag = 0.0
+
+    def _due(self) -> float:
+        if self.start is None:
+            self.start = self.clock()
+        elapsed = self.clock() - self.start
+        due = self.profile.scheduled(elapsed) - self.sent
+        # Time the oldest owed event has been waiting, at the current rate
+        self.lag = max(0.0, (due - 1) / self.profile.rate_at(elapsed))
+        self.max_lag = max(self.max_lag, self.lag)
+        return due
+
+    def _sleep_time(self, due: float) -> float:
+        rate = self.profile.rate_at(self.clock() - self.start)
+        return min(MAX_SLEEP, (1 - due) / rate)
+
+    def _take(self, due: float) -> int:
+        count = min(int(due), self.max_batch)
+        self.sent += count
+        return count
+
+    def next_batch(self) -> int:
+        """
+        Block until events are due, then return how many to send now.
+        """
+        due = self._due()
+        while due < 1:
+            time.sleep(self._sleep_time(due))
+            due = self._due()
+        return self._take(due)
+
+    async def next_batch_async(self) -> int:
+        """
+        Like next_batch, for use inside an event loop.
+        """
+        due = self._due()
+        while due < 1:
+            await asyncio.sleep(self._sleep_time(due))
+            due = self._due()
+        return self._take(due)
+
+    def stats(self):
+        elapsed = self.clock() - self.start if self.start is not None else 0.0
+        return {
+            "sent": self.sent,
+            "elapsed": elapsed,
+            "target_rate": self.profile.rate_at(elapsed),
+            "achieved_rate": self.sent / elapsed if elapsed else 0.0,
+            "lag": self.lag,
+            "max_lag": self.max_lag,
+        }
@@ -0,0 +1,214 @@
+import queue
+import threading
+import time
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from metrics import REGISTRY
+
+# Runtime metrics, labelled with the pipeline's name
+PIPELINE_EVENTS = REGISTRY.counter("pipeline_events", "Events through each pipeline stage", ["pipeline", "stage"])
+PIPELINE_BUSY_SECONDS = REGISTRY.counter(
+    "pipeline_busy_seconds", "Time each pipeline stage spent working", ["pipeline", "stage"],
+)
+PIPELINE_BLOCKED_SECONDS = REGISTRY.counter(
+    "pipeline_blocked_seconds", "Time the source stage waited for room in the queues", ["pipeline"],
+)
+PIPELINE_QUEUE_DEPTH = REGISTRY.gauge("pipeline_queue_depth", "Chunks waiting in each pipeline queue", ["pipeline", "queue"])
+
+EXECUTORS = ("thread", "process")
+
+_END = None
+
+
+def _timed_call(encode: Callable[[Any], Any], chunk: Tuple[List[Any], Any]) -> Tuple[Any, int, float]:
+    """
+    encode(chunk), with the chunk's event count and the time encoding took. Runs
+    in the encode workers, so it is measured there even with processes.
+    """
+    start = time.perf_counter()
+    encoded = encode(chunk)
+    return encoded, len(chunk[0]), time.perf_counter() - start
+
+
+class StagedPipeline:
+    """
+    Source, encode and send stages connected by bounded queues, so producing the
+    next events, encoding them and sending the last ones overlap.
+
+    One thread iterates the source, which yields (events, extra) chunks; only
+    that thread ever touches it, so a stateful simulator can be the source. Each
+    chunk is handed to one of encode_workers threads or processes, and the
+    consumer calls take() for the encoded chunks in source order, whichever
+    worker finished first. At most queue_chunks chunks are between the source
+    and the consumer, waiting for or in an encoder or encoded and waiting to be
+    taken. When the consumer is slow, the source thread blocks, so a slow sink
+    throttles the source instead of memory growing.
+
+    Process workers spread encoding over cores but pickle every chunk both ways;
+    encode must then be a module-level function.
+    """
+
+    def __init__(
+        self,
+        source: Iterable[Tuple[List[Any], Any]],
+        encode: Callable[[Tuple[List[Any], Any]], Any],
+        encode_workers: int = 2,
+        queue_chunks: int = 16,
+        executor: str = "thread",
+        name: str = "pipeline",
+    ):
+        if executor not in EXECUTORS:
+            raise ValueError(f"Unknown executor {executor!r}, expected one of {EXECUTORS}")
+        if encode_workers <= 0 or queue_chunks <= 0:
+            raise ValueError("encode_workers and queue_chunks must be positive")
+        self.source = source
+        self.encode = encode
+        self.encode_workers = encode_workers
+        self.executor_kind = executor
+        self.name = name
+        self.chunks: "queue.Queue[Future]" = queue.Queue(maxsize=queue_chunks)
+        self.stop = threading.Event()
+        self.executor = None
+        self.thread = None
+        # Events taken beyond the counts asked for, owed against later calls
+        self.credit = 0
+        self.exhausted = False
+
+        self.source_events = PIPELINE_EVENTS.labels(name, "source")
+        self.encode_events = PIPELINE_EVENTS.labels(name, "encode")
+        self.send_events = PIPELINE_EVENTS.labels(name, "send")
+        self.source_busy = PIPELINE_BUSY_SECONDS.labels(name, "source")
+        self.encode_busy = PIPELINE_BUSY_SECONDS.labels(name, "encode")
+        self.source_blocked = PIPELINE_BLOCKED_SECONDS.labels(name)
+
+    def start(self) -> "StagedPipeline":
+        if self.thread is not None:
+            return self
+        if self.executor_kind == "process":
+            self.executor = ProcessPoolExecutor(self.encode_workers)
+        else:
+            self.executor = ThreadPoolExecutor(self.encode_workers, thread_name_prefix=f"{self.name}-encode")
+        PIPELINE_QUEUE_DEPTH.labels(self.name, "encode").set_function(lambda: self.queue_depths()[0])
+        PIPELINE_QUEUE_DEPTH.labels(self.name, "send").set_function(lambda: self.queue_depths()[1])
+        self.thread = threading.Thread(target=self._run_source, name=f"{self.name}-source", daemon=True)
+        self.thread.start()
+        return self
+
+    def _put(self, item) -> bool:
+        start = time.perf_counter()
+        try:
+            while not self.stop.is_set():
+                try:
+                    self.chunks.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            self.source_blocked.inc(time.perf_counter() - start)
+
+    def _run_source(self):
+        chunks = iter(self.source)
+        try:
+            while not self.stop.is_set():
+                start = time.perf_counter()
+                chunk = next(chunks, _END)
+                self.source_busy.inc(time.perf_counter() - start)
+                if chunk is _END:
+                    break
+                self.source_events.inc(len(chunk[0]))
+                future = self.executor.submit(_timed_call, self.encode, chunk)
+                future.add_done_callback(self._encoded)
+                if not self._put(future):
+                    return
+        except Exception as e:
+            # hand the error to the consumer, which would otherwise wait forever
+            failed = Future()
+            failed.set_exception(e)
+            self._put(failed)
+            return
+        self._put(_END)
+
+    def _encoded(self, future: Future):
+        # Called in this process as each chunk finishes encoding, whichever executor ran it
+        if future.cancelled() or future.exception() is not None:
+            return
+        _, events, busy = future.result()
+        self.encode_events.inc(events)
+        self.encode_busy.inc(busy)
+
+    def take(self, count: int) -> List[Any]:
+        """
+        Encoded chunks holding the next count events, waiting for them if need be.
+
+        Chunks are handed out whole, so they can hold more than count events;
+        the surplus is owed against later calls, which return nothing until it
+        is used up, so the events sent follow the counts asked for on average.
+        Returns what is left, and then nothing, once the source is exhausted or
+        the pipeline closed. Errors in the source or in encoding are raised here.
+        """
+        if self.thread is None:
+            self.start()
+        encoded = []
+        while self.credit < count and not self.exhausted:
+            try:
+                future = self.chunks.get(timeout=0.1)
+            except queue.Empty:
+                if self.stop.is_set():
+                    self.exhausted = True
+                    break
+                continue
+            if future is _END:
+                self.exhausted = True
+                break
+            try:
+                chunk, events, _ = future.result()
+            except CancelledError:
+                # The pipeline closed before this chunk was encoded
+                self.exhausted = True
+                break
+            self.send_events.inc(events)
+            self.credit += events
+            encoded.append(chunk)
+        self.credit = max(self.credit - count, 0)
+        return encoded
+
+    def queue_depths(self) -> Tuple[int, int]:
+        """
+        Chunks waiting for or in an encoder, and encoded chunks waiting to be taken.
+        """
+        pending = [item for item in list(self.chunks.queue) if item is not _END]
+        ready = sum(1 for future in pending if future.done())
+        return len(pending) - ready, ready
+
+    def stats(self) -> Dict[str, float]:
+        encoding, ready = self.queue_depths()
+        return {
+            "source_events": self.source_events.value,
+            "encoded_events": self.encode_events.value,
+            "sent_events": self.send_events.value,
+            "source_busy_s": self.source_busy.value,
+            "source_blocked_s": self.source_blocked.value,
+            "encode_busy_s": self.encode_busy.value,
+            "encode_queue": encoding,
+            "send_queue": ready,
+        }
+
+    def _drain(self) -> None:
+        while True:
+            try:
+                self.chunks.get_nowait()
+            except queue.Empty:
+                break
+
+    def close(self) -> None:
+        self.stop.set()
+        # Unblock the source thread if it is waiting for room; a consumer waiting
+        # in take() sees stop once the queue is empty
+        self._drain()
+        if self.thread is not None:
+            self.thread.join()
+        self._drain()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,345 @@
+import json
+import logging
+from contextlib import contextmanager
+from json.encoder import encode_basestring_ascii
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+from metrics import REGISTRY, SampledLog
+
+# The dataflow this repo deploys, next to data-generator
+DATAFLOW = Path(__file__).resolve().parent.parent.parent / "sdf" / "dataflow.yaml"
+
+EVENTS_VALIDATED = REGISTRY.counter("schema_events_validated", "Events checked against the dataflow types", ["topic"])
+VALIDATION_FAILURES = REGISTRY.counter(
+    "schema_validation_failures", "Events that don't match the dataflow types", ["topic"]
+)
+
+# Integer types and their ranges
+INTEGERS = {
+    "u8": (0, 2**8 - 1), "u16": (0, 2**16 - 1), "u32": (0, 2**32 - 1), "u64": (0, 2**64 - 1),
+    "i8": (-2**7, 2**7 - 1), "i16": (-2**15, 2**15 - 1), "i32": (-2**31, 2**31 - 1), "i64": (-2**63, 2**63 - 1),
+}
+FLOATS = ("f32", "f64")
+
+Validator = Callable[[Any], Optional[str]]
+Encoder = Callable[[Any], bytes]
+
+
+class _Compiler:
+    """
+    Generates the Python source of one validator or encoder function, with every
+    named type inlined, so checking an event is straight-line code with no lookups.
+    """
+
+    def __init__(self, types: Mapping[str, dict]):
+        self.types = types
+        self.lines: List[str] = []
+        self.names = 0
+        # Named types whose definitions are being compiled, outermost first
+        self.expanding: List[str] = []
+        # Helper functions for list items, compiled separately
+        self.helpers: Dict[str, str] = {}
+
+    def local(self) -> str:
+        self.names += 1
+        return f"v{self.names}"
+
+    def emit(self, depth: int, line: str):
+        self.lines.append("    " * depth + line)
+
+    @contextmanager
+    def expand(self, spec: Mapping[str, Any]):
+        """
+        Compile spec's definition with its type on self.expanding, so a type that
+        contains itself is an error instead of endless inlining.
+        """
+        name = spec.get("type")
+        if name not in self.types:
+            yield
+            return
+        if name in self.expanding:
+            raise ValueError(f"Recursive type {name} can't be compiled")
+        self.expanding.append(name)
+        try:
+            yield
+        finally:
+            self.expanding.pop()
+
+    def resolve(self, spec: Mapping[str, Any], seen: Tuple[str, ...] = ()) -> Tuple[str, Mapping[str, Any]]:
+        """
+        The structural type of spec (object, list or a primitive), following named types.
+        """
+        name = spec.get("type")
+        if name is None:
+            raise ValueError(f"Type definition without a type: {dict(spec)}")
+        if name in self.types:
+            if name in seen:
+                raise ValueError(f"Recursive type {name} can't be compiled")
+            return self.resolve(self.types[name], seen + (name,))
+        if name in ("object", "list", "string", "bool") or name in INTEGERS or name in FLOATS:
+            return name, spec
+        raise ValueError(f"Unknown type {name!r}")
+
+    def check(self, spec: Mapping[str, Any], var: str, path: str, depth: int):
+        with self.expand(spec):
+            self._check(spec, var, path, depth)
+
+    def _check(self, spec: Mapping[str, Any], var: str, path: str, depth: int):
+        kind, spec = self.resolve(spec)
+        fail = f"return {path!r} + ': expected {kind}, got ' + type({var}).__name__"
+        if kind == "object":
+            self.emit(depth, f"if type({var}) is not dict: {fail}")
+            for name, prop in spec.get("properties", {}).items():
+                value = self.local()
+                self.emit(depth, f"{value} = {var}.get({name!r}, MISSING)")
+                if prop.get("optional"):
+                    self.emit(depth, f"if {value} is not MISSING and {value} is not None:")
+                    self.check(prop, value, f"{path}.{name}", depth + 1)
+                else:
+                    self.emit(depth, f"if {value} is MISSING: return {path + '.' + name + ': missing'!r}")
+                    self.check(prop, value, f"{path}.{name}", depth)
+        elif kind == "list":
+            item = self.local()
+            self.emit(depth, f"if type({var}) is not list: {fail}")
+            self.emit(depth, f"for {item} in {var}:")
+            self.check(spec["items"], item, f"{path}[]", depth + 1)
+        elif kind == "string":
+            self.emit(depth, f"if type({var}) is not str: {fail}")
+        elif kind == "bool":
+            self.emit(depth, f"if type({var}) is not bool: {fail}")
+        elif kind in INTEGERS:
+            low, high = INTEGERS[kind]
+            fail = f"return {path!r} + ': expected {kind}, got ' + repr({var})[:40]"
+            self.emit(depth, f"if type({var}) is not int or not {low} <= {var} <= {high}: {fail}")
+        else:
+            # bool is a subclass of int but not a JSON number; NaN and infinities aren't JSON
+            fail = f"return {path!r} + ': expected {kind}, got ' + repr({var})[:40]"
+            self.emit(depth, f"if type({var}) is not float and type({var}) is not int or not -INF < {var} < INF: {fail}")
+
+    def encode(self, spec: Mapping[str, Any], var: str, depth: int, separators: Tuple[str, str]) -> Tuple[str, List[str]]:
+        """
+        A %-format for spec and the expressions that fill it, binding nested objects to locals.
+        """
+        with self.expand(spec):
+            return self._encode(spec, var, depth, separators)
+
+    def _encode(self, spec: Mapping[str, Any], var: str, depth: int, separators: Tuple[str, str]) -> Tuple[str, List[str]]:
+        kind, spec = self.resolve(spec)
+        item_separator, key_separator = separators
+        if kind == "object":
+            parts, args = [], []
+            for name, prop in spec.get("properties", {}).items():
+                value = self.local()
+                self.emit(depth, f"{value} = {var}.get({name!r})" if prop.get("optional") else f"{value} = {var}[{name!r}]")
+                if prop.get("optional"):
+                    helper = self.helper(prop, separators)
+                    fmt, prop_args = "%s", [f"('null' if {value} is None else ENCODERS[{helper!r}]({value}))"]
+                else:
+                    fmt, prop_args = self.encode(prop, value, depth, separators)
+                parts.append(json.dumps(name).replace("%", "%%") + key_separator + fmt)
+                args.extend(prop_args)
+            return "{" + item_separator.join(parts) + "}", args
+        if kind == "list":
+            helper = self.helper(spec["items"], separators)
+            return "[%s]", [f"{item_separator!r}.join([ENCODERS[{helper!r}](item) for item in {var}])"]
+        if kind == "string":
+            return "%s", [f"ENCODE_STRING({var})"]
+        if kind == "bool":
+            return "%s", [f"('true' if {var} else 'false')"]
+        # repr of an int or a finite float is what json.dumps writes
+        return "%r", [var]
+
+    def helper(self, spec: Mapping[str, Any], separators: Tuple[str, str]) -> str:
+        """
+        Name of a compiled encoder for spec, used for list items and optional values.
+        """
+        key = json.dumps([spec, separators], sort_keys=True)
+        if key not in self.helpers:
+            compiler = _Compiler(self.types)
+            compiler.expanding = list(self.expanding)
+            fmt, args = compiler.encode(spec, "value", 1, separators)
+            body = compiler.lines + [f"    return {fmt!r} % ({', '.join(args)},)"]
+            self.helpers[key] = "\n".join(body)
+            self.helpers.update(compiler.helpers)
+        return key
+
+
+class Schema:
+    """
+    The types of a dataflow definition and the value type of each topic, compiled
+    on first use into specialised validators and encoders.
+
+    A validator returns None for a value that matches its type, or a message
+    naming the first field that doesn't; properties are required unless marked
+    optional, and numbers must be in range for their type. An encoder writes a
+    valid value as JSON bytes, properties in schema order, as json.dumps would.
+    """
+
+    def __init__(self, types: Mapping[str, dict], topics: Optional[Mapping[str, str]] = None):
+        self.types = dict(types)
+        self.topics = dict(topics or {})
+        for topic, type_name in self.topics.items():
+            if type_name not in self.types:
+                raise ValueError(f"Topic {topic} has unknown value type {type_name}")
+        self._validators: Dict[str, Validator] = {}
+        self._encoders: Dict[Tuple[str, Tuple[str, str]], Encoder] = {}
+
+    @classmethod
+    def from_dataflow(cls, definition: Mapping[str, Any]) -> "Schema":
+        topics = {}
+        for topic, config in (definition.get("topics") or {}).items():
+            value = ((config or {}).get("schema") or {}).get("value") or {}
+            if "type" in value:
+                topics[topic] = value["type"]
+        return cls(definition.get("types") or {}, topics)
+
+    def type_of(self, topic: str) -> str:
+        if topic not in self.topics:
+            raise ValueError(f"Topic {topic} has no value type in the dataflow")
+        return self.topics[topic]
+
+    def validator(self, type_name: str) -> Validator:
+        if type_name not in self._validators:
+            if type_name not in self.types:
+                raise ValueError(f"Unknown type {type_name!r}")
+            compiler = _Compiler(self.types)
+            compiler.check({"type": type_name}, "value", type_name, 1)
+            source = "\n".join(["def validate(value):"] + compiler.lines + ["    return None"])
+            namespace = {"MISSING": _MISSING, "INF": float("inf")}
+            exec(compile(source, f"<validate {type_name}>", "exec"), namespace)
+            self._validators[type_name] = namespace["validate"]
+        return self._validators[type_name]
+
+    def encoder(self, type_name: str, separators: Tuple[str, str] = (", ", ": ")) -> Encoder:
+        """
+        Encoder for type_name. The default separators match json.dumps and the
+        generators; (",", ":") matches the compact JSON the dataflow writes.
+        """
+        key = (type_name, separators)
+        if key not in self._encoders:
+            if type_name not in self.types:
+                raise ValueError(f"Unknown type {type_name!r}")
+            compiler = _Compiler(self.types)
+            fmt, args = compiler.encode({"type": type_name}, "value", 1, separators)
+            namespace = {"ENCODE_STRING": encode_basestring_ascii, "ENCODERS": {}}
+            for helper, body in compiler.helpers.items():
+                helper_namespace = {"ENCODE_STRING": encode_basestring_ascii, "ENCODERS": namespace["ENCODERS"]}
+                exec(compile("def encode(value):\n" + body, f"<encode {helper}>", "exec"), helper_namespace)
+                namespace["ENCODERS"][helper] = helper_namespace["encode"]
+            source = "\n".join(
+                ["def encode(value):"] + compiler.lines + [f"    return ({fmt!r} % ({', '.join(args)},)).encode('utf-8')"]
+            )
+            exec(compile(source, f"<encode {type_name}>", "exec"), namespace)
+            self._encoders[key] = namespace["encode"]
+        return self._encoders[key]
+
+    def validate(self, topic: str, value: Any) -> Optional[str]:
+        return self.validator(self.type_of(topic))(value)
+
+    def encode(self, topic: str, value: Any) -> bytes:
+        return self.encoder(self.type_of(topic))(value)
+
+    def decode(self, topic: str, data: bytes) -> Any:
+        """
+        Parse a topic value and check it against the topic's type, e.g. the
+        summaries the dataflow writes. Raises ValueError if it doesn't match.
+        """
+        value = json.loads(data)
+        error = self.validate(topic, value)
+        if error is not None:
+            raise ValueError(f"Invalid {topic} value: {error}")
+        return value
+
+
+class _Missing:
+    __slots__ = ()
+
+    def __repr__(self):
+        return "MISSING"
+
+
+_MISSING = _Missing()
+
+
+def load_schema(path: Optional[str] = None) -> Schema:
+    """
+    Schema of a dataflow.yaml, by default the repo's sdf/dataflow.yaml. Needs PyYAML.
+    """
+    import yaml
+
+    with open(path or DATAFLOW) as f:
+        return Schema.from_dataflow(yaml.safe_load(f))
+
+
+class SchemaCheck:
+    """
+    Sampled validation of generated events against their topic's type.
+
+    One event in every 1 / sample is checked (all of them at 1.0), counting
+    without drawing random numbers, so a seeded generator is unaffected. Checked
+    events and failures are counted per topic in the metrics registry, and
+    failures are logged at most once every few seconds. Topics without a type in
+    the dataflow are not checked.
+    """
+
+    def __init__(self, schema: Schema, sample: float = 1.0):
+        if not 0 < sample <= 1:
+            raise ValueError(f"sample must be in (0, 1], got {sample}")
+        self.schema = schema
+        self.period = max(1, round(1 / sample))
+        self.countdown: Dict[str, int] = {}
+        self.validators = {topic: schema.validator(type_name) for topic, type_name in schema.topics.items()}
+        self.checked = {topic: EVENTS_VALIDATED.labels(topic) for topic in self.validators}
+        self.failed = {topic: VALIDATION_FAILURES.labels(topic) for topic in self.validators}
+        self.failures = {topic: 0 for topic in self.validators}
+        self.log_failure = SampledLog()
+
+    def _due(self, topic: str, count: int) -> int:
+        """
+        Offset of the first of the next count events of topic due for a check, the
+        rest following every period events; -1 if none is due.
+        """
+        countdown = self.countdown.get(topic, 0)
+        if countdown >= count:
+            self.countdown[topic] = countdown - count
+            return -1
+        self.countdown[topic] = self.period - 1 - (count - countdown - 1) % self.period
+        return countdown
+
+    def check(self, topic: str, value: Any) -> bool:
+        """
+        Check one event, if it's due. Returns False only if it was checked and failed.
+        """
+        validate = self.validators.get(topic)
+        if validate is None or self._due(topic, 1) < 0:
+            return True
+        return self._record(topic, validate(value))
+
+    def check_encoded(self, topic: str, values: List[bytes]) -> int:
+        """
+        Check the due events of a batch of encoded values. Returns the failures.
+        """
+        validate = self.validators.get(topic)
+        if validate is None:
+            return 0
+        first = self._due(topic, len(values))
+        if first < 0:
+            return 0
+        failures = 0
+        for data in values[first::self.period]:
+            try:
+                error = validate(json.loads(data))
+            except ValueError as e:
+                error = f"not JSON: {e}"
+            failures += not self._record(topic, error)
+        return failures
+
+    def _record(self, topic: str, error: Optional[str]) -> bool:
+        self.checked[topic].inc()
+        if error is None:
+            return True
+        self.failed[topic].inc()
+        self.failures[topic] += 1
+        self.log_failure(lambda: f"{topic} event doesn't match the dataflow schema: {error}", logging.WARNING)
+        return False
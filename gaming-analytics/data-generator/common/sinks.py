@@ -0,0 +1,374 @@
+import logging
+import os
+import struct
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+Record = Tuple[bytes, bytes]
+
+# Rough encoded size of one record, to size the Fluvio producer's batches in bytes
+RECORD_BYTES_ESTIMATE = 512
+
+_BINARY_HEADER = struct.Struct("<II")
+
+
+class Output:
+    """
+    Completed delivery, for sinks that are done with a record once it is sent.
+    """
+
+    def wait(self):
+        pass
+
+
+DONE = Output()
+
+
+class Producer(ABC):
+    """
+    Per-topic producer, with the send / send_all / flush API of a Fluvio topic producer.
+    """
+
+    def send(self, key: bytes, value: bytes):
+        return self.send_all([(key, value)])[0]
+
+    @abstractmethod
+    def send_all(self, records: Sequence[Record]) -> List[Output]:
+        ...
+
+    def flush(self) -> None:
+        pass
+
+
+class Sink(ABC):
+    """
+    Destination for generated records, handing out one producer per topic.
+    """
+
+    @abstractmethod
+    def topic_producer(self, topic: str, batch_size: Optional[int] = None,
+                       linger_ms: Optional[int] = None) -> Producer:
+        ...
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {}
+
+    def close(self) -> None:
+        pass
+
+
+class _CountingProducer(Producer):
+    def __init__(self, counts: Dict[str, int]):
+        self.counts = counts
+
+    def _count(self, records: Sequence[Record]):
+        self.counts["records"] += len(records)
+        self.counts["bytes"] += sum(len(key) + len(value) for key, value in records)
+
+
+class _NullProducer(_CountingProducer):
+    def send_all(self, records):
+        self._count(records)
+        return [DONE] * len(records)
+
+
+class NullSink(Sink):
+    """
+    Counts records and drops them.
+    """
+
+    def __init__(self):
+        self.counts: Dict[str, Dict[str, int]] = {}
+
+    def topic_producer(self, topic, batch_size=None, linger_ms=None):
+        return _NullProducer(self.counts.setdefault(topic, {"records": 0, "bytes": 0}))
+
+    def stats(self):
+        return self.counts
+
+
+class _FileProducer(_CountingProducer):
+    def __init__(self, counts, f, binary: bool):
+        super().__init__(counts)
+        self.f = f
+        self.binary = binary
+
+    def send_all(self, records):
+        self._count(records)
+        if self.binary:
+            self.f.write(b"".join(
+                _BINARY_HEADER.pack(len(key), len(value)) + key + value for key, value in records
+            ))
+        else:
+            self.f.write(b"".join(bytes(value) + b"\n" for _, value in records))
+        return [DONE] * len(records)
+
+    def flush(self):
+        self.f.flush()
+
+
+class FileSink(Sink):
+    """
+    Writes each topic to its own file in directory.
+
+    ndjson writes one value per line, <topic>.ndjson. binary keeps keys too, as
+    little-endian uint32 key and value lengths followed by the key and value
+    bytes, in <topic>.bin.
+    """
+    FORMATS = ("ndjson", "binary")
+
+    def __init__(self, directory: str, format: str = "ndjson"):
+        if format not in self.FORMATS:
+            raise ValueError(f"Unknown file sink format {format!r}, expected one of {self.FORMATS}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.format = format
+        self.files = {}
+        self.counts: Dict[str, Dict[str, int]] = {}
+
+    def topic_producer(self, topic, batch_size=None, linger_ms=None):
+        if topic not in self.files:
+            extension = "bin" if self.format == "binary" else "ndjson"
+            self.files[topic] = open(os.path.join(self.directory, f"{topic}.{extension}"), "ab")
+            self.counts[topic] = {"records": 0, "bytes": 0}
+        return _FileProducer(self.counts[topic], self.files[topic], self.format == "binary")
+
+    def stats(self):
+        return self.counts
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        self.files = {}
+
+
+class _MemoryOutput(Output):
+    def __init__(self, producer, sequence: int):
+        self.producer = producer
+        self.sequence = sequence
+
+    def wait(self):
+        self.producer._wait_acked(self.sequence)
+
+
+class _MemoryProducer(_CountingProducer):
+    def __init__(self, sink, counts):
+        super().__init__(counts)
+        self.sink = sink
+        self.buffered = 0
+        self.buffered_bytes = 0
+        self.sent = 0
+        self.acked = 0
+
+    def send_all(self, records):
+        sink = self.sink
+        if sink.capacity and self.buffered + len(records) > sink.capacity:
+            # Producer buffer is full: block on a round trip, as a real client does
+            self.flush()
+        self._count(records)
+        if sink.keep:
+            sink.records.extend(records)
+            del sink.records[:-sink.keep]
+        self.buffered += len(records)
+        self.buffered_bytes += sum(len(key) + len(value) for key, value in records)
+        outputs = [_MemoryOutput(self, self.sent + i + 1) for i in range(len(records))]
+        self.sent += len(records)
+        return outputs
+
+    def _wait_acked(self, sequence: int):
+        if sequence > self.acked:
+            self.flush()
+
+    def flush(self):
+        if not self.buffered:
+            return
+        sink = self.sink
+        delay = sink.latency
+        if sink.bandwidth:
+            delay += self.buffered_bytes / sink.bandwidth
+        if delay:
+            time.sleep(delay)
+        self.buffered = self.buffered_bytes = 0
+        self.acked = self.sent
+
+
+class MemorySink(Sink):
+    """
+    In-process stand-in for a Fluvio cluster, for running publishers without one.
+
+    Records are counted (and the last keep of them kept in records) and acknowledged
+    on flush, which takes latency seconds plus the buffered bytes over bandwidth
+    bytes/s. A producer holding capacity unacknowledged records flushes before
+    taking more, so a slow stand-in pushes back on the publisher like a full
+    producer buffer does.
+    """
+
+    def __init__(self, latency: float = 0.0, capacity: int = 0, bandwidth: float = 0.0, keep: int = 0):
+        self.latency = latency
+        self.capacity = capacity
+        self.bandwidth = bandwidth
+        self.keep = keep
+        self.records: List[Record] = []
+        self.counts: Dict[str, Dict[str, int]] = {}
+
+    def topic_producer(self, topic, batch_size=None, linger_ms=None):
+        return _MemoryProducer(self, self.counts.setdefault(topic, {"records": 0, "bytes": 0}))
+
+    def stats(self):
+        return self.counts
+
+
+class _FluvioProducer(Producer):
+    """
+    Fluvio topic producer that reconnects and retries once when an operation fails.
+
+    A retried send_all may deliver records the failed attempt already sent.
+    """
+
+    def __init__(self, sink, topic, batch_size, linger_ms):
+        self.sink = sink
+        self.topic = topic
+        self.batch_size = batch_size
+        self.linger_ms = linger_ms
+        self.generation = -1
+        self.inner = None
+
+    def _producer(self):
+        client, generation = self.sink.client()
+        if self.inner is None or generation != self.generation:
+            self.inner = self.sink.create_producer(client, self.topic, self.batch_size, self.linger_ms)
+            self.generation = generation
+        return self.inner
+
+    def _call(self, operation: Callable):
+        producer = self._producer()
+        try:
+            return operation(producer)
+        except Exception as e:
+            logging.warning(f"Fluvio producer for {self.topic} failed ({e}), reconnecting")
+            self.sink.reconnect(self.generation)
+            return operation(self._producer())
+
+    def send(self, key, value):
+        return self._call(lambda producer: producer.send(key, value))
+
+    def send_all(self, records):
+        return self._call(lambda producer: producer.send_all(records)) or []
+
+    def flush(self):
+        self._call(lambda producer: producer.flush())
+
+
+class FluvioSink(Sink):
+    """
+    Fluvio cluster, connected on first use.
+
+    A failed connect is retried with exponential backoff, from initial_backoff up to
+    max_backoff seconds; after max_retries failures (None for no limit) the error is
+    raised. When a producer operation fails the connection is dropped and reopened
+    in-process, and every producer is recreated on the new connection.
+    """
+
+    def __init__(self, initial_backoff: float = 0.1, max_backoff: float = 10.0,
+                 max_retries: Optional[int] = None, connect: Optional[Callable] = None):
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.max_retries = max_retries
+        self.connect = connect or self._connect
+        self.lock = threading.Lock()
+        self.fluvio = None
+        self.generation = 0
+        self.reconnects = 0
+
+    @staticmethod
+    def _connect():
+        from fluvio import Fluvio
+        return Fluvio.connect()
+
+    def client(self):
+        with self.lock:
+            if self.fluvio is None:
+                self.fluvio = self._connect_with_backoff()
+                self.generation += 1
+            return self.fluvio, self.generation
+
+    def _connect_with_backoff(self):
+        delay = self.initial_backoff
+        failures = 0
+        while True:
+            try:
+                return self.connect()
+            except Exception as e:
+                failures += 1
+                if self.max_retries is not None and failures > self.max_retries:
+                    raise
+                logging.warning(f"Fluvio connect failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_backoff)
+
+    def reconnect(self, generation: int):
+        with self.lock:
+            # Another producer may already have reconnected after the same failure
+            if generation == self.generation:
+                self.fluvio = None
+                self.reconnects += 1
+
+    @staticmethod
+    def create_producer(client, topic, batch_size, linger_ms):
+        """
+        Create a producer that batches records itself, when the client supports it.
+        """
+        try:
+            from fluvio import TopicProducerConfigBuilder
+        except ImportError:  # older fluvio clients only have the default producer config
+            TopicProducerConfigBuilder = None
+        if TopicProducerConfigBuilder is None or batch_size is None:
+            return client.topic_producer(topic)
+        config = TopicProducerConfigBuilder() \
+            .batch_size(batch_size * RECORD_BYTES_ESTIMATE) \
+            .linger(linger_ms) \
+            .build()
+        return client.topic_producer_with_config(topic, config)
+
+    def topic_producer(self, topic, batch_size=None, linger_ms=None):
+        return _FluvioProducer(self, topic, batch_size, linger_ms)
+
+    def stats(self):
+        return {"connection": {"reconnects": self.reconnects}}
+
+
+def create_sink(spec: str) -> Sink:
+    """
+    Create a sink from a spec:
+
+        fluvio                          Fluvio cluster from the current profile
+        null                            count and drop
+        memory:5:10000:50               in-process stand-in, 5 ms flush latency, 10000
+                                        record buffer, 50 MB/s (all optional)
+        file:out                        NDJSON per topic in directory out
+        file:out:binary                 length-prefixed keys and values
+    """
+    kind, _, args = spec.partition(":")
+    try:
+        if kind == "fluvio" and not args:
+            return FluvioSink()
+        if kind == "null" and not args:
+            return NullSink()
+        if kind == "memory":
+            options = args.split(":") if args else []
+            if len(options) > 3:
+                raise ValueError("expected at most latency, capacity and bandwidth")
+            latency_ms, capacity, bandwidth_mb = options + [""] * (3 - len(options))
+            return MemorySink(
+                latency=float(latency_ms or 0) / 1000,
+                capacity=int(capacity or 0),
+                bandwidth=float(bandwidth_mb or 0) * 1e6,
+            )
+        if kind == "file" and args:
+            directory, _, format = args.partition(":")
+            return FileSink(directory, format or "ndjson")
+    except ValueError as e:
+        raise ValueError(f"Invalid sink {spec!r}: {e}") from None
+    raise ValueError(f"Unknown sink {spec!r}")
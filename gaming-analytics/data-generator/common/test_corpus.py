@@ -0,0 +1,94 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from corpus import Corpus, CorpusReplay, write_corpus  # noqa: E402
+from encoders import KEYED_EVENT, TimestampCache  # noqa: E402
+
+# 2024-01-02T03:04:05.123456 as the clock's nanoseconds
+STAMP_NS = 1704164645123456000
+STAMP = "2024-01-02T03:04:05.123456"
+
+
+def sample_records(count):
+    for i in range(count):
+        event = {"n": i, "event_timestamp": "2020-01-01T00:00:00.500000"}
+        if i % 3 == 0:
+            # isoformat() drops a zero fraction; the corpus pads it
+            event["event_timestamp"] = "2020-01-01T00:00:00"
+        if i % 5 == 0:
+            del event["event_timestamp"]
+        yield "topic_%d" % (i % 2), b"key_%d" % i, json.dumps(event).encode("utf-8")
+
+
+def write_sample(tmp_path, count=7):
+    path = str(tmp_path / "sample.corpus")
+    assert write_corpus(path, sample_records(count)) == count
+    return path
+
+
+def stream_lines(records):
+    return b"".join(KEYED_EVENT.format % (key, value) + b"\n\n" for _, key, value in records)
+
+
+def padded(records):
+    for topic, key, value in records:
+        yield topic, key, value.replace(b'00:00:00"', b'00:00:00.000000"')
+
+
+def test_chunks_and_records_match_the_written_records(tmp_path):
+    records = list(padded(sample_records(7)))
+    with Corpus(write_sample(tmp_path)) as corpus:
+        assert corpus.topics == ["topic_0", "topic_1"]
+        assert bytes(corpus.chunk(0, 7)) == stream_lines(records)
+        assert bytes(corpus.chunk(2, 3)) == stream_lines(records[2:5])
+        read = [(topic, bytes(key), bytes(value)) for topic, key, value in corpus.records(0, 7)]
+        assert read == records
+        del read
+
+
+def test_replay_wraps_around(tmp_path):
+    records = list(padded(sample_records(7)))
+    with Corpus(write_sample(tmp_path)) as corpus:
+        replay = CorpusReplay(corpus, start=5)
+        assert bytes(replay.next_chunk(4)) == stream_lines(records[5:] + records[:2])
+        assert replay.loops == 1
+        keys = [bytes(key) for _, key, _ in replay.next_records(7)]
+        assert keys == [key for _, key, _ in records[2:] + records[:2]]
+        assert replay.loops == 2
+
+
+def test_rewrite_timestamps_stamps_copies(tmp_path):
+    with Corpus(write_sample(tmp_path), rewrite_timestamps=True) as corpus:
+        corpus.timestamps = TimestampCache(clock=lambda: STAMP_NS, fixed_width=True)
+        replay = CorpusReplay(corpus)
+        first = replay.next_chunk(7)
+        assert isinstance(first, bytes)
+        events = [json.loads(line)["event"] for line in first.split(b"\n\n")[:-1]]
+        assert [event["n"] for event in events] == list(range(7))
+        assert [event.get("event_timestamp") for event in events] == [
+            None if n % 5 == 0 else STAMP for n in range(7)
+        ]
+
+        # Wrapping around stamps a new copy and leaves chunks already handed out alone
+        corpus.timestamps = TimestampCache(clock=lambda: STAMP_NS + 10**9, fixed_width=True)
+        second = replay.next_chunk(7)
+        assert second != first
+        assert first.count(STAMP.encode("ascii")) == 5
+        values = [bytes(value) for _, _, value in replay.next_records(7)]
+        assert all(STAMP.encode("ascii") not in value for value in values)
+
+    # Copies outlive the corpus
+    assert first.count(b"\n\n") == 7
+
+
+def test_close_with_a_view_still_held(tmp_path):
+    corpus = Corpus(write_sample(tmp_path))
+    chunk = corpus.chunk(0, 3)
+    with pytest.raises(BufferError):
+        corpus.close()
+    chunk.release()
+    corpus.close()
@@ -0,0 +1,72 @@
+import json
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from encoders import (  # noqa: E402
+    EPOCH, TIMESTAMP_WIDTH, BatchBuffer, EventEncoder, Float, Int, Raw, Text, TimestampCache, text_table,
+)
+
+
+def test_template_encodes_like_json_dumps():
+    encoder = EventEncoder({
+        "name": "100% événement",
+        "values": {"text": Text("text"), "count": Int("count"), "amount": Float("amount")},
+        "list": [1, 2.5, None, True, "x"],
+        "inner": Raw("inner"),
+        "again": Text("text"),
+    })
+    assert encoder.fields == ["text", "count", "amount", "inner", "text"]
+    rng = random.Random(9)
+    amounts = [0.1, 27.0, 1e-07, 1e22, -3.5, round(rng.uniform(0.99, 29.99), 2)]
+    for amount in amounts + [rng.uniform(-1e6, 1e6) for _ in range(200)]:
+        inner = {"n": rng.randrange(100)}
+        expected = json.dumps({
+            "name": "100% événement",
+            "values": {"text": "player_7", "count": -42, "amount": amount},
+            "list": [1, 2.5, None, True, "x"],
+            "inner": inner,
+            "again": "player_7",
+        }).encode("utf-8")
+        values = (b"player_7", -42, amount, json.dumps(inner).encode("utf-8"), b"player_7")
+        assert encoder.encode(values) == expected
+
+
+def test_text_table_rejects_strings_that_need_escaping():
+    assert text_table(["map_01", "PC"]) == [b"map_01", b"PC"]
+    for text in ['say "hi"', "back\\slash", "café", "tab\t"]:
+        with pytest.raises(ValueError):
+            text_table([text])
+
+
+def test_timestamps_match_isoformat():
+    # Across a leap day, with whole seconds, which isoformat() writes without a fraction
+    start = datetime(2024, 2, 28, 23, 59, 58)
+    micros = [0, 1, 999, 1000, 123456, 999999, 1000000, 1000001, 86400 * 10**6]
+    micros += sorted(random.Random(4).randrange(3 * 86400 * 10**6) for _ in range(500))
+    now_ns = 0
+    cache = TimestampCache(clock=lambda: now_ns)
+    fixed = TimestampCache(clock=lambda: now_ns, fixed_width=True)
+    for us in micros:
+        stamp = start + timedelta(microseconds=us)
+        # Nanoseconds below a microsecond are dropped, as datetime has none
+        now_ns = (stamp - EPOCH) // timedelta(microseconds=1) * 1000 + 789
+        assert cache.now() == stamp.isoformat().encode("ascii")
+        padded = fixed.now()
+        assert len(padded) == TIMESTAMP_WIDTH
+        assert datetime.fromisoformat(padded.decode("ascii")) == stamp
+
+
+def test_batch_buffer_records():
+    buffer = BatchBuffer(b"\n")
+    for record in (b"a", b"", b"ccc"):
+        buffer.append(record)
+    assert len(buffer) == 3
+    assert bytes(buffer.getbuffer()) == b"a\n\nccc\n"
+    assert [bytes(record) for record in buffer.records()] == [b"a", b"", b"ccc"]
+    buffer.clear()
+    assert len(buffer) == 0 and bytes(buffer.getbuffer()) == b""
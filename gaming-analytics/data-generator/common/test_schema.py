@@ -0,0 +1,122 @@
+import json
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from schema import Schema, SchemaCheck, load_schema  # noqa: E402
+
+PLAYER_EVENT = {
+    "event_name": "player_action",
+    "parameters": {
+        "player_id": "player_7", "session_id": "session_1234", "event_type": "move",
+        "level_id": "level_01", "map_id": "map_02",
+    },
+    "event_timestamp": "2024-01-02T03:04:05.123456",
+    "user_data": {"user_id": "player_7", "platform": "PC"},
+}
+
+PURCHASE_EVENT = {
+    "event_name": "transaction",
+    "parameters": {
+        "transaction_id": "trans_1001", "transaction_type": "purchase", "currency": "USD",
+        "amount": 3.5, "item_id": "potion", "item_type": "skin",
+    },
+    "event_timestamp": "2024-01-02T03:04:05",
+    "user_data": {"user_id": "player_7", "platform": "Console"},
+}
+
+
+@pytest.fixture(scope="module")
+def schema():
+    return load_schema()
+
+
+def test_generated_events_validate_and_encode_like_json_dumps(schema):
+    assert schema.validate("player-events", PLAYER_EVENT) is None
+    assert schema.validate("purchase-events", PURCHASE_EVENT) is None
+    assert schema.encode("player-events", PLAYER_EVENT) == json.dumps(PLAYER_EVENT).encode("utf-8")
+
+    rng = random.Random(2)
+    for _ in range(200):
+        event = json.loads(json.dumps(PURCHASE_EVENT))
+        event["parameters"]["amount"] = rng.choice([round(rng.uniform(0.99, 29.99), 2), rng.randrange(100)])
+        event["user_data"]["user_id"] = "pläyer \"%d\"\n" % rng.randrange(1000)
+        assert schema.encode("purchase-events", event) == json.dumps(event).encode("utf-8")
+
+
+def test_validation_names_the_first_bad_field(schema):
+    event = json.loads(json.dumps(PURCHASE_EVENT))
+    event["parameters"]["amount"] = "3.5"
+    assert schema.validate("purchase-events", event) == "purchase-event.parameters.amount: expected f64, got '3.5'"
+    event["parameters"]["amount"] = True
+    assert "expected f64" in schema.validate("purchase-events", event)
+    event["parameters"]["amount"] = float("nan")
+    assert "expected f64" in schema.validate("purchase-events", event)
+
+    event = json.loads(json.dumps(PLAYER_EVENT))
+    event["user_data"]["userid"] = event["user_data"].pop("user_id")
+    assert schema.validate("player-events", event) == "player-event.user_data.user_id: missing"
+    assert schema.validate("player-events", []) == "player-event: expected object, got list"
+
+
+def test_decode_summaries(schema):
+    summaries = [{"item_id": "potion", "total_amount": 3.5}, {"item_id": "sword", "total_amount": 20}]
+    data = json.dumps(summaries, separators=(",", ":")).encode("utf-8")
+    assert schema.decode("purchase-summaries", data) == summaries
+    assert schema.encoder("item-purchase-list", (",", ":"))(summaries) == data
+
+    with pytest.raises(ValueError, match="expected u32"):
+        schema.decode("player-session-summaries", b'[{"player_id": "player_1", "event_count": -1}]')
+    with pytest.raises(ValueError):
+        schema.decode("player-session-summaries", b"not json")
+
+
+def test_optional_properties_and_bad_definitions():
+    schema = Schema({
+        "tag": {"type": "object", "properties": {"name": {"type": "string"}}},
+        "item": {"type": "object", "properties": {
+            "id": {"type": "u8"},
+            "tag": {"type": "tag", "optional": True},
+            "flags": {"type": "list", "items": {"type": "bool"}},
+        }},
+    })
+    validate, encode = schema.validator("item"), schema.encoder("item")
+    for value in (
+        {"id": 1, "flags": []},
+        {"id": 255, "tag": None, "flags": [True, False]},
+        {"id": 0, "tag": {"name": "x"}, "flags": [False]},
+    ):
+        assert validate(value) is None
+        # A missing optional value is written as null
+        assert json.loads(encode(value)) == dict({"tag": None}, **value)
+    assert validate({"id": 256, "flags": []}) == "item.id: expected u8, got 256"
+    assert validate({"id": 1, "flags": [1]}) == "item.flags[]: expected bool, got int"
+
+    with pytest.raises(ValueError, match="unknown value type"):
+        Schema({"tag": {"type": "string"}}, topics={"tags": "missing"})
+    with pytest.raises(ValueError, match="Recursive"):
+        Schema({"node": {"type": "object", "properties": {"next": {"type": "node"}}}}).validator("node")
+    tree = {"type": "object", "properties": {"children": {"type": "list", "items": {"type": "tree"}}}}
+    with pytest.raises(ValueError, match="Recursive"):
+        Schema({"tree": tree}).encoder("tree")
+    with pytest.raises(ValueError, match="Recursive"):
+        Schema({"a": {"type": "b"}, "b": {"type": "a"}}).validator("a")
+    with pytest.raises(ValueError, match="Unknown type"):
+        Schema({"odd": {"type": "u128"}}).validator("odd")
+
+
+def test_sampled_check_counts_every_nth_event(schema):
+    check = SchemaCheck(schema, sample=0.25)
+    good = json.dumps(PLAYER_EVENT).encode("utf-8")
+    bad = json.dumps(dict(PLAYER_EVENT, event_name=None)).encode("utf-8")
+    # The first event and then every fourth, across batches
+    assert check.check_encoded("player-events", [bad, good, good, good, bad, good]) == 2
+    assert check.check_encoded("player-events", [good, good, bad]) == 1
+    assert check.failures["player-events"] == 3
+    # The next two aren't due, so even a bad one passes unchecked
+    assert check.check("player-events", PLAYER_EVENT) and check.check("player-events", {})
+    # Topics without a type aren't checked
+    assert check.check_encoded("server-metrics", [b"{}"]) == 0
@@ -0,0 +1,113 @@
+import json
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from windows import PLAYER_SESSION_ANALYTICS, PURCHASE_ANALYTICS, TumblingWindows  # noqa: E402
+
+# 2024-01-01T00:00:00 in epoch milliseconds
+BASE_MS = 1704067200000
+
+
+def player_event(user_id, ms):
+    timestamp = (datetime(2024, 1, 1) + timedelta(milliseconds=ms)).isoformat()
+    return json.dumps({
+        "event_name": "player_action",
+        "parameters": {"player_id": user_id},
+        "event_timestamp": timestamp,
+        "user_data": {"user_id": user_id, "platform": "PC"},
+    }).encode("utf-8")
+
+
+def purchase_event(item_id, amount, ms):
+    timestamp = (datetime(2024, 1, 1) + timedelta(milliseconds=ms)).isoformat()
+    return json.dumps({
+        "event_name": "transaction",
+        "parameters": {"amount": amount, "item_id": item_id},
+        "event_timestamp": timestamp,
+    }).encode("utf-8")
+
+
+def rows(results):
+    return [(result.start_ms - BASE_MS, result.rows, result.forced) for result in results]
+
+
+def test_watermark_closes_windows_in_order():
+    windows = TumblingWindows(PLAYER_SESSION_ANALYTICS)
+    assert windows.process([player_event(user, 1000) for user in "abcabc"]) == []
+    results = windows.process([player_event("a", 4999), player_event("c", 6000)])
+    # Ordered by the count; b and c tie and keep the order they first appeared in
+    assert rows(results) == [(0, [
+        {"player_id": "b", "event_count": 2},
+        {"player_id": "c", "event_count": 2},
+        {"player_id": "a", "event_count": 3},
+    ], False)]
+    assert results[0].encode() == json.dumps(results[0].rows, separators=(",", ":")).encode("utf-8")
+    assert rows(windows.advance(BASE_MS + 10_000)) == [(5000, [{"player_id": "c", "event_count": 1}], False)]
+    assert windows.watermark == BASE_MS + 10_000
+    assert windows.finish() == []
+
+
+def test_events_for_closed_windows_are_late():
+    windows = TumblingWindows(PURCHASE_ANALYTICS, lateness_ms=2000)
+    windows.process([purchase_event("sword", 2.5, 1000), purchase_event("shield", 1.0, 11_000)])
+    # The watermark is 9s, so the first window is still open
+    assert windows.process([purchase_event("sword", 0.25, 9000)]) == []
+    results = windows.process([purchase_event("shield", 1.0, 12_000)])
+    assert rows(results) == [(0, [{"item_id": "sword", "total_amount": 2.75}], False)]
+    windows.process([purchase_event("sword", 5.0, 3000), purchase_event("shield", 1.0, 13_000)])
+    assert windows.stats()["late_events"] == 1
+    assert rows(windows.finish()) == [(10_000, [{"item_id": "shield", "total_amount": 3.0}], False)]
+
+
+def test_too_many_open_windows_close_the_oldest():
+    windows = TumblingWindows(PLAYER_SESSION_ANALYTICS, lateness_ms=60_000, max_open_windows=2)
+    results = windows.process([player_event("a", ms) for ms in (0, 5000, 10_000)])
+    assert [(start, forced) for start, _, forced in rows(results)] == [(0, True)]
+    assert windows.stats()["forced_closes"] == 1 and windows.stats()["open_windows"] == 2
+
+
+def test_record_timestamps_replace_event_timestamps():
+    windows = TumblingWindows(PLAYER_SESSION_ANALYTICS)
+    values = [player_event("a", 0), player_event("b", 0)]
+    results = windows.process(values, [BASE_MS + 6000, BASE_MS + 11_000])
+    assert rows(results) == [(5000, [{"player_id": "a", "event_count": 1}], False)]
+
+
+def test_batches_read_like_single_events():
+    # Out of order, late, escaped and invalid events; a batch keeps the watermark each
+    # of its events arrived at, so batching doesn't change what is late
+    rng = random.Random(11)
+    values, ms = [], 0
+    for i in range(3000):
+        ms += rng.randrange(40)
+        event_ms = max(0, ms - rng.randrange(20_000)) if rng.random() < 0.05 else ms
+        item = rng.choice(["potion", "sword", 'gem "blue"'])
+        values.append(purchase_event(item, round(rng.uniform(1, 50), 2), event_ms))
+        if rng.random() < 0.01:
+            values.append(b'{"parameters": {"item_id": "bow"}}')
+
+    def run(batch_size):
+        windows = TumblingWindows(PURCHASE_ANALYTICS, lateness_ms=2000, max_open_windows=64)
+        results = []
+        for i in range(0, len(values), batch_size):
+            results.extend(windows.process(values[i:i + batch_size]))
+        results.extend(windows.finish())
+        return [(result.start_ms, result.encode()) for result in results], windows.stats()
+
+    single = run(1)
+    assert single[1]["late_events"] and single[1]["invalid_events"]
+    assert run(250) == single
+    assert run(len(values)) == single
+
+
+def test_timestamps_with_an_offset():
+    windows = TumblingWindows(PLAYER_SESSION_ANALYTICS)
+    values = [player_event(user, 1000) for user in "ab"]
+    values[1] = values[1].replace(b'00:00:01"', b'05:00:03+05:00"')
+    assert windows.process(values) == []
+    assert rows(windows.advance(BASE_MS + 5000)) == [
+        (0, [{"player_id": "a", "event_count": 1}, {"player_id": "b", "event_count": 1}], False)
+    ]
@@ -0,0 +1,450 @@
+import json
+import re
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from itertools import groupby
+from operator import itemgetter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+TIMESTAMP_FIELD = "event_timestamp"
+
+# Timestamps with the same first 19 characters ("2024-01-01T00:00:00") fall in the same second
+_SECOND_PREFIX = 19
+# Timestamps without an offset, as the generators write them; these sort in time order
+_NAIVE_TIMESTAMP = r"\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d(?:\.\d+)?"
+_NAIVE = re.compile(_NAIVE_TIMESTAMP)
+
+
+def _string_pattern(name: str):
+    # Unescaped string values only; an escaped one doesn't match and the batch falls back to json
+    return re.compile(b'"' + re.escape(name.encode("ascii")) + rb'":\s*"([^"\\]*)"')
+
+
+def _number_pattern(name: str):
+    return re.compile(b'"' + re.escape(name.encode("ascii")) + rb'":\s*(-?[0-9][0-9.eE+-]*)')
+
+
+def _lookup(event: dict, path: Tuple[str, ...]):
+    for name in path:
+        event = event[name]
+    return event
+
+
+def timestamp_ms(timestamp: str) -> int:
+    """
+    Milliseconds since the epoch of an ISO timestamp; timestamps without an
+    offset are UTC, as the generators write them.
+    """
+    parsed = datetime.fromisoformat(timestamp)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
+
+class _SecondTable(dict):
+    """
+    Second-resolution timestamp prefix -> epoch milliseconds, parsed on first use.
+    """
+
+    def __missing__(self, prefix: bytes) -> int:
+        if len(self) >= 4096:
+            self.clear()
+        millis = self[prefix] = timestamp_ms(prefix.decode("ascii"))
+        return millis
+
+
+_SECOND_TABLE = _SecondTable()
+
+
+class WindowService:
+    """
+    One windowed service from sdf/dataflow.yaml.
+
+    Events from the source topic are partitioned by the value at key_path and
+    aggregated per tumbling window of duration_ms: counted, or with value_path,
+    summed. Each closed window is one record on the sink topic, a list of
+    {key_name: key, value_name: aggregate} rows ordered by the aggregate, keys
+    with equal aggregates in the order they first appeared in the window.
+    """
+
+    def __init__(self, name: str, source: str, sink: str, duration_ms: int,
+                 key_path: Tuple[str, ...], key_name: str, value_name: str,
+                 value_path: Optional[Tuple[str, ...]] = None):
+        if duration_ms <= 0:
+            raise ValueError(f"Window duration of {name} must be positive, got {duration_ms} ms")
+        self.name = name
+        self.source = source
+        self.sink = sink
+        self.duration_ms = duration_ms
+        self.key_path = key_path
+        self.key_name = key_name
+        self.value_name = value_name
+        self.value_path = value_path
+
+
+# The services of sdf/dataflow.yaml
+PLAYER_SESSION_ANALYTICS = WindowService(
+    "player-session-analytics", "player-events", "player-session-summaries", 5_000,
+    key_path=("user_data", "user_id"), key_name="player_id", value_name="event_count",
+)
+PURCHASE_ANALYTICS = WindowService(
+    "purchase-analytics", "purchase-events", "purchase-summaries", 10_000,
+    key_path=("parameters", "item_id"), key_name="item_id", value_name="total_amount",
+    value_path=("parameters", "amount"),
+)
+SERVICES = [PLAYER_SESSION_ANALYTICS, PURCHASE_ANALYTICS]
+
+
+class WindowResult:
+    """
+    Output of one closed window: the record the service writes to its sink topic.
+    """
+    __slots__ = ("service", "start_ms", "end_ms", "rows", "closed_at", "forced")
+
+    def __init__(self, service: WindowService, start_ms: int, end_ms: int, rows: List[dict], forced: bool):
+        self.service = service
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.rows = rows
+        self.closed_at = time.time()
+        self.forced = forced
+
+    def encode(self) -> bytes:
+        """
+        The sink topic value, compact JSON like the dataflow's json converter writes.
+        """
+        return json.dumps(self.rows, separators=(",", ":")).encode("utf-8")
+
+
+class TumblingWindows:
+    """
+    Incremental tumbling-window aggregation of one service, with a watermark.
+
+    Windows start at multiples of the duration since the epoch. The watermark is
+    the highest event time seen minus lateness_ms; a window is closed and emitted
+    once the watermark reaches its end, and events for a closed window are
+    dropped as late. Only open windows hold state, so memory is bounded by the
+    number of keys per window; if more than max_open_windows are open (event
+    times spread wider than expected) the oldest is closed early.
+
+    Event times are the event_timestamp field unless process() is given record
+    timestamps, like the record times the dataflow's assign-timestamp uses.
+    Batches are read with one regex pass per field over the whole batch, which
+    assumes every event has each field once, as the generators write them.
+    Events with escapes go through json one by one; a batch with missing fields,
+    or whose first event reads differently with json, goes through json whole.
+    """
+
+    def __init__(self, service: WindowService, lateness_ms: int = 0, max_open_windows: int = 16):
+        if lateness_ms < 0:
+            raise ValueError(f"Allowed lateness must not be negative, got {lateness_ms} ms")
+        if max_open_windows < 1:
+            raise ValueError(f"max_open_windows must be at least 1, got {max_open_windows}")
+        self.service = service
+        self.lateness_ms = lateness_ms
+        self.max_open_windows = max_open_windows
+        self.windows: Dict[int, Counter] = {}
+        self.max_event_ms: Optional[int] = None
+        self.closed_until = None  # end of the last closed window
+        self.events = 0
+        self.late_events = 0
+        self.invalid_events = 0
+        self.forced_closes = 0
+
+        self.key_pattern = _string_pattern(service.key_path[-1])
+        self.value_pattern = _number_pattern(service.value_path[-1]) if service.value_path else None
+        self.naive_time_pattern = re.compile(
+            b'"' + TIMESTAMP_FIELD.encode("ascii") + rb'":\s*"(' + _NAIVE_TIMESTAMP.encode("ascii") + b')"'
+        )
+        self.time_pattern = _string_pattern(TIMESTAMP_FIELD)
+        # Whole-second windows and lateness only depend on the second of each timestamp
+        self.seconds = _SECOND_TABLE if (service.duration_ms % 1000 == 0 and lateness_ms % 1000 == 0) else None
+
+    @property
+    def watermark(self) -> Optional[int]:
+        return None if self.max_event_ms is None else self.max_event_ms - self.lateness_ms
+
+    def _times(self, times: List[bytes], naive: bool, every: bool = False):
+        # (event times, (lo, hi)) in epoch milliseconds. Unless every is set, the event times
+        # are None when the batch is in one window, as _add then only needs lo and hi
+        seconds = self.seconds
+        if seconds is None or not naive:
+            times = [timestamp_ms(t.decode("ascii")) for t in times]
+            return times, (min(times), max(times))
+        lo, hi = seconds[min(times)[:_SECOND_PREFIX]], seconds[max(times)[:_SECOND_PREFIX]]
+        if not every and hi < lo - lo % self.service.duration_ms + self.service.duration_ms:
+            return None, (lo, hi)
+        return list(map(seconds.__getitem__, [t[:_SECOND_PREFIX] for t in times])), (lo, hi)
+
+    def _event_ms(self, timestamp: str) -> int:
+        if self.seconds is not None and _NAIVE.fullmatch(timestamp):
+            return self.seconds[timestamp[:_SECOND_PREFIX].encode("ascii")]
+        return timestamp_ms(timestamp)
+
+    def _extract_fast(self, values: Sequence[bytes], with_times: bool):
+        # (keys, amounts, times, bounds, kept), kept being the positions read or None for all;
+        # or None if the batch has to go through json
+        batch = b"\n".join(values)
+        if b"\\" in batch:
+            return self._extract_mixed(values, with_times)
+        scanned = self._scan(values, batch, with_times)
+        if scanned is None:
+            return None
+        keys, amounts, times, naive = scanned
+        if not with_times:
+            return keys, amounts, None, None, None
+        try:
+            times, bounds = self._times(times, naive)
+        except ValueError:
+            return None
+        return keys, amounts, times, bounds, None
+
+    def _extract_mixed(self, values: Sequence[bytes], with_times: bool):
+        # The events with escapes through json and the rest through the regexes, merged back
+        # into batch order; mostly escaped batches go through json whole
+        escaped = [i for i, value in enumerate(values) if b"\\" in value]
+        if 2 * len(escaped) > len(values):
+            return None
+        skip = set(escaped)
+        kept = [i for i in range(len(values)) if i not in skip]
+        clean = [values[i] for i in kept]
+        scanned = self._scan(clean, b"\n".join(clean), with_times)
+        if scanned is None:
+            return None
+        keys, amounts, times, naive = scanned
+        if with_times:
+            try:
+                times = self._times(times, naive, every=True)[0]
+            except ValueError:
+                return None
+        json_keys, json_amounts, json_times, json_kept = self._extract_json([values[i] for i in escaped], with_times)
+        kept += [escaped[i] for i in json_kept]
+        order = sorted(range(len(kept)), key=kept.__getitem__)
+
+        def merged(column: Optional[list], json_column: Optional[list]) -> Optional[list]:
+            if column is None:
+                return None
+            column += json_column
+            return [column[i] for i in order]
+
+        return merged(keys, json_keys), merged(amounts, json_amounts), merged(times, json_times), None, \
+            [kept[i] for i in order]
+
+    def _scan(self, values: Sequence[bytes], batch: bytes, with_times: bool):
+        # keys, amounts and raw timestamps found once per event, and whether the timestamps
+        # are all naive; or None
+        count = len(values)
+        keys = self.key_pattern.findall(batch)
+        if len(keys) != count:
+            return None
+        amounts = None
+        if self.value_pattern is not None:
+            amounts = self.value_pattern.findall(batch)
+            if len(amounts) != count:
+                return None
+        times, naive = None, False
+        if with_times:
+            times = self.naive_time_pattern.findall(batch)
+            naive = len(times) == count
+            if not naive:
+                times = self.time_pattern.findall(batch)
+                if len(times) != count:
+                    return None
+        if not self._same_as_json(values[0], keys[0], amounts and amounts[0], times and times[0]):
+            return None
+        return keys, amounts, times, naive
+
+    def _same_as_json(self, value: bytes, key: bytes, amount: Optional[bytes], timestamp: Optional[bytes]) -> bool:
+        # Catches layouts the regexes misread, e.g. the same field name at another level
+        service = self.service
+        try:
+            event = json.loads(bytes(value))
+            return _lookup(event, service.key_path).encode("utf-8") == key and \
+                (amount is None or float(_lookup(event, service.value_path)) == float(amount)) and \
+                (timestamp is None or event[TIMESTAMP_FIELD].encode("ascii") == timestamp)
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return False
+
+    def _extract_json(self, values: Sequence[bytes], with_times: bool):
+        service = self.service
+        keys, amounts, times, kept = [], [], [], []
+        for i, value in enumerate(values):
+            try:
+                event = json.loads(bytes(value))
+                key = _lookup(event, service.key_path).encode("utf-8")
+                amount = float(_lookup(event, service.value_path)) if service.value_path else None
+                event_ms = self._event_ms(event[TIMESTAMP_FIELD]) if with_times else None
+            except (ValueError, KeyError, TypeError, AttributeError):
+                self.invalid_events += 1
+                continue
+            keys.append(key)
+            amounts.append(amount)
+            times.append(event_ms)
+            kept.append(i)
+        return keys, amounts if service.value_path else None, times if with_times else None, kept
+
+    def process(self, values: Sequence[bytes], timestamps: Optional[Sequence[int]] = None) -> List[WindowResult]:
+        """
+        Add a batch of event values from the source topic, in arrival order, and
+        return the windows the batch closed. timestamps, if given, are the
+        records' event times in epoch milliseconds.
+        """
+        if not values:
+            return []
+        extracted = self._extract_fast(values, timestamps is None)
+        bounds = None
+        if extracted is None:
+            keys, amounts, times, kept = self._extract_json(values, timestamps is None)
+        else:
+            keys, amounts, times, bounds, kept = extracted
+        if timestamps is not None:
+            times = list(timestamps) if kept is None else [timestamps[i] for i in kept]
+        if keys:
+            self._add(keys, amounts, times, bounds)
+        return self._close()
+
+    def _add(self, keys: List[bytes], amounts: Optional[List[bytes]], times: Optional[List[int]],
+             bounds: Optional[Tuple[int, int]] = None):
+        duration = self.service.duration_ms
+        self.events += len(keys)
+        lo, hi = bounds if bounds is not None else (min(times), max(times))
+        start = lo - lo % duration
+        if hi < start + duration:
+            # The usual case: the whole batch is in one window, so either all of it is late or none
+            watermark = self.watermark
+            if (self.closed_until is not None and start < self.closed_until) or \
+                    (watermark is not None and start + duration <= watermark):
+                self.late_events += len(keys)
+            else:
+                self._update(self._window(start), keys, amounts)
+            self.max_event_ms = hi if self.max_event_ms is None else max(self.max_event_ms, hi)
+            return
+
+        # Run by run of events in the same window. Events of a run arrive at a watermark
+        # no lower than the one before the run, and the run's own events can't take it
+        # past the run's window, so either all of a run is late or none of it
+        mark = self.max_event_ms if self.max_event_ms is not None else lo
+        closed_until = self.closed_until
+        groups: Dict[int, Tuple[list, list]] = {}
+        first = 0
+        for start, run in groupby([event_ms - event_ms % duration for event_ms in times]):
+            last = first + len(list(run))
+            if (closed_until is not None and start < closed_until) or start + duration <= mark - self.lateness_ms:
+                self.late_events += last - first
+            else:
+                group = groups.get(start)
+                if group is None:
+                    group = groups[start] = ([], [])
+                group[0].extend(keys[first:last])
+                if amounts is not None:
+                    group[1].extend(amounts[first:last])
+            mark = max(mark, max(times[first:last]))
+            first = last
+        for start, (group_keys, group_amounts) in groups.items():
+            self._update(self._window(start), group_keys, group_amounts if amounts is not None else None)
+        self.max_event_ms = mark
+
+    def _window(self, start: int) -> Counter:
+        window = self.windows.get(start)
+        if window is None:
+            window = self.windows[start] = Counter()
+        return window
+
+    @staticmethod
+    def _update(window: Counter, keys: List[bytes], amounts: Optional[List[bytes]]):
+        if amounts is None:
+            window.update(keys)
+            return
+        get = window.get
+        for key, amount in zip(keys, map(float, amounts)):
+            window[key] = get(key, 0.0) + amount
+
+    def _close(self, until: Optional[int] = None) -> List[WindowResult]:
+        if until is None:
+            until = self.watermark
+        results = []
+        for start in sorted(self.windows):
+            forced = len(self.windows) > self.max_open_windows
+            if not forced and (until is None or start + self.service.duration_ms > until):
+                break
+            results.append(self._emit(start, forced))
+        return results
+
+    def _emit(self, start: int, forced: bool = False) -> WindowResult:
+        service = self.service
+        end = start + service.duration_ms
+        window = self.windows.pop(start)
+        self.closed_until = end if self.closed_until is None else max(self.closed_until, end)
+        if forced:
+            self.forced_closes += 1
+        is_sum = service.value_path is not None
+        # Like the dataflow's "order by" on the aggregate alone; the sort is stable,
+        # so ties stay in state order
+        rows = [
+            {service.key_name: key.decode("utf-8"), service.value_name: float(value) if is_sum else value}
+            for key, value in sorted(window.items(), key=itemgetter(1))
+        ]
+        return WindowResult(service, start, end, rows, forced)
+
+    def advance(self, now_ms: int) -> List[WindowResult]:
+        """
+        Move the watermark to now_ms - lateness_ms even without events, e.g. from
+        the wall clock when the source is idle, and return the windows it closes.
+        """
+        if self.max_event_ms is None or now_ms > self.max_event_ms:
+            self.max_event_ms = now_ms
+        return self._close()
+
+    def finish(self) -> List[WindowResult]:
+        """
+        Close every open window, at the end of a finite input.
+        """
+        return [self._emit(start) for start in sorted(self.windows)]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "events": self.events,
+            "late_events": self.late_events,
+            "invalid_events": self.invalid_events,
+            "open_windows": len(self.windows),
+            "open_keys": sum(len(window) for window in self.windows.values()),
+            "forced_closes": self.forced_closes,
+        }
+
+
+class WindowEngine:
+    """
+    The dataflow's windowed services, fed records by source topic.
+    """
+
+    def __init__(self, services: Sequence[WindowService] = SERVICES, lateness_ms: int = 0,
+                 max_open_windows: int = 16):
+        self.windows: Dict[str, List[TumblingWindows]] = {}
+        for service in services:
+            self.windows.setdefault(service.source, []).append(
+                TumblingWindows(service, lateness_ms, max_open_windows)
+            )
+
+    def process(self, topic: str, values: Sequence[bytes],
+                timestamps: Optional[Sequence[int]] = None) -> List[WindowResult]:
+        """
+        Add a batch of values from topic and return the windows it closed. Topics
+        no service reads are ignored.
+        """
+        results = []
+        for windows in self.windows.get(topic, ()):
+            results.extend(windows.process(values, timestamps))
+        return results
+
+    def advance(self, now_ms: int) -> List[WindowResult]:
+        return [result for windows in self._all() for result in windows.advance(now_ms)]
+
+    def finish(self) -> List[WindowResult]:
+        return [result for windows in self._all() for result in windows.finish()]
+
+    def _all(self) -> List[TumblingWindows]:
+        return [windows for per_topic in self.windows.values() for windows in per_topic]
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {windows.service.name: windows.stats() for windows in self._all()}
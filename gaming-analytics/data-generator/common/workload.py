@@ -0,0 +1,400 @@
+import itertools
+import json
+import random
+from array import array
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+# The sample item catalogue, and the weights the Fluvio client has always drawn it with
+ITEMS = ["sword", "shield", "potion", "armor", "skin_dragon", "skin_phoenix"]
+ITEM_WEIGHTS = [0.1, 0.1, 0.2, 0.15, 0.21, 0.18]
+
+TOPICS = ("player-events", "purchase-events", "server-metrics")
+
+# Key spaces up to this size keep a table of their encoded keys; larger ones format on draw
+KEY_TABLE_LIMIT = 1 << 16
+
+
+class AliasTable:
+    """
+    Walker/Vose alias table for O(1) sampling of an index from a fixed discrete
+    distribution, held in arrays so it scales to tens of millions of outcomes.
+    """
+
+    def __init__(self, probability: array, alias: array):
+        self.probability = probability
+        self.alias = alias
+        self.size = len(probability)
+
+    @classmethod
+    def build(cls, weights: Sequence[float]) -> "AliasTable":
+        """
+        Build from non-negative weights. Uses NumPy when it's installed, which
+        builds a ten million outcome table in seconds instead of minutes.
+        """
+        if len(weights) == 0:
+            raise ValueError("An alias table needs at least one weight")
+        try:
+            import numpy as np
+        except ImportError:
+            return cls._build_python(weights)
+        return cls._build_numpy(np, np.asarray(weights, dtype=np.float64))
+
+    @classmethod
+    def _build_python(cls, weights: Sequence[float]) -> "AliasTable":
+        n = len(weights)
+        total = sum(weights)
+        if not total > 0:
+            raise ValueError("Alias table weights must have a positive sum")
+        scaled = array('d', [weight * n / total for weight in weights])
+        probability = array('d', [1.0]) * n
+        alias = array('q', range(n))
+        small = array('q', [i for i, p in enumerate(scaled) if p < 1.0])
+        large = array('q', [i for i, p in enumerate(scaled) if p >= 1.0])
+        while small and large:
+            s, g = small.pop(), large.pop()
+            probability[s] = scaled[s]
+            alias[s] = g
+            scaled[g] -= 1.0 - scaled[s]
+            (small if scaled[g] < 1.0 else large).append(g)
+        # Leftovers are 1.0 up to rounding error
+        return cls(probability, alias)
+
+    @classmethod
+    def _build_numpy(cls, np, weights) -> "AliasTable":
+        """
+        Vose's pairing in closed form. Small outcomes (scaled below 1) are taken in
+        order and fill up the large ones in order: small j is aliased to the first
+        large whose cumulative excess is past the deficit of the smalls before j.
+        A large that has given away its excess is topped up by the next large, as
+        in the sequential algorithm, so its probability is 1 minus the overshoot.
+        """
+        n = len(weights)
+        total = weights.sum()
+        if not total > 0 or (weights < 0).any():
+            raise ValueError("Alias table weights must be non-negative with a positive sum")
+        scaled = weights * (n / total)
+        probability = np.ones(n)
+        alias = np.arange(n, dtype=np.int64)
+
+        is_small = scaled < 1.0
+        small = np.flatnonzero(is_small)
+        large = np.flatnonzero(~is_small)
+        if len(small) and len(large):
+            deficit = np.cumsum(1.0 - scaled[small])
+            excess = np.cumsum(scaled[large] - 1.0)
+            probability[small] = scaled[small]
+            before = np.concatenate(([0.0], deficit[:-1]))
+            owner = np.minimum(np.searchsorted(excess, before, side='right'), len(large) - 1)
+            alias[small] = large[owner]
+
+            # The small that empties large i: its top-up comes from large i + 1
+            emptied_by = np.minimum(np.searchsorted(deficit, excess[:-1], side='left'), len(deficit) - 1)
+            overshoot = deficit[emptied_by] - excess[:-1]
+            emptied = (overshoot > 0) & (before[emptied_by] < excess[:-1])
+            topped_up = large[:-1][emptied]
+            probability[topped_up] = np.clip(1.0 - overshoot[emptied], 0.0, 1.0)
+            alias[topped_up] = large[1:][emptied]
+        return cls(array('d', probability.tobytes()), array('q', alias.tobytes()))
+
+    def sample(self, rng=random) -> int:
+        """
+        Draw an index using a single uniform variate.
+        """
+        u = rng.random() * self.size
+        i = int(u)
+        return i if u - i < self.probability[i] else self.alias[i]
+
+
+def _total(weights) -> float:
+    return weights.sum() if hasattr(weights, "sum") else sum(weights)
+
+
+def zipf_weights(count: int, skew: float) -> List[float]:
+    """
+    Zipf (power law) weights 1 / rank ** skew for ranks 1..count.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        return [rank ** -skew for rank in range(1, count + 1)]
+    return np.arange(1, count + 1, dtype=np.float64) ** -skew
+
+
+class KeySpace:
+    """
+    A set of keys to draw from: prefix_1 .. prefix_count, or given names.
+
+    With skew 0 every key is equally likely; with skew s > 0 key rank r (the
+    first key is the hottest) is drawn in proportion to 1 / r ** s, so a few keys
+    dominate. Explicit weights override the skew. Skewed draws go through an alias
+    table, and every draw costs O(1) whatever the cardinality. Small key spaces
+    keep their encoded keys in a table; large ones format a key when it's drawn.
+
+    A key space can be split into disjoint parts (see partition); a part's key i
+    is prefix_(offset + stride * i + 1) of the whole.
+    """
+
+    def __init__(
+        self,
+        prefix: str,
+        count: int,
+        skew: float = 0.0,
+        names: Optional[Sequence[str]] = None,
+        weights: Optional[Sequence[float]] = None,
+        offset: int = 0,
+        stride: int = 1,
+    ):
+        if names is not None:
+            count = len(names)
+        if count <= 0:
+            raise ValueError(f"Key space {prefix} needs at least one key, got {count}")
+        if skew < 0:
+            raise ValueError(f"skew must not be negative, got {skew}")
+        if weights is not None and len(weights) != count:
+            raise ValueError(f"Key space {prefix} has {count} keys but {len(weights)} weights")
+        self.prefix = prefix
+        self.count = count
+        self.skew = skew
+        self.weights = weights
+        self.offset = offset
+        self.stride = stride
+        if weights is None and skew > 0:
+            weights = zipf_weights(count, skew)
+        self.table = AliasTable.build(weights) if weights is not None else None
+
+        self.named = names is not None
+        self.names = list(names) if names is not None else None
+        self.name_bytes = None
+        if self.names is None and count <= KEY_TABLE_LIMIT:
+            self.names = [f"{prefix}_{offset + stride * i + 1}" for i in range(count)]
+        if self.names is not None:
+            self.name_bytes = [name.encode("utf-8") for name in self.names]
+        self.prefix_bytes = f"{prefix}_".encode("utf-8")
+
+    def index(self, rng=random) -> int:
+        if self.table is not None:
+            return self.table.sample(rng)
+        # The draw random.choice makes, so the default profile replays seeded runs
+        return rng.randrange(self.count)
+
+    def draw(self, rng=random) -> str:
+        i = self.index(rng)
+        return self.names[i] if self.names is not None else f"{self.prefix}_{self.offset + self.stride * i + 1}"
+
+    def draw_bytes(self, rng=random) -> bytes:
+        i = self.index(rng)
+        if self.name_bytes is not None:
+            return self.name_bytes[i]
+        return b"%s%d" % (self.prefix_bytes, self.offset + self.stride * i + 1)
+
+    def partition(self, part: int, parts: int) -> Tuple[Optional["KeySpace"], float]:
+        """
+        Keys part, part + parts, part + 2 * parts, ... of this space, drawn with
+        their weights here, and the fraction of draws from the whole space that
+        fall on them. The part is None if parts exceeds the keys.
+        """
+        if not 0 <= part < parts:
+            raise ValueError(f"Part {part} is outside 0..{parts - 1}")
+        count = len(range(part, self.count, parts))
+        if count == 0:
+            return None, 0.0
+        weights = self.weights
+        if weights is None and self.skew > 0:
+            weights = zipf_weights(self.count, self.skew)
+        if weights is None:
+            share, part_weights = count / self.count, None
+        else:
+            part_weights = weights[part::parts]
+            share = float(_total(part_weights) / _total(weights))
+        names = self.names[part::parts] if self.named else None
+        space = KeySpace(self.prefix, count, self.skew, names, part_weights,
+                         self.offset + part * self.stride, self.stride * parts)
+        return space, share
+
+
+class TransactionIds:
+    """
+    Transaction id numbers: 'random' draws from 1000-9999 as the generators always
+    have, so ids collide; 'monotonic' counts up from start, so every id is unique.
+    """
+
+    def __init__(self, mode: str = "random", start: int = 1, offset: int = 0, stride: int = 1):
+        if mode not in ("random", "monotonic"):
+            raise ValueError(f"Unknown transaction id mode: {mode}")
+        self.mode = mode
+        self.start = start
+        self.offset = offset
+        self.stride = stride
+        self.counter = itertools.count(start + offset, stride)
+        # The random ids offset, offset + stride, ... above 1000
+        self.random_count = len(range(offset, 9000, stride))
+
+    def next(self, rng=random) -> int:
+        if self.mode == "monotonic":
+            return next(self.counter)
+        # randint(1000, 9999) when not partitioned: the same draw
+        return 1000 + self.offset + self.stride * rng.randrange(self.random_count)
+
+    def partition(self, part: int, parts: int) -> "TransactionIds":
+        """
+        Every parts-th id from part on, so parts never hand out the same id.
+        """
+        return TransactionIds(self.mode, self.start, self.offset + part * self.stride, self.stride * parts)
+
+
+class Workload:
+    """
+    What the generators draw: the player, item and server key spaces, how
+    transaction ids are made and the mix of event types.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        players: KeySpace,
+        items: KeySpace,
+        servers: KeySpace,
+        transaction_ids: TransactionIds,
+        mix: Mapping[str, float],
+    ):
+        unknown = set(mix) - set(TOPICS)
+        if unknown:
+            raise ValueError(f"Unknown event types in the workload mix: {sorted(unknown)}")
+        if any(weight < 0 for weight in mix.values()) or not sum(mix.values()) > 0:
+            raise ValueError("The workload mix needs non-negative weights with a positive sum")
+        self.name = name
+        self.players = players
+        self.items = items
+        self.servers = servers
+        self.transaction_ids = transaction_ids
+        self.mix = {topic: float(mix.get(topic, 0.0)) for topic in TOPICS}
+        self.mix_table = AliasTable.build([self.mix[topic] for topic in TOPICS])
+        # Smooth weighted round robin state, see next_topic
+        self.current = {topic: 0.0 for topic in TOPICS}
+
+    def partition(self, part: int, parts: int) -> Tuple["Workload", Dict[str, float]]:
+        """
+        The share of this workload whose keys belong to part of parts, and the
+        fraction of each topic's events it makes. Player and purchase events go
+        with their player, server metrics with their server, and transaction ids
+        are interleaved, so no two parts ever produce the same key. A part that
+        owns none of a key space gets None for it and a share of 0.
+        """
+        players, player_share = self.players.partition(part, parts)
+        servers, server_share = self.servers.partition(part, parts)
+        workload = Workload(
+            f"{self.name} part {part + 1}/{parts}", players, self.items, servers,
+            self.transaction_ids.partition(part, parts), self.mix,
+        )
+        shares = {"player-events": player_share, "purchase-events": player_share, "server-metrics": server_share}
+        return workload, shares
+
+    def choose_topic(self, rng=random) -> str:
+        """
+        A random event type, drawn with the mix weights.
+        """
+        return TOPICS[self.mix_table.sample(rng)]
+
+    def next_topic(self) -> str:
+        """
+        The next event type of a deterministic interleaving that follows the mix
+        exactly (smooth weighted round robin). With an even mix it cycles through
+        the types in order.
+        """
+        total = sum(self.mix.values())
+        best = None
+        for topic in TOPICS:
+            self.current[topic] += self.mix[topic]
+            if best is None or self.current[topic] > self.current[best]:
+                best = topic
+        self.current[best] -= total
+        return best
+
+    def topic_counts(self, count: int) -> Dict[str, int]:
+        """
+        Split count events per type (count * number of types in all) across the
+        types by the mix, largest remainder first. An even mix gives count each.
+        """
+        total = count * len(TOPICS)
+        weight_sum = sum(self.mix.values())
+        exact = {topic: total * weight / weight_sum for topic, weight in self.mix.items()}
+        counts = {topic: int(value) for topic, value in exact.items()}
+        by_remainder = sorted(TOPICS, key=lambda topic: (-(exact[topic] - counts[topic]), TOPICS.index(topic)))
+        for topic in by_remainder[:total - sum(counts.values())]:
+            counts[topic] += 1
+        return counts
+
+
+# Built-in profiles. 'default' is the generators' original sample data.
+PROFILES: Dict[str, Dict[str, Any]] = {
+    "default": {
+        "players": {"count": 99},
+        "items": {"names": ITEMS, "weights": ITEM_WEIGHTS},
+        "servers": {"count": 3},
+        "transaction_ids": "random",
+        "mix": {"player-events": 1, "purchase-events": 1, "server-metrics": 1},
+    },
+    # Production-like: a large player base with whales, a long item tail
+    "skewed": {
+        "players": {"count": 1_000_000, "skew": 1.1},
+        "items": {"count": 1_000, "skew": 1.2},
+        "servers": {"count": 50, "skew": 0.5},
+        "transaction_ids": "monotonic",
+        "mix": {"player-events": 8, "purchase-events": 1, "server-metrics": 1},
+    },
+    # A handful of keys carry most of the traffic, to stress one partition and its keyed state
+    "hot-partition": {
+        "players": {"count": 10_000_000, "skew": 1.5},
+        "items": {"count": 100, "skew": 2.0},
+        "servers": {"count": 10, "skew": 2.0},
+        "transaction_ids": "monotonic",
+        "mix": {"player-events": 4, "purchase-events": 4, "server-metrics": 1},
+    },
+}
+
+
+def _key_space(prefix: str, config: Mapping[str, Any]) -> KeySpace:
+    unknown = set(config) - {"count", "skew", "names", "weights"}
+    if unknown:
+        raise ValueError(f"Unknown {prefix} settings in the workload: {sorted(unknown)}")
+    names = config.get("names")
+    if names is None and "count" not in config:
+        raise ValueError(f"The workload's {prefix} key space needs a count or names")
+    return KeySpace(prefix, config.get("count", 0), config.get("skew", 0.0), names, config.get("weights"))
+
+
+def build_workload(config: Mapping[str, Any], name: str = "custom") -> Workload:
+    """
+    Build a workload from a profile dict; missing sections come from 'default'.
+    """
+    config = dict(PROFILES["default"], **config)
+    transaction_ids = config["transaction_ids"]
+    if isinstance(transaction_ids, str):
+        transaction_ids = {"mode": transaction_ids}
+    return Workload(
+        name,
+        players=_key_space("player", config["players"]),
+        items=_key_space("item", config["items"]),
+        servers=_key_space("server", config["servers"]),
+        transaction_ids=TransactionIds(transaction_ids.get("mode", "random"), transaction_ids.get("start", 1)),
+        mix=config["mix"],
+    )
+
+
+def load_workload(spec: Optional[str]) -> Workload:
+    """
+    A workload from a built-in profile name (see PROFILES) or a JSON or YAML
+    profile file. None gives 'default'.
+    """
+    spec = spec or "default"
+    if spec in PROFILES:
+        return build_workload(PROFILES[spec], spec)
+    if spec.endswith((".yaml", ".yml")):
+        import yaml
+
+        with open(spec) as f:
+            return build_workload(yaml.safe_load(f), spec)
+    if spec.endswith(".json"):
+        with open(spec) as f:
+            return build_workload(json.load(f), spec)
+    raise ValueError(f"Unknown workload profile {spec!r}, expected one of {', '.join(PROFILES)} or a .json/.yaml file")
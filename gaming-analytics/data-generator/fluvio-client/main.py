@@ -1,24 +1,58 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import queue
 import random
+import signal
+import sys
+import threading
 import time
+from collections import deque
 from datetime import datetime
-from fluvio import Fluvio
+from pathlib import Path
 import json
 
-# Connect to the Fluvio client
-fluvio = Fluvio.connect()
+# Shared generator modules live in data-generator/common, and the simulator in gs-funnel
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "gs-funnel"))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "common"))
+from corpus import open_replay, write_corpus
+from encoders import PLAYER_EVENT, PURCHASE_EVENT, SERVER_METRIC, TimestampCache, text_table
+from event_stream import PLAYER_TOPIC, SERVER_TOPIC, create_simulator, encode_topic_records, topic_chunks
+from metrics import REGISTRY, SampledLog, SamplingProfiler, serve_metrics, toggle_profiler_on_signal
+from pacing import Pacer, ScaledRate, parse_profile
+from pipeline import EXECUTORS, StagedPipeline
+from schema import SchemaCheck, load_schema
+from sinks import create_sink
+from workload import TOPICS, load_workload
+
+# Runtime metrics, served with --metrics-port
+EVENTS_GENERATED = REGISTRY.counter("generator_events_generated", "Events generated", ["topic"])
+RECORDS_SENT = REGISTRY.counter("generator_records_sent", "Records handed to the sink", ["topic"])
+ENCODE_SECONDS = REGISTRY.histogram("generator_encode_seconds", "Time to encode one record", ["topic"])
+BATCH_ENCODE_SECONDS = REGISTRY.histogram("generator_batch_encode_seconds", "Time to generate one batch for all topics")
+SEND_SECONDS = REGISTRY.histogram("generator_send_seconds", "Time in send or send_all", ["topic"])
+FLUSH_SECONDS = REGISTRY.histogram("generator_flush_seconds", "Time in flush", ["topic"])
+BATCH_QUEUE_DEPTH = REGISTRY.gauge("generator_batch_queue_depth", "Generated batches waiting to be sent")
+IN_FLIGHT_BATCHES = REGISTRY.gauge("generator_in_flight_batches", "Batches sent but not yet flushed")
+SCHEDULE_LAG = REGISTRY.gauge("generator_schedule_lag_seconds", "How far sending is behind the pacing schedule")
+SEND_ERRORS = REGISTRY.counter("generator_send_errors", "Failed sends in workers mode", ["topic"])
+FLUSH_ERRORS = REGISTRY.counter("generator_flush_errors", "Failed flushes in workers mode", ["topic"])
+WORKER_RECORDS_SENT = REGISTRY.counter("generator_worker_records_sent", "Records sent per worker", ["worker"])
+
+# Players, items, servers, transaction ids and the event mix; set with --workload
+workload = load_workload(os.environ.get("WORKLOAD_PROFILE"))
+# Sampled checks of generated events against the dataflow's types; set with --validate
+schema_check = None
 
 # Sample data templates
-player_ids = [f"player_{i}" for i in range(1, 100)]
-items = ["sword", "shield", "potion", "armor", "skin_dragon", "skin_phoenix"]
-item_weights = [0.1, 0.1, 0.2, 0.15, 0.21, 0.18]
 maps = ["map_01", "map_02", "map_03"]
 levels = ["level_01", "level_02", "level_03"]
-servers = ["server_1", "server_2", "server_3"]
 platforms = ["PC", "Console"]
 
 # Function to generate player event
 def generate_player_event():
-    player_id = random.choice(player_ids)
+    player_id = workload.players.draw()
     return {
         "key": player_id,
         "event": {
@@ -40,8 +74,8 @@ def generate_player_event():
 
 # Function to generate purchase event
 def generate_purchase_event():
-    transaction_id = f"trans_{random.randint(1000, 9999)}"
-    player_id = random.choice(player_ids)
+    transaction_id = f"trans_{workload.transaction_ids.next()}"
+    player_id = workload.players.draw()
 
     return {
         "key": transaction_id,
@@ -52,7 +86,7 @@ def generate_purchase_event():
                 "transaction_type": "purchase",
                 "currency": "USD",
                 "amount": round(random.uniform(0.99, 29.99), 2),
-                "item_id": random.choices(items, weights=item_weights, k=1)[0],
+                "item_id": workload.items.draw(),
                 "item_type": "skin"
             },
             "event_timestamp": datetime.utcnow().isoformat(),
@@ -65,7 +99,7 @@ def generate_purchase_event():
 
 # Function to generate server metric event
 def generate_server_metric():
-    server_id = random.choice(servers)
+    server_id = workload.servers.draw()
     return {
         "key": server_id,
         "event": {
@@ -84,39 +118,568 @@ def generate_server_metric():
         }
     }
 
-# Publish events to Fluvio topics
-def publish_events():
+# Encode a generated event as a (key, value) record
+def encode_record(event_data):
+    return event_data["key"].encode("utf-8"), json.dumps(event_data["event"]).encode("utf-8")
+
+# Sample what is sent instead of printing every event
+log_player_event = SampledLog()
+log_purchase_event = SampledLog()
+log_server_metric = SampledLog()
+
+# Send one event and flush it, recording the time each step takes
+def send_and_flush(producer, topic, event_data):
+    metrics = single_metrics.get(topic)
+    if metrics is None:
+        metrics = single_metrics[topic] = tuple(
+            metric.labels(topic)
+            for metric in (EVENTS_GENERATED, ENCODE_SECONDS, SEND_SECONDS, FLUSH_SECONDS, RECORDS_SENT)
+        )
+    generated, encode_seconds, send_seconds, flush_seconds, sent = metrics
+    generated.inc()
+    if schema_check is not None:
+        schema_check.check(topic, event_data["event"])
+    with encode_seconds.time():
+        record = encode_record(event_data)
+    with send_seconds.time():
+        producer.send(*record)
+    with flush_seconds.time():
+        producer.flush()
+    sent.inc()
+
+# send_and_flush's labelled metrics, looked up once per topic
+single_metrics = {}
+
+# Publish events to the sink's topics, one event per topic each time the pacer
+# allows. A workload with an uneven mix sends as many events, interleaved by its mix.
+def publish_events(pacer, sink):
+    SCHEDULE_LAG.set_function(lambda: pacer.lag)
     try:
-        # Producers for each topic
-        player_topic = fluvio.topic_producer("player-events")
-        purchase_topic = fluvio.topic_producer("purchase-events")
-        server_topic = fluvio.topic_producer("server-metrics")
+        # Producers, generators and logs for each topic
+        topics = {
+            "player-events": (sink.topic_producer("player-events"), generate_player_event,
+                              log_player_event, "player event"),
+            "purchase-events": (sink.topic_producer("purchase-events"), generate_purchase_event,
+                                log_purchase_event, "purchase event"),
+            "server-metrics": (sink.topic_producer("server-metrics"), generate_server_metric,
+                               log_server_metric, "server metric"),
+        }
 
         while True:
-            # Generate events
-            player_event_data = generate_player_event()
-            purchase_event_data = generate_purchase_event()
-            server_metric_data = generate_server_metric()
+            for _ in range(pacer.next_batch() * len(topics)):
+                topic = workload.next_topic()
+                producer, generate, log, name = topics[topic]
+                event_data = generate()
 
-            # Encode key and event as UTF-8 bytes
-            player_topic.send(player_event_data["key"].encode("utf-8"), json.dumps(player_event_data["event"]).encode("utf-8"))
-            player_topic.flush()
+                # Encode key and event as UTF-8 bytes
+                send_and_flush(producer, topic, event_data)
+                log(lambda: f"Sent {name}: {event_data}")
 
-            purchase_topic.send(purchase_event_data["key"].encode("utf-8"), json.dumps(purchase_event_data["event"]).encode("utf-8"))
-            purchase_topic.flush()
+    except Exception as e:
+        logging.error(f"An error occurred: {e}")
 
-            server_topic.send(server_metric_data["key"].encode("utf-8"), json.dumps(server_metric_data["event"]).encode("utf-8"))
-            server_topic.flush()
+# The sample data pre-encoded for the byte-level encoders below
+map_bytes = text_table(maps)
+level_bytes = text_table(levels)
+platform_bytes = text_table(platforms)
+player_event_type_bytes = text_table(["move", "interaction", "level_complete"])
+timestamps = TimestampCache()
 
-            print(f"Sent player event: {player_event_data}")
-            print(f"Sent purchase event: {purchase_event_data}")
-            print(f"Sent server metric: {server_metric_data}")
+# Encoders of player, purchase and server metric events straight to (key, value)
+# records, drawing keys from workload, as (topic, encode) pairs. They make the same
+# random draws as the generate_* functions and produce the same bytes as
+# encode_record, without building the event dicts.
+def topic_encoders(workload):
+    players, items, servers = workload.players, workload.items, workload.servers
+    transaction_ids = workload.transaction_ids
 
-            time.sleep(1 / 100)  # Generate 100 events per second
+    def encode_player_event():
+        player_id = players.draw_bytes()
+        return player_id, PLAYER_EVENT.format % (
+            player_id,
+            b"session_%d" % random.randint(1000, 9999),
+            random.choice(player_event_type_bytes),
+            random.choice(level_bytes),
+            random.choice(map_bytes),
+            timestamps.now(),
+            player_id,
+            random.choice(platform_bytes),
+        )
 
-    except Exception as e:
-        print(f"An error occurred: {e}")
+    def encode_purchase_event():
+        transaction_id = b"trans_%d" % transaction_ids.next()
+        player_id = players.draw_bytes()
+        return transaction_id, PURCHASE_EVENT.format % (
+            transaction_id,
+            round(random.uniform(0.99, 29.99), 2),
+            items.draw_bytes(),
+            timestamps.now(),
+            player_id,
+            random.choice(platform_bytes),
+        )
+
+    def encode_server_metric():
+        server_id = servers.draw_bytes()
+        return server_id, SERVER_METRIC.format % (
+            server_id,
+            random.randint(20, 100),
+            random.randint(30, 90),
+            random.randint(50, 300),
+            timestamps.now(),
+        )
+
+    return [
+        ("player-events", encode_player_event),
+        ("purchase-events", encode_purchase_event),
+        ("server-metrics", encode_server_metric),
+    ]
+
+# The encoders for this process's workload; the entry point rebuilds them for --workload
+TOPIC_ENCODERS = topic_encoders(workload)
+ENCODERS = dict(TOPIC_ENCODERS)
+
+# Encode count records per topic, split across the topics by the workload's mix,
+# as a list of (topic, records)
+def encode_batch(count):
+    counts = workload.topic_counts(count)
+    return [(topic, [encode() for _ in range(counts[topic])]) for topic, encode in TOPIC_ENCODERS if counts[topic]]
+
+# Records for a corpus of count events, each of a type drawn with the workload's mix
+def corpus_records(count):
+    for _ in range(count):
+        topic = workload.choose_topic()
+        key, value = ENCODERS[topic]()
+        if schema_check is not None:
+            schema_check.check_encoded(topic, [value])
+        yield topic, key, value
+
+# Take the next count records from a corpus replay, grouped by topic. The key and
+# value are slices of the mapped file; they are copied into bytes for the producer
+# but never decoded or re-encoded.
+def replay_batch(replay, count):
+    batch = {}
+    for topic, key, value in replay.next_records(count):
+        batch.setdefault(topic, []).append((bytes(key), bytes(value)))
+    return list(batch.items())
+
+# Take the next count events from a simulator pipeline, grouped by topic
+def pipeline_batch(pipeline, count):
+    batch = {}
+    for encoded in pipeline.take(count):
+        for topic, records in encoded:
+            batch.setdefault(topic, []).extend(records)
+    return list(batch.items())
+
+# Generate batches of records until stopped, paced if a pacer is given
+def generate_batches(batch_queue, batch_size, stop, pacer=None, make_batch=encode_batch):
+    while not stop.is_set():
+        try:
+            count = pacer.next_batch() if pacer is not None else batch_size
+            with BATCH_ENCODE_SECONDS.time():
+                batch = make_batch(count)
+            for topic, records in batch:
+                EVENTS_GENERATED.labels(topic).inc(len(records))
+                if schema_check is not None:
+                    schema_check.check_encoded(topic, [value for _, value in records])
+        except Exception as e:
+            # hand the error to the sender, which would otherwise wait forever
+            batch = e
+        while not stop.is_set():
+            try:
+                batch_queue.put(batch, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+
+# Publish events in batches, generating the next batches while the current ones are sent
+def publish_events_batched(sink, batch_size=1000, linger_ms=100, max_in_flight=4, pacer=None,
+                           report_interval=5.0, make_batch=encode_batch, topics=None):
+    if topics is None:
+        topics = [topic for topic, _ in TOPIC_ENCODERS]
+    producers = {topic: sink.topic_producer(topic, batch_size, linger_ms) for topic in topics}
+    linger = linger_ms / 1000
+
+    # Generation runs in its own thread; the bounded queue keeps it at most
+    # max_in_flight batches ahead of the sender
+    batch_queue = queue.Queue(maxsize=max_in_flight)
+    stop = threading.Event()
+    generator = threading.Thread(
+        target=generate_batches, args=(batch_queue, batch_size, stop, pacer, make_batch), daemon=True
+    )
+    generator.start()
+
+    in_flight = deque()
+    BATCH_QUEUE_DEPTH.set_function(batch_queue.qsize)
+    IN_FLIGHT_BATCHES.set_function(lambda: len(in_flight))
+    SCHEDULE_LAG.set_function(lambda: pacer.lag if pacer is not None else 0.0)
+    sent_counters = {topic: RECORDS_SENT.labels(topic) for topic in producers}
+    send_seconds = {topic: SEND_SECONDS.labels(topic) for topic in producers}
+    flush_seconds = {topic: FLUSH_SECONDS.labels(topic) for topic in producers}
+    sent = {topic: 0 for topic in producers}
+    last_flush = last_report = time.monotonic()
+    reported = 0
+    try:
+        while True:
+            batch = batch_queue.get()
+            if isinstance(batch, Exception):
+                raise batch
+            outputs = []
+            for topic, records in batch:
+                with send_seconds[topic].time():
+                    result = producers[topic].send_all(records)
+                outputs.extend(result or [])
+                sent[topic] += len(records)
+                sent_counters[topic].inc(len(records))
+            in_flight.append(outputs)
+
+            # Wait for the oldest batch once too many are outstanding
+            while len(in_flight) > max_in_flight:
+                for output in in_flight.popleft():
+                    if hasattr(output, "wait"):
+                        output.wait()
+
+            now = time.monotonic()
+            if now - last_flush >= linger:
+                for topic, producer in producers.items():
+                    with flush_seconds[topic].time():
+                        producer.flush()
+                in_flight.clear()
+                last_flush = now
+
+            if now - last_report >= report_interval:
+                total = sum(sent.values())
+                rate = (total - reported) / (now - last_report)
+                lag = f", schedule lag {pacer.lag * 1000:.1f} ms" if pacer is not None else ""
+                logging.info(f"Sent {total} records, {rate:.0f} records/s ({sent}){lag}")
+                reported, last_report = total, now
+    finally:
+        stop.set()
+        for producer in producers.values():
+            producer.flush()
+
+# Send one topic's records, made by encode, for a worker until stopped, paced if a
+# pacer is given. Failed sends are counted and the records dropped; a failed flush
+# is counted on its own, as the records it covers were already sent. The sink
+# retries connections.
+def publish_topic(topic, encode, producer, pacer, batch_size, linger, stop, stats, check=None):
+    log_error = SampledLog()
+    last_flush = time.monotonic()
+    while not stop.is_set():
+        count = pacer.next_batch() if pacer is not None else batch_size
+        records = [encode() for _ in range(count)]
+        if check is not None:
+            stats["invalid"] += check.check_encoded(topic, [value for _, value in records])
+        try:
+            producer.send_all(records)
+        except Exception as e:
+            stats["errors"] += 1
+            stats["failed"] += count
+            log_error(lambda e=e: f"Sending to {topic} failed: {e}", logging.ERROR)
+            continue
+        stats["sent"] += count
+        if pacer is not None:
+            stats["lag"] = pacer.lag
+        now = time.monotonic()
+        if now - last_flush >= linger:
+            last_flush = now
+            try:
+                producer.flush()
+            except Exception as e:
+                stats["flush_errors"] += 1
+                log_error(lambda e=e: f"Flushing {topic} failed: {e}", logging.ERROR)
+
+# One publisher worker process: the part-th slice of the workload's keys, its own
+# sink and producers, and a thread per topic so the topics are paced independently.
+# Cumulative stats go to the coordinator every report_interval seconds, and once
+# more, marked final, after the coordinator sets stopped.
+def run_worker(part, parts, sink_spec, workload_spec, profiles, batch_size, linger_ms,
+               validate, dataflow, report_interval, reports, stopped):
+    # The coordinator handles Ctrl-C and stops the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(
+        level=os.environ.get('PY_LOG', 'INFO').upper()
+    )
+    worker_workload, shares = load_workload(workload_spec).partition(part, parts)
+    encoders = dict(topic_encoders(worker_workload))
+    check = SchemaCheck(load_schema(dataflow), validate) if validate else None
+
+    sink = create_sink(sink_spec)
+    stop = threading.Event()
+    stats = {}
+    producers = []
+    threads = []
+    try:
+        for topic, profile in profiles.items():
+            if not shares[topic]:
+                # This worker owns none of the topic's keys
+                continue
+            pacer = Pacer(ScaledRate(profile, shares[topic]), max_batch=batch_size) if profile is not None else None
+            producer = sink.topic_producer(topic, batch_size, linger_ms)
+            producers.append(producer)
+            stats[topic] = {"sent": 0, "failed": 0, "errors": 0, "flush_errors": 0, "invalid": 0, "lag": 0.0}
+            thread = threading.Thread(
+                target=publish_topic,
+                args=(topic, encoders[topic], producer, pacer, batch_size, linger_ms / 1000, stop, stats[topic],
+                      check),
+                name=f"{topic}-{part}", daemon=True,
+            )
+            thread.start()
+            threads.append(thread)
+
+        next_report = time.monotonic() + report_interval
+        while not stopped.value:
+            time.sleep(0.1)
+            if time.monotonic() >= next_report:
+                reports.put((part, {topic: dict(topic_stats) for topic, topic_stats in stats.items()}, False))
+                next_report += report_interval
+        stop.set()
+        for thread in threads:
+            thread.join(timeout=5)
+        for producer in producers:
+            producer.flush()
+    finally:
+        sink.close()
+        reports.put((part, {topic: dict(topic_stats) for topic, topic_stats in stats.items()}, True))
+
+# Rate profile per topic for workers mode: per-topic overrides, given as
+# topic=profile with 0 to leave a topic out, else --rate split by the workload's
+# mix as in single mode. None sends a topic unpaced.
+def topic_profiles(rate, topic_rates):
+    overrides = {}
+    for spec in topic_rates:
+        topic, _, profile = spec.partition("=")
+        if topic not in ENCODERS:
+            raise ValueError(f"Unknown topic {topic!r} in topic rate {spec!r}, expected one of {', '.join(ENCODERS)}")
+        overrides[topic] = None if profile.strip() == "0" else parse_profile(profile)
+
+    total_weight = sum(workload.mix.values())
+    profiles = {}
+    for topic in ENCODERS:
+        weight = workload.mix[topic] / total_weight * len(TOPICS)
+        if topic in overrides:
+            if overrides[topic] is not None:
+                profiles[topic] = overrides[topic]
+        elif weight:
+            profiles[topic] = ScaledRate(parse_profile(rate), weight) if rate else None
+    return profiles
+
+# Publish from workers processes, each owning a slice of the key space, so every
+# key is produced by one process only and keeps its order. The coordinator sums
+# the workers' stats into the metrics and logs them; it stops the workers after
+# duration seconds if given, and returns the final stats per (worker, topic).
+def publish_events_workers(sink_spec, workers, profiles, workload_spec=None, batch_size=1000, linger_ms=100,
+                           validate=0.0, dataflow=None, report_interval=5.0, duration=None):
+    if workers < 1:
+        raise ValueError(f"Need at least one worker, got {workers}")
+    reports = multiprocessing.Queue()
+    # A plain shared flag rather than an Event, whose set() hangs if a worker was killed while waiting on it
+    stopped = multiprocessing.RawValue("b", 0)
+    processes = [
+        multiprocessing.Process(
+            target=run_worker,
+            args=(part, workers, sink_spec, workload_spec, profiles, batch_size, linger_ms,
+                  validate, dataflow, min(report_interval, 1.0), reports, stopped),
+            name=f"publisher-{part}",
+            daemon=True,
+        )
+        for part in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    latest = {}
+    zero = {"sent": 0, "failed": 0, "errors": 0, "flush_errors": 0, "invalid": 0, "lag": 0.0}
+    SCHEDULE_LAG.set_function(lambda: max((stats["lag"] for stats in latest.values()), default=0.0))
+
+    # Add a worker's report to the metrics; returns whether it was its last
+    def record(report):
+        part, topics, final = report
+        for topic, stats in topics.items():
+            previous = latest.get((part, topic), zero)
+            sent = stats["sent"] - previous["sent"]
+            RECORDS_SENT.labels(topic).inc(sent)
+            WORKER_RECORDS_SENT.labels(str(part)).inc(sent)
+            EVENTS_GENERATED.labels(topic).inc(sent + stats["failed"] - previous["failed"])
+            SEND_ERRORS.labels(topic).inc(stats["errors"] - previous["errors"])
+            FLUSH_ERRORS.labels(topic).inc(stats["flush_errors"] - previous["flush_errors"])
+            latest[(part, topic)] = stats
+        return final
+
+    start = last_report = time.monotonic()
+    reported = 0
+    try:
+        while duration is None or time.monotonic() - start < duration:
+            try:
+                record(reports.get(timeout=0.5))
+            except queue.Empty:
+                pass
+            for process in processes:
+                if not process.is_alive():
+                    raise RuntimeError(f"Publisher worker {process.name} exited with code {process.exitcode}")
+
+            now = time.monotonic()
+            if now - last_report >= report_interval:
+                by_topic, by_worker = {}, {}
+                for (part, topic), stats in latest.items():
+                    by_topic[topic] = by_topic.get(topic, 0) + stats["sent"]
+                    by_worker[part] = by_worker.get(part, 0) + stats["sent"]
+                total = sum(by_topic.values())
+                errors = sum(stats["errors"] for stats in latest.values())
+                flush_errors = sum(stats["flush_errors"] for stats in latest.values())
+                lag = max((stats["lag"] for stats in latest.values()), default=0.0)
+                logging.info(f"Sent {total} records, {(total - reported) / (now - last_report):.0f} records/s "
+                             f"(by topic {by_topic}, by worker {by_worker}), {errors} send errors, "
+                             f"{flush_errors} flush errors, schedule lag {lag * 1000:.1f} ms")
+                reported, last_report = total, now
+    finally:
+        stopped.value = 1
+        # Collect the final reports; a worker's queue has to drain before it can exit
+        pending = {part for part, process in enumerate(processes) if process.is_alive()}
+        deadline = time.monotonic() + 10
+        while pending and time.monotonic() < deadline:
+            try:
+                report = reports.get(timeout=0.5)
+            except queue.Empty:
+                # A worker that died without a final report won't send one
+                pending = {part for part in pending if processes[part].is_alive()}
+                continue
+            if record(report):
+                pending.discard(report[0])
+        for process in processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+    return latest
 
 # Run the data generator
 if __name__ == "__main__":
-    publish_events()
+    logging.basicConfig(
+        level=os.environ.get('PY_LOG', 'INFO').upper()
+    )
+
+    parser = argparse.ArgumentParser(description="Generate gaming events into Fluvio topics")
+    parser.add_argument("--mode", choices=["single", "batched", "replay", "build-corpus", "workers", "simulator"],
+                        default=os.environ.get("PUBLISH_MODE", "single"),
+                        help="single: send and flush every record; batched: pipelined batches; "
+                             "replay: pipelined batches from a corpus file; build-corpus: write "
+                             "a corpus file of generated events; workers: batches from --workers "
+                             "processes, each owning a slice of the keys; simulator: batches of the gs-funnel "
+                             "simulator's events, simulated, encoded and sent in overlapping stages")
+    parser.add_argument("--batch-size", type=int, default=int(os.environ.get("BATCH_SIZE", 1000)),
+                        help="records per topic per batch")
+    parser.add_argument("--linger-ms", type=int, default=int(os.environ.get("LINGER_MS", 100)),
+                        help="maximum time between flushes")
+    parser.add_argument("--max-in-flight", type=int, default=int(os.environ.get("MAX_IN_FLIGHT", 4)),
+                        help="batches sent but not yet acknowledged")
+    parser.add_argument("--rate", default=os.environ.get("RATE_PROFILE"),
+                        help="events per second per topic, or a profile such as ramp:100:50000:60 "
+                             "(see pacing.parse_profile); single mode defaults to 100; batched, "
+                             "replay and simulator modes are unpaced unless set")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("PUBLISH_WORKERS", os.cpu_count() or 1)),
+                        help="publisher processes in workers mode")
+    parser.add_argument("--topic-rate", action="append",
+                        default=[spec for spec in os.environ.get("TOPIC_RATES", "").split(";") if spec],
+                        help="rate profile of one topic in workers mode, e.g. purchase-events=ramp:10:1000:60, "
+                             "or 0 to leave it out; repeatable, or ;-separated in TOPIC_RATES. Other "
+                             "topics follow --rate, and are unpaced without it")
+    parser.add_argument("--players", type=int, default=int(os.environ.get("SIM_PLAYERS", 10_000)),
+                        help="simulated players in simulator mode")
+    parser.add_argument("--seed", type=int, default=int(os.environ["SIM_SEED"]) if os.environ.get("SIM_SEED") else None,
+                        help="simulator seed in simulator mode")
+    parser.add_argument("--chunk-size", type=int, default=int(os.environ.get("SIM_CHUNK_SIZE", 1000)),
+                        help="player draws per simulator chunk, the unit handed between stages")
+    parser.add_argument("--encode-workers", type=int, default=int(os.environ.get("ENCODE_WORKERS", 2)),
+                        help="encoders of simulator chunks")
+    parser.add_argument("--encode-executor", choices=EXECUTORS, default=os.environ.get("ENCODE_EXECUTOR", "thread"),
+                        help="run the encoders as threads, or as processes to use more cores")
+    parser.add_argument("--pipeline-chunks", type=int, default=int(os.environ.get("PIPELINE_CHUNKS", 16)),
+                        help="simulator chunks between the simulator and the sender; when they are "
+                             "all waiting, the simulator waits too")
+    parser.add_argument("--corpus", default=os.environ.get("CORPUS_PATH"),
+                        help="corpus file to write in build-corpus mode or read in replay mode")
+    parser.add_argument("--events", type=int, default=int(os.environ.get("CORPUS_EVENTS", 1_000_000)),
+                        help="events to write in build-corpus mode")
+    parser.add_argument("--rewrite-timestamps", action="store_true",
+                        default=os.environ.get("REWRITE_TIMESTAMPS", "") == "1",
+                        help="in replay mode, set event timestamps to the time they are sent")
+    parser.add_argument("--workload", default=None,
+                        help="players, items, servers, transaction ids and event mix: default, "
+                             "skewed, hot-partition or a .json/.yaml profile (see workload.PROFILES); "
+                             "defaults to $WORKLOAD_PROFILE")
+    parser.add_argument("--validate", type=float, default=float(os.environ.get("VALIDATE_SAMPLE", 0)),
+                        help="fraction of generated events to check against the types in the dataflow "
+                             "definition, 0 to disable and 1 for all; needs PyYAML")
+    parser.add_argument("--dataflow", default=os.environ.get("DATAFLOW_PATH"),
+                        help="dataflow definition for --validate, by default sdf/dataflow.yaml")
+    parser.add_argument("--sink", default=os.environ.get("SINK", "fluvio"),
+                        help="where records go: fluvio, null, memory[:latency_ms[:capacity[:mb_per_s]]] "
+                             "or file:directory[:binary] (see sinks.create_sink)")
+    parser.add_argument("--metrics-port", type=int, default=int(os.environ.get("METRICS_PORT", 0)),
+                        help="serve Prometheus metrics on this port, 0 to disable")
+    parser.add_argument("--profile", action="store_true", default=os.environ.get("PROFILING", "") == "1",
+                        help="allow sampling profiles: SIGUSR1 starts and stops one, and the metrics "
+                             "port serves /debug/profile?seconds=N")
+    args = parser.parse_args()
+
+    profiler = None
+    if args.profile:
+        profiler = SamplingProfiler()
+        toggle_profiler_on_signal(profiler)
+    if args.metrics_port:
+        serve_metrics(args.metrics_port, profiler=profiler)
+
+    if args.workload:
+        workload = load_workload(args.workload)
+        TOPIC_ENCODERS = topic_encoders(workload)
+        ENCODERS = dict(TOPIC_ENCODERS)
+    logging.info(f"Workload: {workload.name}")
+    if args.validate:
+        schema_check = SchemaCheck(load_schema(args.dataflow), args.validate)
+
+    if args.mode in ("replay", "build-corpus") and not args.corpus:
+        parser.error(f"--corpus is required in {args.mode} mode")
+
+    if args.mode == "build-corpus":
+        count = write_corpus(args.corpus, corpus_records(args.events), source="fluvio-client generators")
+        print(f"Wrote {count} events to {args.corpus}")
+        sys.exit(0)
+
+    if args.mode == "workers":
+        # Each worker builds its own slice of the workload and its own sink
+        publish_events_workers(args.sink, args.workers, topic_profiles(args.rate, args.topic_rate),
+                               args.workload or os.environ.get("WORKLOAD_PROFILE"), args.batch_size,
+                               args.linger_ms, args.validate, args.dataflow)
+        sys.exit(0)
+
+    # The sink connects on first use and reconnects in-process if the connection fails
+    sink = create_sink(args.sink)
+    try:
+        if args.mode == "replay":
+            # batch size and rate count records across all topics in the corpus
+            replay = open_replay(args.corpus, args.rewrite_timestamps)
+            pacer = Pacer(parse_profile(args.rate), max_batch=args.batch_size) if args.rate else None
+            publish_events_batched(sink, args.batch_size, args.linger_ms, args.max_in_flight, pacer,
+                                   make_batch=lambda count: replay_batch(replay, count),
+                                   topics=replay.corpus.topics)
+        elif args.mode == "simulator":
+            # The simulator runs in its own thread, ahead of the encoders and the sender
+            # by at most --pipeline-chunks chunks; batch size and rate count all events
+            simulator = create_simulator(args.players, args.seed)
+            pipeline = StagedPipeline(topic_chunks(simulator, args.chunk_size), encode_topic_records,
+                                      args.encode_workers, args.pipeline_chunks, args.encode_executor,
+                                      name="fluvio-client")
+            pacer = Pacer(parse_profile(args.rate), max_batch=args.batch_size) if args.rate else None
+            try:
+                publish_events_batched(sink, args.batch_size, args.linger_ms, args.max_in_flight, pacer,
+                                       make_batch=lambda count: pipeline_batch(pipeline, count),
+                                       topics=[PLAYER_TOPIC, SERVER_TOPIC])
+            finally:
+                pipeline.close()
+                simulator.close()
+        elif args.mode == "batched":
+            pacer = Pacer(parse_profile(args.rate), max_batch=args.batch_size) if args.rate else None
+            publish_events_batched(sink, args.batch_size, args.linger_ms, args.max_in_flight, pacer)
+        else:
+            publish_events(Pacer(parse_profile(args.rate or "100")), sink)
+    finally:
+        sink.close()
@@ -0,0 +1,41 @@
+import importlib.util
+import random
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+
+# Loaded once per test run: the module registers its metrics when imported
+if "fluvio_client" not in sys.modules:
+    spec = importlib.util.spec_from_file_location("fluvio_client", Path(__file__).resolve().parent / "main.py")
+    sys.modules["fluvio_client"] = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(sys.modules["fluvio_client"])
+client = sys.modules["fluvio_client"]
+
+GENERATORS = {
+    "player-events": client.generate_player_event,
+    "purchase-events": client.generate_purchase_event,
+    "server-metrics": client.generate_server_metric,
+}
+
+
+@pytest.mark.parametrize("now", [datetime(2024, 1, 2, 3, 4, 5, 123456), datetime(2024, 1, 2, 3, 4, 5)])
+@pytest.mark.parametrize("topic", sorted(GENERATORS))
+def test_encoders_write_the_generated_events_bytes(monkeypatch, topic, now):
+    class FrozenDatetime:
+        @staticmethod
+        def utcnow():
+            return now
+
+    monkeypatch.setattr(client, "datetime", FrozenDatetime)
+    now_ns = int((now - datetime(1970, 1, 1)).total_seconds() * 10**6) * 1000
+    monkeypatch.setattr(client.timestamps, "clock", lambda: now_ns)
+
+    random.seed(11)
+    expected = [client.encode_record(GENERATORS[topic]()) for _ in range(300)]
+    # The same random draws, so the same events
+    random.seed(11)
+    encode = dict(client.TOPIC_ENCODERS)[topic]
+    assert [encode() for _ in range(300)] == expected
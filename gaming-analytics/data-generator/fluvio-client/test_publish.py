@@ -0,0 +1,57 @@
+import importlib.util
+import sys
+import threading
+from pathlib import Path
+
+# Loaded once per test run: the module registers its metrics when imported
+if "fluvio_client" not in sys.modules:
+    spec = importlib.util.spec_from_file_location("fluvio_client", Path(__file__).resolve().parent / "main.py")
+    sys.modules["fluvio_client"] = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(sys.modules["fluvio_client"])
+client = sys.modules["fluvio_client"]
+
+from sinks import MemorySink  # noqa: E402
+from workload import load_workload  # noqa: E402
+
+
+class FailingFlush:
+    def __init__(self, producer):
+        self.producer = producer
+
+    def send_all(self, records):
+        return self.producer.send_all(records)
+
+    def flush(self):
+        raise ConnectionError("flush failed")
+
+
+def test_flush_errors_are_counted_apart_from_failed_sends():
+    sink = MemorySink()
+    producer = FailingFlush(sink.topic_producer("player-events"))
+    stats = {"sent": 0, "failed": 0, "errors": 0, "flush_errors": 0, "invalid": 0, "lag": 0.0}
+    stop = threading.Event()
+    encode = client.ENCODERS["player-events"]
+    calls = 0
+
+    def counting_encode():
+        nonlocal calls
+        calls += 1
+        if calls == 50:
+            stop.set()
+        return encode()
+
+    client.publish_topic("player-events", counting_encode, producer, None, 10, 0.0, stop, stats)
+    assert stats["sent"] == 50 and sink.stats()["player-events"]["records"] == 50
+    assert stats["failed"] == 0 and stats["errors"] == 0
+    assert stats["flush_errors"] == 5
+
+
+def test_worker_encoders_draw_from_their_own_slice():
+    shares = []
+    for part in range(2):
+        worker_workload, share = load_workload(None).partition(part, 2)
+        encode = dict(client.topic_encoders(worker_workload))["server-metrics"]
+        shares.append({encode()[0] for _ in range(200)})
+    assert shares[0] and shares[1] and not shares[0] & shares[1]
+    # The module's own encoders are left alone
+    assert client.ENCODERS["server-metrics"] is not encode
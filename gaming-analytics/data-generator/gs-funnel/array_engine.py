@@ -0,0 +1,296 @@
+from array import array
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+from roster import NO_SERVER, ServerRoster
+
+# Integer state codes, ordered like PlayerState so that code == PlayerState.value
+STATE_NAMES = ("LOGGED_IN", "IN_GAME", "IDLE", "OFFLINE")
+LOGGED_IN, IN_GAME, IDLE, OFFLINE = range(1, len(STATE_NAMES) + 1)
+
+NO_MAP = -1
+
+# Player columns, in the layout of Population.COLUMNS
+COLUMNS = {'skill': 'd', 'state': 'b', 'map': 'h', 'level': 'i', 'deaths': 'i', 'cooldown': 'd'}
+
+
+class ArrayPlayerEngine:
+    """
+    NumPy-backed player state machine for GameEventSimulator.
+
+    Player skill, state, map, level, deaths and cooldown are NumPy views over array
+    columns, the population's own when built by from_simulator, so the engine keeps no
+    second copy of the players. A whole step's worth of draws is resolved in batch. Draws
+    that hit the same player more than once are resolved in successive rounds, so every
+    player sees its draws in order and the state machine rules are the same as the
+    per-event Python loop.
+    """
+
+    def __init__(
+        self,
+        player_ids: Sequence[str],
+        skill_levels: Sequence[float],
+        map_names: Sequence[str],
+        difficulty_arrays: Sequence[Sequence[float]],
+        server_ids: Sequence[str],
+        roster: ServerRoster,
+        rng: np.random.Generator = None,
+        columns: Dict[str, array] = None,
+    ):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        # Any sequence, e.g. the population's PlayerIds, which formats ids on access
+        self.player_ids = player_ids
+        self.map_names = list(map_names)
+        self.server_ids = list(server_ids)
+        # Shared with the simulator, which snapshots it and applies server states and drains
+        self.roster = roster
+
+        if columns is None:
+            num_players = len(self.player_ids)
+            columns = {
+                'skill': array('d', skill_levels),
+                'state': array('b', [OFFLINE]) * num_players,
+                'map': array('h', [NO_MAP]) * num_players,
+                'level': array('i', [1]) * num_players,
+                'deaths': array('i', [0]) * num_players,
+                # float, as in the Python loop: deaths / 2 + 1
+                'cooldown': array('d', [0.0]) * num_players,
+            }
+        self._bind(columns)
+
+        # Difficulty table padded to the longest map; the arrays already carry the
+        # out-of-band overrides
+        self.total_levels = np.array([len(d) for d in difficulty_arrays], dtype=np.int16)
+        width = int(self.total_levels.max()) if len(self.total_levels) else 0
+        self.difficulty = np.zeros((len(self.map_names), width), dtype=np.float64)
+        for m, difficulty_array in enumerate(difficulty_arrays):
+            self.difficulty[m, :len(difficulty_array)] = difficulty_array
+
+    @classmethod
+    def from_simulator(cls, simulator) -> "ArrayPlayerEngine":
+        """
+        Build an engine from an initialized GameEventSimulator, working on its
+        players' columns in place.
+        """
+        compiled = simulator.compiled
+        population = simulator.players
+        # The population's map codes index compiled.map_names too
+        return cls(
+            player_ids=population.ids,
+            skill_levels=population.skill,
+            map_names=compiled.map_names,
+            difficulty_arrays=compiled.difficulty,
+            server_ids=[server.server_id for server in simulator.servers],
+            roster=simulator.roster,
+            # Seeded from the simulator's RNG, so the simulator seed also fixes this engine
+            rng=np.random.default_rng(simulator.rng.getrandbits(64)),
+            columns=population.snapshot_columns(),
+        )
+
+    def _bind(self, columns: Dict[str, array]) -> None:
+        # Writable views: the engine's updates land in the columns themselves
+        self.columns = columns
+        self.skill = np.frombuffer(columns['skill'], dtype=np.float64)
+        self.state = np.frombuffer(columns['state'], dtype=np.int8)
+        self.map = np.frombuffer(columns['map'], dtype=np.int16)
+        self.level = np.frombuffer(columns['level'], dtype=np.int32)
+        self.deaths = np.frombuffer(columns['deaths'], dtype=np.int32)
+        self.cooldown = np.frombuffer(columns['cooldown'], dtype=np.float64)
+        # Kept up to date on every transition so the step event count needs no scan
+        self.logged_in = int(np.count_nonzero(self.state != OFFLINE))
+
+    def __len__(self) -> int:
+        return len(self.player_ids)
+
+    def count_logged_in(self) -> int:
+        return self.logged_in
+
+    def snapshot_columns(self) -> Dict[str, array]:
+        """
+        Player columns in the snapshot layout shared with the Python backend.
+        """
+        return dict(self.columns)
+
+    def restore_columns(self, columns: Dict[str, array], rng_state: Dict[str, Any]) -> None:
+        """
+        Copy snapshot columns into the engine's, so a population sharing them sees the
+        restored players too.
+        """
+        for name, typecode in COLUMNS.items():
+            column = columns[name]
+            if column.typecode != typecode or len(column) != len(self):
+                raise ValueError(f"Column {name} does not match this engine")
+            getattr(self, name)[:] = np.frombuffer(column, dtype=getattr(self, name).dtype)
+        self.logged_in = int(np.count_nonzero(self.state != OFFLINE))
+        self.rng.bit_generator.state = rng_state
+
+    def sync_to(self, population) -> None:
+        """
+        Point the simulator's Population at the engine's columns. Engines built by
+        from_simulator already share them, which makes this a no-op.
+        """
+        population.restore_columns(self.snapshot_columns())
+
+    def _draw_ranks(self, draws: np.ndarray) -> np.ndarray:
+        """
+        For each draw, the number of earlier draws in the step that hit the same player.
+        """
+        order = np.argsort(draws, kind="stable")
+        sorted_draws = draws[order]
+        is_first = np.empty(len(draws), dtype=bool)
+        is_first[:1] = True
+        is_first[1:] = sorted_draws[1:] != sorted_draws[:-1]
+        first_pos = np.flatnonzero(is_first)
+        group = np.cumsum(is_first) - 1
+        ranks = np.empty(len(draws), dtype=np.int64)
+        ranks[order] = np.arange(len(draws)) - first_pos[group]
+        return ranks
+
+    def run_player_events(self, event_count: int, time_step: int) -> List[Dict[str, Any]]:
+        """
+        Draw event_count players and resolve them in batch.
+
+        Returns the step's player events in draw order, in the same format as the
+        per-event Python loop.
+        """
+        if event_count <= 0 or len(self) == 0:
+            return []
+
+        draws = self.rng.integers(0, len(self), size=event_count)
+        ranks = self._draw_ranks(draws)
+
+        progress_parts, login_parts, start_parts = [], [], []
+        for rank in range(int(ranks.max()) + 1):
+            positions = np.flatnonzero(ranks == rank)
+            players = draws[positions]
+            old_state = self.state[players]
+
+            # In-game players attempt the next level
+            in_game = (old_state == IN_GAME) & (self.map[players] != NO_MAP)
+            if in_game.any():
+                progress_parts.append(
+                    self._resolve_progression(positions[in_game], players[in_game])
+                )
+
+            # Offline players count down their cooldown and log in when it reaches zero
+            offline = old_state == OFFLINE
+            if offline.any():
+                off_positions, off_players = positions[offline], players[offline]
+                cooling = self.cooldown[off_players] > 0
+                self.cooldown[off_players[cooling]] -= 1
+                logging_in = self.cooldown[off_players] == 0
+                self.state[off_players[logging_in]] = LOGGED_IN
+                self.logged_in += int(np.count_nonzero(logging_in))
+                login_parts.append((off_positions[logging_in], off_players[logging_in]))
+
+            # Logged in players (including those who just logged in) start a game
+            starting = self.state[players] == LOGGED_IN
+            if starting.any():
+                start_parts.append(self._resolve_start_game(positions[starting], players[starting]))
+
+        return self._emit(progress_parts, login_parts, start_parts, time_step)
+
+    def _resolve_progression(self, positions: np.ndarray, players: np.ndarray) -> tuple:
+        maps = self.map[players]
+        levels = self.level[players]
+        difficulty = self.difficulty[maps, levels - 1]
+        skill = self.skill[players]
+        success = self.rng.random(len(players)) < skill / (difficulty + skill)
+
+        advancing = success & (levels < self.total_levels[maps])
+        new_levels = np.where(advancing, levels + 1, -1)
+        self.level[players[advancing]] += 1
+        if self.roster.consolidate_to:
+            for player in players[advancing].tolist():
+                self.roster.changed_area(player)
+
+        dying = players[~advancing]
+        self.roster.remove_many(dying.tolist())
+        self.state[dying] = OFFLINE
+        self.logged_in -= len(dying)
+        self.deaths[dying] += 1
+        deaths = self.deaths[dying]
+        cooling = deaths > 3
+        self.cooldown[dying[cooling]] = deaths[cooling] / 2 + 1
+
+        return positions, players, maps, levels, success, difficulty, new_levels
+
+    def _resolve_start_game(self, positions: np.ndarray, players: np.ndarray) -> tuple:
+        # Players no server has room for stay logged in
+        placed = self.roster.place_many(players.tolist(), self.rng.random(len(players)).tolist())
+        servers = np.array(placed, dtype=np.int32)
+        placed = servers != NO_SERVER
+        positions, players, servers = positions[placed], players[placed], servers[placed]
+        maps = self.rng.integers(0, len(self.map_names), size=len(players))
+        self.state[players] = IN_GAME
+        self.map[players] = maps
+        self.level[players] = 1
+        return positions, players, maps, servers
+
+    def _emit(
+        self, progress_parts, login_parts, start_parts, time_step: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Build event dicts for the resolved draws, ordered by draw position.
+
+        A draw that logs a player in also starts their game, so the start_game event sorts
+        just after the login event of the same draw.
+        """
+        kinds, rows, keys = [], [], []
+        columns = []
+        for kind, parts, sub in ((0, progress_parts, 0), (1, login_parts, 0), (2, start_parts, 1)):
+            if not parts:
+                columns.append(None)
+                continue
+            merged = [np.concatenate(column) for column in zip(*parts)]
+            columns.append([column.tolist() for column in merged])
+            keys.append(merged[0] * 2 + sub)
+            kinds.append(np.full(len(merged[0]), kind, dtype=np.int8))
+            rows.append(np.arange(len(merged[0])))
+        if not keys:
+            return []
+
+        order = np.argsort(np.concatenate(keys), kind="stable")
+        kind_order = np.concatenate(kinds)[order].tolist()
+        row_order = np.concatenate(rows)[order].tolist()
+
+        player_ids, map_names, server_ids = self.player_ids, self.map_names, self.server_ids
+        empty = ([],) * 7
+        _, p_players, p_maps, p_levels, p_success, p_difficulty, p_new_levels = columns[0] or empty
+        _, l_players = columns[1] or empty[:2]
+        _, s_players, s_maps, s_servers = columns[2] or empty[:4]
+
+        events = []
+        for kind, row in zip(kind_order, row_order):
+            if kind == 0:
+                event = {
+                    'event_type': 'player_progression',
+                    'player_id': player_ids[p_players[row]],
+                    'map': map_names[p_maps[row]],
+                    'current_level': p_levels[row],
+                    'success': p_success[row],
+                    'difficulty': p_difficulty[row],
+                    'timestamp': time_step
+                }
+                if p_new_levels[row] > 0:
+                    event['new_level'] = p_new_levels[row]
+                else:
+                    event['event_type'] = 'player_death'
+            elif kind == 1:
+                event = {
+                    'event_type': 'player_login',
+                    'player_id': player_ids[l_players[row]],
+                    'timestamp': time_step
+                }
+            else:
+                event = {
+                    'event_type': 'player_start_game',
+                    'player_id': player_ids[s_players[row]],
+                    'map': map_names[s_maps[row]],
+                    'level': 1,
+                    'server_id': server_ids[s_servers[row]],
+                    'timestamp': time_step
+                }
+            events.append(event)
+        return events
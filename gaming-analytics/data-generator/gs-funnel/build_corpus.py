@@ -0,0 +1,60 @@
+import argparse
+import copy
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import Iterator, Tuple
+
+# The corpus format is shared with the generators in data-generator/common
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "common"))
+from corpus import write_corpus  # noqa: E402
+from event_clock import add_event_time_arguments, event_time_config  # noqa: E402
+from event_stream import encode_records  # noqa: E402
+
+
+def simulator_records(simulator, num_events: int, topic: str) -> Iterator[Tuple[str, bytes, bytes]]:
+    """
+    Run simulator steps until num_events events have been produced, as corpus
+    records keyed by player or server id.
+    """
+    for chunk in simulator.iter_event_chunks(max_events=num_events):
+        for key, value in encode_records(chunk):
+            yield topic, key, value
+
+
+if __name__ == "__main__":
+    from main import EXAMPLE_SIM_CONFIG, GameEventSimulator
+
+    logging.basicConfig(
+        level=os.environ.get('PY_LOG', 'INFO').upper()
+    )
+
+    parser = argparse.ArgumentParser(
+        description="Write game simulator events to a corpus file for replay"
+    )
+    parser.add_argument("--out", required=True, help="corpus file to write")
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--players", type=int, default=None,
+                        help="override player_init.num_players")
+    parser.add_argument("--topic", default="game-events", help="topic recorded for the events")
+    add_event_time_arguments(parser)
+    args = parser.parse_args()
+
+    sim_config = copy.deepcopy(EXAMPLE_SIM_CONFIG)
+    sim_config['event_log'] = {'policy': 'disabled'}
+    if args.players is not None:
+        sim_config['player_init']['num_players'] = args.players
+    event_time = event_time_config(args)
+    if event_time is not None:
+        sim_config['event_time'] = event_time
+
+    simulator = GameEventSimulator(sim_config, seed=args.seed)
+    count = write_corpus(
+        args.out,
+        simulator_records(simulator, args.events, args.topic),
+        source=f"gs-funnel simulator, seed {args.seed}",
+    )
+    simulator.close()
+    logging.info(f"Wrote {count} events to {args.out}")
@@ -0,0 +1,207 @@
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+EPOCH = datetime(1970, 1, 1)
+
+# Fraction digits by millisecond and by microsecond within it
+_MILLIS = [".%03d" % millis for millis in range(1000)]
+_MICROS = ["%03d" % micros for micros in range(1000)]
+
+
+class _SecondCache(dict):
+    """
+    Second since the epoch -> its isoformat() prefix, formatted on first use.
+    """
+
+    def __missing__(self, second: int) -> str:
+        if len(self) >= 4096:
+            self.clear()
+        prefix = self[second] = (EPOCH + timedelta(seconds=second)).isoformat()
+        return prefix
+
+
+class NullEventClock:
+    """
+    Event time policy that leaves events without an event_timestamp.
+    """
+
+    def stamp(
+        self, events: List[Dict[str, Any]], time_step: int, start: float = 0.0, end: float = 1.0
+    ) -> None:
+        pass
+
+
+class WallEventClock:
+    """
+    Event time policy that stamps every event of a step with the current UTC time.
+    """
+
+    def stamp(
+        self, events: List[Dict[str, Any]], time_step: int, start: float = 0.0, end: float = 1.0
+    ) -> None:
+        now = datetime.utcnow().isoformat()
+        for event in events:
+            event['event_timestamp'] = now
+
+
+class SyntheticEventClock:
+    """
+    Event time policy that maps simulation steps onto a synthetic clock, so hours
+    of event time can be generated as fast as the simulator runs.
+
+    Step n covers [start + (n - 1) * step_ms, start + n * step_ms); its events are
+    spread evenly over that interval in the order they were emitted, then moved
+    by up to jitter_ms either way. An out_of_order_fraction of events is stamped up
+    to out_of_order_ms earlier, so they arrive out of order, and a late_fraction
+    is stamped late_ms (plus up to one step) earlier, behind any window that
+    should already have closed. Events keep their emission order; only their
+    event_timestamp moves.
+    """
+
+    def __init__(
+        self,
+        start: datetime,
+        step_ms: float = 1000,
+        jitter_ms: float = 0,
+        out_of_order_fraction: float = 0.0,
+        out_of_order_ms: float = 2000,
+        late_fraction: float = 0.0,
+        late_ms: float = 30_000,
+        seed: Optional[Any] = None,
+    ):
+        if step_ms <= 0:
+            raise ValueError(
+                f"step_ms must be positive for the synthetic event clock, got {step_ms!r}"
+            )
+        if jitter_ms < 0 or out_of_order_ms < 0 or late_ms < 0:
+            raise ValueError("jitter_ms, out_of_order_ms and late_ms must not be negative")
+        fractions = (
+            ('out_of_order_fraction', out_of_order_fraction), ('late_fraction', late_fraction),
+        )
+        for name, fraction in fractions:
+            if not 0 <= fraction <= 1:
+                raise ValueError(f"{name} must be in [0, 1], got {fraction!r}")
+        if out_of_order_fraction + late_fraction > 1:
+            raise ValueError("out_of_order_fraction and late_fraction add up to more than 1")
+        if start.tzinfo is not None:
+            start = start.astimezone(timezone.utc).replace(tzinfo=None)
+        self.start_us = (start - EPOCH) // timedelta(microseconds=1)
+        self.step_us = int(step_ms * 1000)
+        self.jitter_us = int(jitter_ms * 1000)
+        self.out_of_order_fraction = out_of_order_fraction
+        self.out_of_order_us = int(out_of_order_ms * 1000)
+        self.late_fraction = late_fraction
+        self.late_us = int(late_ms * 1000)
+        # Separate from the simulator's generator, so turning the clock on doesn't change the events
+        self.rng = random.Random(f"{seed}/event_time" if seed is not None else None)
+        self.seconds = _SecondCache()
+
+    def step_start_us(self, time_step: int) -> int:
+        return self.start_us + (time_step - 1) * self.step_us
+
+    def stamp(
+        self, events: List[Dict[str, Any]], time_step: int, start: float = 0.0, end: float = 1.0
+    ) -> None:
+        """
+        Stamp events, in order, over the start to end fraction of the step.
+        """
+        count = len(events)
+        if count == 0:
+            return
+        step_us = self.step_us
+        base = self.step_start_us(time_step) + int(start * step_us)
+        span_us = int((end - start) * step_us)
+        jitter_us = self.jitter_us
+        displaced = self.out_of_order_fraction + self.late_fraction
+        late_fraction = self.late_fraction
+        late_us = self.late_us
+        out_of_order_us = self.out_of_order_us
+        # random() is a single C call, unlike randint()
+        random = self.rng.random
+        seconds = self.seconds
+        for i, event in enumerate(events):
+            micros = base + i * span_us // count
+            if jitter_us:
+                micros += int((2 * random() - 1) * jitter_us)
+            if displaced:
+                r = random()
+                if r < late_fraction:
+                    micros -= late_us + int(random() * step_us)
+                elif r < displaced:
+                    micros -= int(random() * out_of_order_us)
+            second, fraction = divmod(micros, 1_000_000)
+            if fraction:
+                millis, fraction = divmod(fraction, 1000)
+                event['event_timestamp'] = seconds[second] + _MILLIS[millis] + _MICROS[fraction]
+            else:
+                # isoformat() leaves out a zero fraction
+                event['event_timestamp'] = seconds[second]
+
+
+def create_event_clock(config: Dict[str, Any], seed: Optional[Any] = None):
+    """
+    Build the event time policy described by the simulator's 'event_time' config.
+
+    Clocks: 'none' (default, no event_timestamp), 'wall' (current time) and
+    'synthetic' (fast-forward from 'start', one 'step_ms' per step).
+    """
+    clock = config.get('clock', 'none')
+    if clock == 'none':
+        return NullEventClock()
+    if clock == 'wall':
+        return WallEventClock()
+    if clock == 'synthetic':
+        start = config.get('start')
+        if start is None:
+            start = datetime.utcnow().replace(microsecond=0)
+        elif isinstance(start, str):
+            start = datetime.fromisoformat(start)
+        return SyntheticEventClock(
+            start,
+            step_ms=config.get('step_ms', 1000),
+            jitter_ms=config.get('jitter_ms', 0),
+            out_of_order_fraction=config.get('out_of_order_fraction', 0.0),
+            out_of_order_ms=config.get('out_of_order_ms', 2000),
+            late_fraction=config.get('late_fraction', 0.0),
+            late_ms=config.get('late_ms', 30_000),
+            seed=seed,
+        )
+    raise ValueError(f"Unknown event clock: {clock}")
+
+
+def add_event_time_arguments(parser) -> None:
+    """
+    Add the fast-forward event time options to an entry point's argument parser.
+    """
+    group = parser.add_argument_group("event time")
+    group.add_argument("--fast-forward", action="store_true",
+                       help="stamp events on a synthetic clock instead of leaving them unstamped")
+    group.add_argument("--start", help="synthetic clock start, ISO format (default: now)")
+    group.add_argument("--step-ms", type=float, default=1000, help="event time per simulation step")
+    group.add_argument("--jitter-ms", type=float, default=0)
+    group.add_argument("--out-of-order", type=float, default=0.0,
+                       help="fraction of events stamped early")
+    group.add_argument("--out-of-order-ms", type=float, default=2000)
+    group.add_argument("--late", type=float, default=0.0,
+                       help="fraction of events stamped behind closed windows")
+    group.add_argument("--late-ms", type=float, default=30_000)
+
+
+def event_time_config(args) -> Optional[Dict[str, Any]]:
+    """
+    The 'event_time' config for parsed add_event_time_arguments options, or None
+    without --fast-forward.
+    """
+    if not args.fast_forward:
+        return None
+    return {
+        'clock': 'synthetic',
+        'start': args.start,
+        'step_ms': args.step_ms,
+        'jitter_ms': args.jitter_ms,
+        'out_of_order_fraction': args.out_of_order,
+        'out_of_order_ms': args.out_of_order_ms,
+        'late_fraction': args.late,
+        'late_ms': args.late_ms,
+    }
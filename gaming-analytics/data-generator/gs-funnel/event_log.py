@@ -0,0 +1,165 @@
+import gzip
+import json
+import logging
+import os
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator
+
+
+class NullEventLog:
+    """
+    Event log policy that keeps nothing.
+    """
+
+    def extend(self, events: Iterable[Dict[str, Any]]) -> None:
+        pass
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(())
+
+    def __len__(self) -> int:
+        return 0
+
+    def close(self) -> None:
+        pass
+
+
+class RingEventLog:
+    """
+    Event log policy that keeps the last max_events events in memory.
+    """
+
+    def __init__(self, max_events: int):
+        if max_events <= 0:
+            raise ValueError("max_events must be positive for the ring event log")
+        self.events = deque(maxlen=max_events)
+
+    def extend(self, events: Iterable[Dict[str, Any]]) -> None:
+        self.events.extend(events)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.events)
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def close(self) -> None:
+        pass
+
+
+class SpillEventLog:
+    """
+    Event log policy that spills events to disk as gzip compressed NDJSON segments.
+
+    Each segment holds up to segment_events events. When a segment is full it is
+    closed and a new one started; once more than max_segments segments exist the
+    oldest is deleted, so both memory and disk use stay bounded. Iterating reads
+    the retained history back lazily, oldest first.
+    """
+
+    SEGMENT_PREFIX = "events-"
+    SEGMENT_SUFFIX = ".ndjson.gz"
+
+    def __init__(
+        self,
+        directory: str,
+        segment_events: int = 100_000,
+        max_segments: int = 24,
+        compresslevel: int = 6,
+    ):
+        if segment_events <= 0 or max_segments <= 0:
+            raise ValueError(
+                "segment_events and max_segments must be positive for the spill event log"
+            )
+        self.directory = directory
+        self.segment_events = segment_events
+        self.max_segments = max_segments
+        self.compresslevel = compresslevel
+        os.makedirs(directory, exist_ok=True)
+
+        # Continue numbering after any segments left by a previous run
+        self.segments = sorted(
+            name for name in os.listdir(directory)
+            if name.startswith(self.SEGMENT_PREFIX) and name.endswith(self.SEGMENT_SUFFIX)
+        )
+        self.next_segment = self._segment_number(self.segments[-1]) + 1 if self.segments else 0
+        self.current = None
+        self.current_events = 0
+
+    def _segment_number(self, name: str) -> int:
+        return int(name[len(self.SEGMENT_PREFIX):-len(self.SEGMENT_SUFFIX)])
+
+    def _open_segment(self) -> None:
+        name = f"{self.SEGMENT_PREFIX}{self.next_segment:08d}{self.SEGMENT_SUFFIX}"
+        self.next_segment += 1
+        self.segments.append(name)
+        self.current = gzip.open(os.path.join(self.directory, name), "wb", self.compresslevel)
+        self.current_events = 0
+
+        while len(self.segments) > self.max_segments:
+            oldest = self.segments.pop(0)
+            os.remove(os.path.join(self.directory, oldest))
+            logging.debug(f"Event log rotated out segment {oldest}")
+
+    def _close_segment(self) -> None:
+        if self.current is not None:
+            self.current.close()
+            self.current = None
+
+    def extend(self, events: Iterable[Dict[str, Any]]) -> None:
+        for event in events:
+            if self.current is None or self.current_events >= self.segment_events:
+                self._close_segment()
+                self._open_segment()
+            self.current.write(json.dumps(event).encode("utf-8") + b"\n")
+            self.current_events += 1
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        if self.current is not None:
+            # Make everything written so far readable without closing the segment
+            self.current.flush()
+        for name in list(self.segments):
+            yield from self._read_segment(os.path.join(self.directory, name))
+
+    def _read_segment(self, path: str) -> Iterator[Dict[str, Any]]:
+        try:
+            with gzip.open(path, "rb") as segment:
+                for line in segment:
+                    yield json.loads(line)
+        except FileNotFoundError:
+            # rotated out while iterating
+            return
+        except EOFError:
+            # the open segment has no gzip trailer yet; all flushed lines were read
+            return
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def close(self) -> None:
+        self._close_segment()
+
+
+def create_event_log(config: Dict[str, Any]):
+    """
+    Build the event log policy described by the simulator's 'event_log' config.
+
+    Policies: 'disabled', 'ring' (default, last max_events events) and 'spill'
+    (segmented NDJSON on disk under 'directory').
+    """
+    policy = config.get('policy', 'ring')
+    if policy == 'disabled':
+        return NullEventLog()
+    if policy == 'ring':
+        return RingEventLog(config.get('max_events', 10_000))
+    if policy == 'spill':
+        directory = config.get('directory')
+        if directory is None:
+            raise ValueError("directory is missing in the spill event_log configuration")
+        return SpillEventLog(
+            directory,
+            segment_events=config.get('segment_events', 100_000),
+            max_segments=config.get('max_segments', 24),
+            compresslevel=config.get('compresslevel', 6),
+        )
+    raise ValueError(f"Unknown event log policy: {policy}")
@@ -0,0 +1,310 @@
+import argparse
+import asyncio
+import copy
+import importlib.util
+import json
+import logging
+import os
+import sys
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+# Keyed encoding and sinks are shared with the generators in data-generator/common
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "common"))
+from encoders import KEYED_EVENT, PLAYER_EVENT, text_table  # noqa: E402
+from event_clock import add_event_time_arguments, event_time_config  # noqa: E402
+from metrics import REGISTRY  # noqa: E402
+
+Event = Dict[str, Any]
+
+# Step durations of the simulators the feeders run, served with their metrics
+SIMULATOR_STEP_SECONDS = REGISTRY.histogram(
+    "simulator_step_seconds", "Time to run one simulator step"
+)
+
+
+def observe_step(step: int, duration: float, count: int) -> None:
+    SIMULATOR_STEP_SECONDS.observe(duration)
+
+
+def event_key(event: Event) -> str:
+    """
+    Record key of a simulator event: its player, or for server events its server.
+    """
+    return event.get('player_id', event.get('server_id'))
+
+
+def encode_ndjson(chunk: List[Event]) -> bytes:
+    return "".join(json.dumps(event) + "\n" for event in chunk).encode("utf-8")
+
+
+def encode_keyed(chunk: List[Event]) -> bytes:
+    """
+    {"key": ..., "event": ...} per event, each followed by the \\n\\n delimiter the
+    HTTP connector splits /stream_events on.
+    """
+    keys = text_table([event_key(event) for event in chunk])
+    return b"".join(
+        KEYED_EVENT.format % (key, json.dumps(event).encode("utf-8")) + b"\n\n"
+        for key, event in zip(keys, chunk)
+    )
+
+
+def encode_records(chunk: List[Event]) -> List[Tuple[bytes, bytes]]:
+    """
+    (key, value) records for a sink or Fluvio producer.
+    """
+    keys = text_table([event_key(event) for event in chunk])
+    return [(key, json.dumps(event).encode("utf-8")) for key, event in zip(keys, chunk)]
+
+
+class EventSource:
+    """
+    Pull adapter over the simulator's lazy event stream, handing out the next
+    count events at a time.
+
+    next_chunk fits the web API's Broadcaster and next_batch the Fluvio client's
+    make_batch, so a paced consumer drives the simulator: steps only run as far
+    as events are asked for. Once the limits are reached, calls return empty.
+    """
+
+    def __init__(self, simulator, topic: str = "game-events", chunk_size: int = 1000, **limits):
+        self.topic = topic
+        self.chunks = simulator.iter_event_chunks(chunk_size=chunk_size, **limits)
+        self.pending: List[Event] = []
+        self.exhausted = False
+
+    def next_events(self, count: int) -> List[Event]:
+        while len(self.pending) < count and not self.exhausted:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                self.exhausted = True
+            elif self.pending:
+                self.pending.extend(chunk)
+            else:
+                self.pending = chunk
+        events, self.pending = self.pending[:count], self.pending[count:]
+        return events
+
+    def next_chunk(self, count: int) -> bytes:
+        return encode_keyed(self.next_events(count))
+
+    def next_batch(self, count: int) -> List[Tuple[str, List[Tuple[bytes, bytes]]]]:
+        return [(self.topic, encode_records(self.next_events(count)))]
+
+
+def load_simulator_module():
+    """
+    gs-funnel/main.py, imported as gs_funnel, for feeders with a main.py of their own.
+    """
+    module = sys.modules.get("gs_funnel")
+    if module is None:
+        path = Path(__file__).resolve().parent / "main.py"
+        spec = importlib.util.spec_from_file_location("gs_funnel", path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules["gs_funnel"] = module
+        spec.loader.exec_module(module)
+    return module
+
+
+def create_simulator(players: Optional[int] = None, seed: Optional[int] = None):
+    """
+    A simulator with the example config and no event log, as the feeders run it,
+    its step durations recorded in simulator_step_seconds.
+    """
+    module = load_simulator_module()
+    sim_config = copy.deepcopy(module.EXAMPLE_SIM_CONFIG)
+    sim_config['event_log'] = {'policy': 'disabled'}
+    if players is not None:
+        sim_config['player_init']['num_players'] = players
+    simulator = module.GameEventSimulator(sim_config, seed=seed)
+    simulator.step_listeners.append(observe_step)
+    return simulator
+
+
+# Topics the simulator's events are sent to by the feeders: player events as the
+# dataflow's player-event type, server events as they are
+PLAYER_TOPIC = "player-events"
+SERVER_TOPIC = "server-events"
+PLATFORMS = text_table(["PC", "Console"])
+
+
+class Sessions:
+    """
+    Session numbers for the player-event type's session_id: a player's session
+    changes at each login. They depend on event order, so they are assigned as
+    chunks come out of the simulator, before encoding runs in parallel.
+    """
+
+    def __init__(self):
+        self.logins: Dict[str, int] = {}
+
+    def assign(self, chunk: List[Event]) -> List[int]:
+        logins = self.logins
+        sessions = []
+        for event in chunk:
+            player_id = event.get('player_id')
+            if player_id is None:
+                sessions.append(0)
+            elif event['event_type'] == 'player_login':
+                session = logins[player_id] = logins.get(player_id, 0) + 1
+                sessions.append(session)
+            else:
+                sessions.append(logins.get(player_id, 0))
+        return sessions
+
+
+def topic_chunks(
+    simulator, chunk_size: int = 1000, **limits
+) -> Iterator[Tuple[List[Event], List[int]]]:
+    """
+    The simulator's event chunks with their session numbers, the source of a
+    feeder's StagedPipeline (see common/pipeline.py).
+    """
+    sessions = Sessions()
+    for chunk in simulator.iter_event_chunks(chunk_size=chunk_size, **limits):
+        yield chunk, sessions.assign(chunk)
+
+
+# Map names, event types and server ids come from small sets; their encoded form is kept
+_text_cache: Dict[str, bytes] = {}
+
+
+def _text(s: str) -> bytes:
+    encoded = _text_cache.get(s)
+    if encoded is None:
+        encoded = _text_cache[s] = text_table([s])[0]
+    return encoded
+
+
+def _topic_records(item: Tuple[List[Event], List[int]]) -> List[Tuple[str, bytes, bytes]]:
+    chunk, sessions = item
+    # Without an event clock, events are stamped with the time their chunk is encoded
+    encoded_at = datetime.utcnow().isoformat().encode("ascii")
+    records = []
+    for event, session in zip(chunk, sessions):
+        player_id = event.get('player_id')
+        if player_id is None:
+            value = json.dumps(event).encode("utf-8")
+            records.append((SERVER_TOPIC, _text(event['server_id']), value))
+            continue
+        # player_<n> ids need no escaping
+        key = player_id.encode("ascii")
+        level = event.get('new_level', event.get('current_level', event.get('level')))
+        timestamp = event.get('event_timestamp')
+        records.append((PLAYER_TOPIC, key, PLAYER_EVENT.format % (
+            key,
+            b"session_%s_%d" % (key, session),
+            _text(event['event_type']),
+            b"level_%02d" % level if level is not None else b"",
+            _text(event['map']) if 'map' in event else b"",
+            timestamp.encode("ascii") if timestamp is not None else encoded_at,
+            key,
+            PLATFORMS[zlib.crc32(key) % len(PLATFORMS)],
+        )))
+    return records
+
+
+def encode_topic_records(
+    item: Tuple[List[Event], List[int]]
+) -> List[Tuple[str, List[Tuple[bytes, bytes]]]]:
+    """
+    (topic, records) for a topic_chunks item, as the Fluvio client sends them.
+    Player events take the shape of the dataflow's player-event type, keyed by
+    player, with the simulator's event type, level and map in its parameters
+    and a platform fixed per player. Server events keep their own shape.
+    """
+    batch: Dict[str, List[Tuple[bytes, bytes]]] = {}
+    for topic, key, value in _topic_records(item):
+        batch.setdefault(topic, []).append((key, value))
+    return list(batch.items())
+
+
+def encode_topic_chunk(item: Tuple[List[Event], List[int]]) -> bytes:
+    """
+    A topic_chunks item as one /stream_events chunk, events encoded as by
+    encode_topic_records, each {"key": ..., "event": ...} followed by the delimiter.
+    """
+    return b"".join(
+        KEYED_EVENT.format % (key, value) + b"\n\n" for _, key, value in _topic_records(item)
+    )
+
+
+async def stream_body(simulator, encode: Callable[[List[Event]], bytes] = encode_keyed,
+                      chunk_size: int = 1000, **limits) -> AsyncIterator[bytes]:
+    """
+    Encoded chunks for a streaming HTTP response, e.g. StreamingResponse(stream_body(simulator)).
+    The first chunk goes out as soon as it is drawn, and the event loop gets a turn
+    between chunks.
+    """
+    for chunk in simulator.iter_event_chunks(chunk_size=chunk_size, **limits):
+        yield encode(chunk)
+        await asyncio.sleep(0)
+
+
+def publish(simulator, sink, topic: str = "game-events", chunk_size: int = 1000, **limits) -> int:
+    """
+    Send the simulator's events to topic through a sink (see common/sinks.py),
+    a chunk at a time, and return the number sent.
+    """
+    producer = sink.topic_producer(topic, batch_size=chunk_size)
+    sent = 0
+    for chunk in simulator.iter_event_chunks(chunk_size=chunk_size, **limits):
+        producer.send_all(encode_records(chunk))
+        sent += len(chunk)
+    producer.flush()
+    return sent
+
+
+if __name__ == "__main__":
+    from main import EXAMPLE_SIM_CONFIG, GameEventSimulator
+    from sinks import create_sink
+
+    logging.basicConfig(
+        level=os.environ.get('PY_LOG', 'INFO').upper()
+    )
+
+    parser = argparse.ArgumentParser(
+        description="Stream game simulator events as they are generated"
+    )
+    parser.add_argument("--sink",
+                        help="send to a sink, e.g. fluvio or file:out (default: NDJSON on stdout)")
+    parser.add_argument("--topic", default="game-events")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="player draws per chunk")
+    parser.add_argument("--steps", type=int, default=None)
+    parser.add_argument("--duration", type=float, default=None, help="seconds to run")
+    parser.add_argument("--events", type=int, default=None, help="events to send")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--players", type=int, default=None,
+                        help="override player_init.num_players")
+    add_event_time_arguments(parser)
+    args = parser.parse_args()
+
+    sim_config = copy.deepcopy(EXAMPLE_SIM_CONFIG)
+    sim_config['event_log'] = {'policy': 'disabled'}
+    if args.players is not None:
+        sim_config['player_init']['num_players'] = args.players
+    event_time = event_time_config(args)
+    if event_time is not None:
+        sim_config['event_time'] = event_time
+    limits: Dict[str, Optional[Any]] = {
+        "chunk_size": args.chunk_size, "steps": args.steps,
+        "duration": args.duration, "max_events": args.events,
+    }
+
+    simulator = GameEventSimulator(sim_config, seed=args.seed)
+    try:
+        if args.sink:
+            sink = create_sink(args.sink)
+            try:
+                sent = publish(simulator, sink, args.topic, **limits)
+            finally:
+                sink.close()
+            logging.info(f"Sent {sent} events to {args.topic}")
+        else:
+            for chunk in simulator.iter_event_chunks(**limits):
+                sys.stdout.buffer.write(encode_ndjson(chunk))
+    finally:
+        simulator.close()
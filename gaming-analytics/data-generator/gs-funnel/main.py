@@ -1,10 +1,22 @@
+import copy
 import json
 import logging
+import math
 import os
 import random
+import time
+from array import array
+from collections import defaultdict
 from dataclasses import dataclass
 from enum import Enum, auto
-from typing import Dict, List, Any
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple, Any
+
+from event_clock import create_event_clock
+from event_log import create_event_log
+from population import NO_MAP, Population, uniform_column
+from roster import ServerRoster
+from sim_config import compile_config
+from snapshot import read_snapshot, write_snapshot
 
 
 class ServerState(Enum):
@@ -20,6 +32,12 @@ class PlayerState(Enum):
     OFFLINE = auto()
 
 
+# PlayerState values, as held in Population.state
+LOGGED_IN, IN_GAME, OFFLINE = (
+    PlayerState.LOGGED_IN.value, PlayerState.IN_GAME.value, PlayerState.OFFLINE.value
+)
+
+
 @dataclass
 class MapLevel:
     map_name: str
@@ -36,42 +54,182 @@ class MapLevel:
         ]
 
 
-@dataclass
-class Player:
-    player_id: str
-    skill_level: float
-    current_map: str = None
-    current_level: int = 1
-    state: PlayerState = PlayerState.OFFLINE
-    deaths: int = 0
-    cooldown: int = 0
-
 @dataclass
 class GameServer:
     server_id: str
     state: ServerState = ServerState.OFFLINE
     max_players: int = 100
-    current_players: List[Player] = None
-    import os
-
+    # indices of hosted players, shared with GameEventSimulator.roster
+    current_players: Set[int] = None
+    index: int = -1  # position in GameEventSimulator.servers
+
+
+class PlayerIndex:
+    """
+    Live per-state membership of players, updated in O(1) on every transition.
+
+    Partitions are keyed by PlayerState value, except that OFFLINE players still in
+    cooldown are kept apart under COOLING so sampling can skip them. Members are
+    player indices in the simulator's Population.
+    """
+    COOLING = 0
+    ACTIVE = (IN_GAME, LOGGED_IN, OFFLINE)
+    # Logged in players only emit an event when a server has room for them
+    PLAYING = (IN_GAME, OFFLINE)
+
+    KEYS = tuple(state.value for state in PlayerState) + (COOLING,)
+
+    def __init__(self, players: Population):
+        self.state = players.state
+        self.cooldown = players.cooldown
+        self.members = [array('i') for _ in range(max(self.KEYS) + 1)]
+        count = len(players)
+        if players.state.count(OFFLINE) == count and players.cooldown.count(0) == count:
+            # A new population, all offline and out of cooldown, is filed in bulk
+            self.members[OFFLINE] = array('i', range(count))
+            self.slot = array('i', self.members[OFFLINE])
+            return
+        self.slot = array('i', [0]) * count
+        for index in range(count):
+            self._add(index, self.key(index))
+
+    def snapshot_columns(self) -> Dict[str, array]:
+        """
+        Member order per partition, so a restored index samples exactly like this one.
+        """
+        return {
+            'index_sizes': array('i', [len(self.members[key]) for key in self.KEYS]),
+            'index_players': array(
+                'i', [index for key in self.KEYS for index in self.members[key]]
+            ),
+            'index_slot': self.slot,
+        }
 
+    @classmethod
+    def from_columns(cls, players: Population, columns: Dict[str, array]) -> "PlayerIndex":
+        index = cls.__new__(cls)
+        index.state = players.state
+        index.cooldown = players.cooldown
+        index.members = [array('i') for _ in range(max(cls.KEYS) + 1)]
+        order = columns['index_players']
+        start = 0
+        for key, size in zip(cls.KEYS, columns['index_sizes']):
+            index.members[key] = order[start:start + size]
+            start += size
+        index.slot = columns['index_slot']
+        return index
+
+    def key(self, index: int) -> int:
+        state = self.state[index]
+        if state == OFFLINE and self.cooldown[index] > 0:
+            return self.COOLING
+        return state
+
+    def _add(self, index: int, key: int):
+        members = self.members[key]
+        self.slot[index] = len(members)
+        members.append(index)
+
+    def move(self, index: int, old_key: int):
+        """
+        Re-file a player after a transition, given its key before the transition.
+        """
+        new_key = self.key(index)
+        if new_key == old_key:
+            return
+        members = self.members[old_key]
+        last = members.pop()
+        if last != index:
+            position = self.slot[index]
+            members[position] = last
+            self.slot[last] = position
+        self._add(index, new_key)
+
+    def count(self, key: int) -> int:
+        return len(self.members[key])
+
+    def count_active(self, has_room: bool = True) -> int:
+        keys = self.ACTIVE if has_room else self.PLAYING
+        return sum(len(self.members[key]) for key in keys)
+
+    def sample_active(self, rng: random.Random, has_room: bool = True) -> int:
+        """
+        Uniformly sample a player that will emit an event when drawn, given whether
+        any server has room for a logged in player.
+        """
+        r = rng.randrange(self.count_active(has_room))
+        for key in self.ACTIVE if has_room else self.PLAYING:
+            members = self.members[key]
+            if r < len(members):
+                return members[r]
+            r -= len(members)
 
 
 class GameEventSimulator:
-    def __init__(self, config_json: str):
+    def __init__(self, config_json: str, seed: int = None):
         self.config = config_json
 
+        # All randomness comes from this instance, so a seed reproduces a run
+        self.seed = seed if seed is not None else self.config.get('seed')
+        self.rng = random.Random(self.seed)
+
         # Generate difficulties for maps
         self.maps = self._initialize_maps_with_difficulty_array()
 
+        # Validate the config once and precompute the tables used on every event
+        self.compiled = compile_config(
+            self.config,
+            server_states=[state.name for state in ServerState],
+            difficulty_arrays={
+                name: levels[0].difficulty_array if levels else []
+                for name, levels in self.maps.items()
+            },
+        )
+
         # Rest of the initialization remains the same
         self.servers = self._initialize_servers()
+        self.servers_by_id = {server.server_id: server for server in self.servers}
         self.players = self._initialize_players()
+        # Who plays on which server, and which online servers have room; see roster.py
+        self.roster = self._initialize_roster()
+
+        # Player state engine: 'python' resolves events one at a time on the population's columns,
+        # 'numpy' keeps player state in arrays and resolves a whole step in batch
+        self.backend = self.config.get('backend', 'python')
+        self.engine = None
+        if self.backend == 'numpy':
+            from array_engine import ArrayPlayerEngine
+            self.engine = ArrayPlayerEngine.from_simulator(self)
+        elif self.backend != 'python':
+            raise ValueError(f"Unknown simulator backend: {self.backend}")
+
+        # Player sampling: 'uniform' draws from all players, as a no-op draw still counts
+        # down cooldown; 'active' only draws players that will emit an event, and cooldown
+        # then counts down in simulation steps instead of draws
+        self.player_sampling = self.config.get('player_sampling', 'uniform')
+        if self.player_sampling not in ('uniform', 'active'):
+            raise ValueError(f"Unknown player sampling mode: {self.player_sampling}")
+        if self.player_sampling == 'active' and self.engine is not None:
+            raise ValueError("'active' player sampling is only supported by the python backend")
+
+        self.player_index = PlayerIndex(self.players) if self.engine is None else None
+        self.cooldown_wheel = defaultdict(list)
+        self.online_servers = sum(
+            1 for server in self.servers if server.state == ServerState.ONLINE
+        )
 
-        logging.info(f"Initialized simulator with {len(self.servers)} servers, {len(self.players)} players")
+        logging.info(
+            f"Initialized simulator with {len(self.servers)} servers, {len(self.players)} players"
+        )
 
         self.current_time_step = 0
-        self.event_log = []
+        # Bounded by default; see event_log.create_event_log for the policies
+        self.event_log = create_event_log(self.config.get('event_log', {}))
+        # Stamps event_timestamp on each step's events; off unless configured
+        self.event_clock = create_event_clock(self.config.get('event_time', {}), seed=self.seed)
+        # Called after every step with (time step, duration in seconds, event count),
+        # e.g. to feed a step duration histogram
+        self.step_listeners: List[Callable[[int, float, int], None]] = []
 
     def _generate_difficulty_array(self, map_config: Dict[str, Any]) -> List[float]:
         """
@@ -81,6 +239,7 @@ class GameEventSimulator:
         1. Linear progression
         2. Exponential increase
         3. Random with constraints
+        4. Fixed, an explicit difficulty_array
         """
         total_levels = map_config.get("total_levels", 5)
         generation_strategy = map_config.get("difficulty_strategy", "linear")
@@ -107,7 +266,7 @@ class GameEventSimulator:
             base_difficulty = map_config.get("base_difficulty", 0.1)
             max_difficulty = map_config.get("max_difficulty", 1.0)
             return [
-                random.uniform(
+                self.rng.uniform(
                     base_difficulty
                     + (max_difficulty - base_difficulty)
                     * (level / (total_levels - 1))
@@ -120,6 +279,9 @@ class GameEventSimulator:
                 for level in range(total_levels)
             ]
 
+        elif generation_strategy == "fixed":
+            return list(map_config["difficulty_array"])
+
         else:
             raise ValueError(
                 f"Unknown difficulty generation strategy: {generation_strategy}"
@@ -147,78 +309,225 @@ class GameEventSimulator:
             server = GameServer(
                 server_id=server_config['server_id'],
                 state=ServerState[server_config.get('initial_state', 'OFFLINE')],
-                max_players=server_config.get('max_players', 100)
+                max_players=server_config.get('max_players', 100),
+                index=len(servers),
             )
             servers.append(server)
         return servers
 
-    def _initialize_players(self) -> List[Player]:
-        player_init_config = self.config.get('player_init')
-        if player_init_config is None:
-            raise ValueError("player_init configuration is missing")
-        num_players = player_init_config.get('num_players')
-        if num_players is None:
-            raise ValueError("num_players is missing in player_init configuration")
-        skill_level_range = player_init_config.get('skill_level_range')
-        if skill_level_range is None:
-            raise ValueError("skill_level_range is missing in player_init configuration, e.g. [0.1, 0.9]")
-
-        players = []
-        for player_config in range(num_players):
-            player_id = f"player_{player_config}"
-            skill_level = random.uniform(*skill_level_range)
-            player = Player(
-                player_id=player_id,
-                skill_level=skill_level,
-                deaths = 0
-            )
-            players.append(player)
-        return players
+    def _initialize_roster(self) -> ServerRoster:
+        roster = ServerRoster([server.max_players for server in self.servers], len(self.players))
+        for server in self.servers:
+            server.current_players = roster.members[server.index]
+            roster.set_online(server.index, server.state == ServerState.ONLINE)
+        return roster
+
+    def _initialize_players(self) -> Population:
+        """
+        Draw every player's skill level in one bulk call; see population.uniform_column.
+        """
+        low, high = self.compiled.skill_level_range
+        skill = uniform_column(self.rng, self.compiled.num_players, low, high)
+        return Population(
+            skill, PlayerState, self.compiled.map_names, id_offset=self.compiled.player_id_offset
+        )
+
+    def count_logged_in(self) -> int:
+        if self.engine is not None:
+            return self.engine.count_logged_in()
+        return len(self.players) \
+            - self.player_index.count(OFFLINE) \
+            - self.player_index.count(PlayerIndex.COOLING)
 
-    def _generate_event_count(self) -> int:
+    def count_active(self) -> int:
+        """
+        Number of players that will emit an event when drawn in 'active' sampling.
+        """
+        if self.player_index is None:
+            return len(self.players)
+        return self.player_index.count_active(self.roster.has_room())
+
+    def _generate_event_count(self, logged_in_players: int = None) -> int:
         """
         Generate event count based on online servers and logged in players.
 
-        Uses config parameters for randomness and scaling.
+        Uses config parameters for randomness and scaling. logged_in_players defaults to
+        this simulator's own count; the sharded runner passes the total over all shards.
         """
-        online_servers = sum(1 for server in self.servers if server.state == ServerState.ONLINE)
-        logged_in_players = sum(1 for player in self.players if player.state != PlayerState.OFFLINE)
+        online_servers = self.online_servers
+        if logged_in_players is None:
+            logged_in_players = self.count_logged_in()
 
-        base_events = self.config.get('base_event_count', 10)
-        event_variance = self.config.get('event_variance', 0.3)
+        base_events = self.compiled.base_event_count
+        event_variance = self.compiled.event_variance
 
         scaled_events = base_events * (online_servers + logged_in_players) / 2
         variance_range = scaled_events * event_variance
 
-        return int(max(1, random.uniform(
+        return int(max(1, self.rng.uniform(
             scaled_events - variance_range,
             scaled_events + variance_range
         )))
 
-    def _calculate_level_progression(self, player: Player, map_level: MapLevel) -> Dict[str, Any]:
+    def _calculate_level_progression(self, skill_level: float, difficulty: float) -> bool:
         """
-        Determine if player advances or fails based on difficulty and skill.
+        Determine if a player advances or fails based on difficulty and skill.
 
-        Incorporates out-of-band difficulty if specified in config.
+        The difficulty comes from the compiled config, with out-of-band overrides applied.
         """
-        out_of_band_difficulty = self.config.get('out_of_band_difficulty', {}).get(
-            f"{map_level.map_name}_level_{map_level.level_number}"
+        progression_probability = skill_level / (difficulty + skill_level)
+        return self.rng.random() < progression_probability
+
+    def _set_server_state(self, server: GameServer, new_state: ServerState):
+        """
+        Players already on a server that goes down play on until their game ends,
+        but it takes no new ones until it's back online.
+        """
+        self.online_servers += (
+            (new_state == ServerState.ONLINE) - (server.state == ServerState.ONLINE)
         )
+        server.state = new_state
+        self.roster.set_online(server.index, new_state == ServerState.ONLINE)
 
-        difficulty = out_of_band_difficulty if out_of_band_difficulty is not None \
-            else map_level.get_current_difficulty()
+    def _server_by_id(self, server_id: str) -> GameServer:
+        server = self.servers_by_id.get(server_id)
+        if server is None:
+            raise ValueError(f"Unknown server: {server_id}")
+        return server
+
+    def drain_server(self, server_id: str, target_id: Optional[str] = None):
+        """
+        Directive: stop placing new players on a server. With a target, the server
+        is consolidated into it: its players move to the target as they change
+        areas, in bulk at the end of each step (see _run_migrations).
+        """
+        server = self._server_by_id(server_id)
+        target = self._server_by_id(target_id) if target_id is not None else None
+        self.roster.drain(server.index, target.index if target is not None else None)
+        into = f" into {target_id}" if target_id is not None else ""
+        logging.info(f"Draining {server_id}{into}")
 
-        progression_probability = player.skill_level / (difficulty + player.skill_level)
+    def resume_server(self, server_id: str):
+        """
+        Cancel a drain_server directive.
+        """
+        self.roster.resume(self._server_by_id(server_id).index)
 
-        return {
-            'success': random.random() < progression_probability,
-            'difficulty': difficulty
+    def _run_migrations(self) -> List[Dict[str, Any]]:
+        """
+        Apply this step's consolidation moves and return one event per drained server.
+        """
+        if not self.roster.pending:
+            return []
+        servers = self.servers
+        return [
+            {
+                'event_type': 'server_migration',
+                'server_id': servers[source].server_id,
+                'target_server_id': servers[target].server_id,
+                'players': moved,
+                'timestamp': self.current_time_step
+            }
+            for source, target, moved in self.roster.run_migrations()
+        ]
+
+    def _release_cooldowns(self):
+        """
+        In 'active' sampling, return players whose cooldown ends this step to the pool.
+        """
+        cooldown = self.players.cooldown
+        for index in self.cooldown_wheel.pop(self.current_time_step, []):
+            old_key = self.player_index.key(index)
+            cooldown[index] = 0
+            self.player_index.move(index, old_key)
+
+    def close(self):
+        """
+        Release resources held by the event log, e.g. an open spill segment.
+        """
+        self.event_log.close()
+
+    def snapshot(self, path: str) -> None:
+        """
+        Write the RNG state, players, servers, server rosters and time step to a
+        compact binary file that restore() can load.
+        """
+        header = {
+            'backend': self.backend,
+            'time_step': self.current_time_step,
+            'rng_state': self.rng.getstate(),
+            'num_players': len(self.players),
+            'map_names': list(self.compiled.map_names),
+            'servers': [[server.server_id, server.state.name] for server in self.servers],
         }
+        if self.engine is not None:
+            header['engine_rng_state'] = self.engine.rng.bit_generator.state
+            columns = dict(self.engine.snapshot_columns(), **self.roster.snapshot_columns())
+        else:
+            columns = {
+                **self.players.snapshot_columns(),
+                'wheel_steps': array('q', [
+                    step for step, waiting in self.cooldown_wheel.items() for _ in waiting
+                ]),
+                'wheel_players': array('i', [
+                    index for waiting in self.cooldown_wheel.values() for index in waiting
+                ]),
+                **self.player_index.snapshot_columns(),
+                **self.roster.snapshot_columns(),
+            }
+        write_snapshot(path, header, columns)
+
+    def restore(self, path: str) -> None:
+        """
+        Load state written by snapshot().
+
+        The simulator must have been built from the same config: same backend,
+        number of players, servers and maps.
+        """
+        header, columns = read_snapshot(path)
+        if header['backend'] != self.backend:
+            raise ValueError(
+                f"Snapshot was taken with the {header['backend']} backend, not {self.backend}"
+            )
+        server_ids = [server_id for server_id, _ in header['servers']]
+        if header['num_players'] != len(self.players) \
+                or header['map_names'] != list(self.compiled.map_names) \
+                or server_ids != [s.server_id for s in self.servers]:
+            raise ValueError("Snapshot does not match this simulator's players, maps or servers")
+
+        version, internal_state, gauss_next = header['rng_state']
+        self.rng.setstate((version, tuple(internal_state), gauss_next))
+        self.current_time_step = header['time_step']
+        for server, (_, state) in zip(self.servers, header['servers']):
+            server.state = ServerState[state]
+        self.online_servers = sum(
+            1 for server in self.servers if server.state == ServerState.ONLINE
+        )
+        self.roster.restore_columns(
+            columns, [server.state == ServerState.ONLINE for server in self.servers]
+        )
+        for server in self.servers:
+            server.current_players = self.roster.members[server.index]
+
+        if self.engine is not None:
+            self.engine.restore_columns(columns, header['engine_rng_state'])
+            return
 
-    def _server_add_player(self, server, player):
-        if server.current_players is None:
-            server.current_players = []
-        server.current_players.append(player)
+        self.players.restore_columns(columns)
+        self.cooldown_wheel = defaultdict(list)
+        for step, i in zip(columns['wheel_steps'], columns['wheel_players']):
+            self.cooldown_wheel[step].append(i)
+        self.player_index = PlayerIndex.from_columns(self.players, columns)
+
+    def sync_players(self):
+        """
+        Make self.players reflect the numpy engine's player state.
+
+        The engine works on self.players' columns in place, so they are always
+        current and this only matters for an engine built on columns of its own.
+        """
+        if self.engine is not None:
+            self.engine.sync_to(self.players)
 
     def run_step(self) -> List[Dict[str, Any]]:
         """
@@ -226,25 +535,135 @@ class GameEventSimulator:
 
         Returns a list of events in JSON-serializable format.
         """
+        start = time.perf_counter()
         self.current_time_step += 1
-        step_events = []
 
         # Generate server state transition events
+        step_events = self._run_server_transitions()
+
+        event_count = self._generate_event_count()
+        logging.debug(
+            f"Drawing player {event_count} events for time step {self.current_time_step} "
+            f"out of {len(self.players)} players"
+        )
+        step_events.extend(self.run_player_events(event_count))
+
+        self.event_clock.stamp(step_events, self.current_time_step)
+        self.event_log.extend(step_events)
+        if self.step_listeners:
+            duration = time.perf_counter() - start
+            for listener in self.step_listeners:
+                listener(self.current_time_step, duration, len(step_events))
+        return step_events
+
+    def iter_step_chunks(self, chunk_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Execute a single time step like run_step, but yield its events in chunks
+        as they are produced instead of building the whole step first.
+
+        The step's server events come first, then the events of every chunk_size
+        player draws (with the numpy backend, which resolves a step in one batch,
+        the step's events cut into chunks of chunk_size). With an event clock, each
+        chunk is stamped over its share of the step's draws, and server events at
+        the start of the step.
+        """
+        if chunk_size <= 0:
+            raise ValueError(f"chunk_size must be positive, got {chunk_size}")
+        busy = 0.0
+        start = time.perf_counter()
+        self.current_time_step += 1
+        time_step = self.current_time_step
+        event_total = 0
+
+        server_events = self._run_server_transitions()
+        event_count = self._generate_event_count()
+        if self.engine is not None:
+            events = self.run_player_events(event_count)
+            chunks = (
+                (
+                    events[i:i + chunk_size],
+                    event_count * min(i + chunk_size, len(events)) // len(events),
+                )
+                for i in range(0, len(events), chunk_size)
+            )
+        else:
+            chunks = self._player_event_chunks(event_count, chunk_size)
+
+        chunk, previous, done = server_events, 0, 0
+        while True:
+            if chunk:
+                # Stamped over the share of the step's draws the chunk came from
+                span = (previous / event_count, done / event_count) if event_count else (0.0, 0.0)
+                self.event_clock.stamp(chunk, time_step, *span)
+                self.event_log.extend(chunk)
+                event_total += len(chunk)
+                busy += time.perf_counter() - start
+                yield chunk
+                start = time.perf_counter()
+            previous = done
+            next_chunk = next(chunks, None)
+            if next_chunk is None:
+                break
+            chunk, done = next_chunk
+
+        if self.step_listeners:
+            busy += time.perf_counter() - start
+            for listener in self.step_listeners:
+                listener(time_step, busy, event_total)
+
+    def iter_event_chunks(
+        self,
+        chunk_size: int = 1000,
+        steps: Optional[int] = None,
+        duration: Optional[float] = None,
+        max_events: Optional[int] = None,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Yield event chunks from iter_step_chunks, step after step, until steps
+        steps have run, duration seconds have passed or max_events events have
+        been yielded; without a limit it runs forever. Only one chunk is held at
+        a time, so memory doesn't grow with the step size. An event budget can
+        end in the middle of a step.
+        """
+        deadline = time.monotonic() + duration if duration is not None else None
+        remaining = max_events
+        step = 0
+        while steps is None or step < steps:
+            step += 1
+            for chunk in self.iter_step_chunks(chunk_size):
+                if remaining is not None:
+                    if len(chunk) >= remaining:
+                        yield chunk[:remaining]
+                        return
+                    remaining -= len(chunk)
+                yield chunk
+                if deadline is not None and time.monotonic() >= deadline:
+                    return
+
+    def iter_events(self, **limits) -> Iterator[Dict[str, Any]]:
+        """
+        Yield events one at a time, with the limits of iter_event_chunks.
+        """
+        for chunk in self.iter_event_chunks(**limits):
+            yield from chunk
+
+    def _run_server_transitions(self) -> List[Dict[str, Any]]:
+        """
+        Apply this step's Markov server state transitions and return their events.
+        """
+        rng = self.rng
+        step_events = []
+        transition_prob = self.compiled.server_state_transition_prob
+        server_transitions = self.compiled.server_transitions
         for server in self.servers:
-            if random.random() < self.config.get('server_state_transition_prob'):
-                server = random.choice(self.servers)
+            if rng.random() < transition_prob:
+                server = rng.choice(self.servers)
                 old_state = server.state
 
                 # Implement Markov state transition based on config probabilities
-                transition_probs = self.config.get('server_state_transitions').get(
-                    old_state.name, {}
-                )
-                new_state = ServerState[random.choices(
-                    list(transition_probs.keys()),
-                    weights=list(transition_probs.values())
-                )[0]]
+                new_state = ServerState[server_transitions[old_state.name].sample(rng)]
 
-                server.state = new_state
+                self._set_server_state(server, new_state)
                 step_events.append({
                     'event_type': 'server_state_change',
                     'server_id': server.server_id,
@@ -252,75 +671,190 @@ class GameEventSimulator:
                     'new_state': new_state.name,
                     'timestamp': self.current_time_step
                 })
+        return step_events
 
-        event_count = self._generate_event_count()
-        logging.debug(f"Drawing player {event_count} events for time step {self.current_time_step} out of {len(self.players)} players")
-        for _ in range(event_count):
-            # Generate player level progression/death events
-            player = random.choice(self.players)
-            if player.current_map and player.state == PlayerState.IN_GAME:
-                current_map_levels = self.maps.get(player.current_map, [])
-                current_level_obj = current_map_levels[player.current_level - 1]
+    def run_player_events(self, event_count: int) -> List[Dict[str, Any]]:
+        """
+        Resolve event_count player draws for the current time step on the configured backend.
+        """
+        if self.engine is not None:
+            step_events = self.engine.run_player_events(event_count, self.current_time_step)
+        else:
+            step_events = self._run_player_events(event_count)
+        step_events.extend(self._run_migrations())
+        return step_events
+
+    def _run_player_events(self, event_count: int) -> List[Dict[str, Any]]:
+        """
+        Draw event_count players one at a time and advance their state machine.
+        """
+        step_events = []
+        if self.player_sampling == 'active':
+            self._release_cooldowns()
+        self._draw_players(event_count, step_events)
+        return step_events
 
-                progression = self._calculate_level_progression(player, current_level_obj)
+    def _player_event_chunks(
+        self, event_count: int, chunk_draws: int
+    ) -> Iterator[Tuple[List[Dict[str, Any]], int]]:
+        """
+        Like run_player_events, but yield the events of every chunk_draws draws as
+        soon as they are drawn, with the number of draws done so far.
+        """
+        if self.player_sampling == 'active':
+            self._release_cooldowns()
+        done = 0
+        while done < event_count:
+            draws = min(chunk_draws, event_count - done)
+            chunk = []
+            drawn_all = self._draw_players(draws, chunk)
+            done += draws
+            yield chunk, done
+            if not drawn_all:
+                break
+        migrations = self._run_migrations()
+        if migrations:
+            yield migrations, done
+
+    def _draw_players(self, draws: int, step_events: List[Dict[str, Any]]) -> bool:
+        """
+        Make draws player draws, appending their events to step_events. Returns
+        False if 'active' sampling ran out of players before all draws were made.
+        """
+        difficulty_by_code = self.compiled.difficulty
+        map_names = self.compiled.map_names
+        active_sampling = self.player_sampling == 'active'
+        roster = self.roster
+        servers = self.servers
+        player_index = self.player_index
+        rng = self.rng
+        players = self.players
+        player_ids = players.ids
+        # Same draws as choosing from a list of players or map names
+        all_players = range(len(players))
+        map_codes = range(len(map_names))
+        skill, state, maps, level = players.skill, players.state, players.map, players.level
+        deaths, cooldown = players.deaths, players.cooldown
+        for _ in range(draws):
+            # Generate player level progression/death events
+            if active_sampling:
+                # Players waiting for a server are left out while every server is full
+                has_room = roster.has_room()
+                if player_index.count_active(has_room) == 0:
+                    return False
+                i = player_index.sample_active(rng, has_room)
+            else:
+                i = rng.choice(all_players)
+            old_key = player_index.key(i)
+            if maps[i] != NO_MAP and state[i] == IN_GAME:
+                map_difficulty = difficulty_by_code[maps[i]]
+                current_level = level[i]
+                difficulty = map_difficulty[current_level - 1]
+                success = self._calculate_level_progression(skill[i], difficulty)
 
                 event = {
                     'event_type': 'player_progression',
-                    'player_id': player.player_id,
-                    'map': player.current_map,
-                    'current_level': player.current_level,
-                    'success': progression['success'],
-                    'difficulty': progression['difficulty'],
+                    'player_id': player_ids[i],
+                    'map': map_names[maps[i]],
+                    'current_level': current_level,
+                    'success': success,
+                    'difficulty': difficulty,
                     'timestamp': self.current_time_step
                 }
 
-                if progression['success'] and player.current_level < len(current_map_levels):
-                    player.current_level += 1
-                    event['new_level'] = player.current_level
+                if success and current_level < len(map_difficulty):
+                    level[i] = current_level + 1
+                    event['new_level'] = current_level + 1
+                    if roster.consolidate_to:
+                        roster.changed_area(i)
                 else:
-                    player.state = PlayerState.OFFLINE
-                    player.deaths += 1
-                    if player.deaths > 3:
-                        player.cooldown = player.deaths / 2 + 1
+                    # The game is over, and the player leaves its server
+                    roster.remove(i)
+                    state[i] = OFFLINE
+                    deaths[i] += 1
+                    if deaths[i] > 3:
+                        cooldown[i] = deaths[i] / 2 + 1
+                        if active_sampling:
+                            release_step = self.current_time_step + math.ceil(cooldown[i])
+                            self.cooldown_wheel[release_step].append(i)
                     event['event_type'] = 'player_death'
 
                 step_events.append(event)
 
-            elif player.state == PlayerState.OFFLINE:
+            elif state[i] == OFFLINE:
                 # Player is offline, move to logged in state, depending on deaths
-                if player.cooldown > 0:
-                    player.cooldown -= 1
+                if cooldown[i] > 0:
+                    cooldown[i] -= 1
 
-                if player.cooldown == 0:
-                    player.state = PlayerState.LOGGED_IN
+                if cooldown[i] == 0:
+                    state[i] = LOGGED_IN
                     step_events.append({
                         'event_type': 'player_login',
-                        'player_id': player.player_id,
+                        'player_id': player_ids[i],
                         'timestamp': self.current_time_step
                     })
 
-            if player.state == PlayerState.LOGGED_IN:
-                # Player is logged in, move to in-game state
-                player.state = PlayerState.IN_GAME
-                player.current_map = random.choice(list(self.maps.keys()))
-                player.current_level = 1
-
-                # add to server
-                server = random.choice(self.servers)
-                self._server_add_player(server, player)
+            # Player is logged in, move to in-game state on a server with room; with
+            # none, the player waits logged in until a later draw
+            if state[i] == LOGGED_IN and roster.has_room():
+                server = roster.place(i, rng.random())
+                state[i] = IN_GAME
+                maps[i] = rng.choice(map_codes)
+                level[i] = 1
 
                 step_events.append({
                     'event_type': 'player_start_game',
-                    'player_id': player.player_id,
-                    'map': player.current_map,
-                    'level': player.current_level,
+                    'player_id': player_ids[i],
+                    'map': map_names[maps[i]],
+                    'level': 1,
+                    'server_id': servers[server].server_id,
                     'timestamp': self.current_time_step
                 })
 
-
-        self.event_log.extend(step_events)
-        return step_events
-
+            player_index.move(i, old_key)
+
+        return True
+
+
+# Example config, also used by the other gs-funnel entry points
+EXAMPLE_SIM_CONFIG = {
+    "backend": os.environ.get('SIM_BACKEND', 'python'),  # Options: 'python', 'numpy'
+    "servers": [
+        {"server_id": "server_1", "initial_state": "ONLINE", "max_players": 100},
+        {"server_id": "server_2", "initial_state": "OFFLINE", "max_players": 100},
+    ],
+    "player_init": {
+        "num_players": 10,
+        "skill_level_range": [0.1, 0.9]
+    },
+    "base_event_count": 10,
+    "event_variance": 0.3,
+    "event_log": {"policy": "ring", "max_events": 1000},  # Options: 'disabled', 'ring', 'spill'
+    "event_time": {"clock": "none"},  # Options: 'none', 'wall', 'synthetic'
+    "out_of_band_difficulty": {"Forest_level_3": 0.9},
+    "maps": [
+        {
+            "name": "Forest",
+            "total_levels": 5,
+            "base_difficulty": 0.1,
+            "max_difficulty": 1.0,
+            "difficulty_strategy": "linear",  # Options: 'linear', 'exponential', 'random', 'fixed'
+        },
+        {
+            "name": "Mountain",
+            "total_levels": 7,
+            "base_difficulty": 0.2,
+            "max_difficulty": 1.2,
+            "difficulty_strategy": "exponential",
+        },
+    ],
+    "server_state_transition_prob": 0.1,
+    "server_state_transitions": {
+        "ONLINE": {"ONLINE": 0.97, "OFFLINE": 0.02, "MAINTENANCE": 0.01},
+        "OFFLINE": {"ONLINE": 0.2, "OFFLINE": 0.7, "MAINTENANCE": 0.1},
+        "MAINTENANCE": {"ONLINE": 0.1, "OFFLINE": 0.1, "MAINTENANCE": 0.8},
+    },
+}
 
 
 if __name__ == "__main__":
@@ -328,47 +862,15 @@ if __name__ == "__main__":
         level=os.environ.get('PY_LOG', 'INFO').upper()
     )
 
-    sim_config = {
-        "servers": [
-            {"server_id": "server_1", "initial_state": "ONLINE", "max_players": 100},
-            {"server_id": "server_2", "initial_state": "OFFLINE", "max_players": 100},
-        ],
-        "player_init" : {
-            "num_players": 10,
-            "skill_level_range": [0.1, 0.9]
-        },
-        "base_event_count": 10,
-        "event_variance": 0.3,
-        "out_of_band_difficulty": {"Forest_level_3": 0.9},
-        "maps": [
-            {
-                "name": "Forest",
-                "total_levels": 5,
-                "base_difficulty": 0.1,
-                "max_difficulty": 1.0,
-                "difficulty_strategy": "linear",  # Options: 'linear', 'exponential', 'random'
-            },
-            {
-                "name": "Mountain",
-                "total_levels": 7,
-                "base_difficulty": 0.2,
-                "max_difficulty": 1.2,
-                "difficulty_strategy": "exponential",
-            },
-        ],
-        "server_state_transition_prob": 0.1,
-        "server_state_transitions": {
-            "ONLINE": {"ONLINE": 0.97, "OFFLINE": 0.02, "MAINTENANCE": 0.01},
-            "OFFLINE": {"ONLINE": 0.2, "OFFLINE": 0.7, "MAINTENANCE": 0.1},
-            "MAINTENANCE": {"ONLINE": 0.1, "OFFLINE": 0.1, "MAINTENANCE": 0.8},
-        },
-    }
-    simulator = GameEventSimulator(sim_config)
-
-    # Run multiple simulation steps
-    for _ in range(5):
-        events = simulator.run_step()
-        print(f"Generated {len(events)} events:")
-        for event in events:
-            print(json.dumps(event, indent=2))
+    sim_config = copy.deepcopy(EXAMPLE_SIM_CONFIG)
+    seed = os.environ.get('SIM_SEED')
+    simulator = GameEventSimulator(sim_config, seed=int(seed) if seed is not None else None)
+    simulator.step_listeners.append(
+        lambda step, duration, count: logging.debug(
+            f"Step {step} took {duration * 1000:.2f} ms for {count} events"
+        )
+    )
 
+    # Run multiple simulation steps, printing events as they are produced
+    for event in simulator.iter_events(steps=5):
+        print(json.dumps(event))
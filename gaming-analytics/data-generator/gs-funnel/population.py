@@ -0,0 +1,177 @@
+import random
+from array import array
+from enum import Enum
+from typing import Dict, Iterator, Optional, Sequence, Type
+
+NO_MAP = -1
+
+# Players per getrandbits call in uniform_column, bounding its temporary buffers
+_CHUNK = 1 << 20
+
+
+class PlayerIds:
+    """
+    The player_<n> ids of a contiguous range of players, formatted on access
+    instead of stored.
+    """
+    __slots__ = ('offset', 'count')
+
+    def __init__(self, offset: int, count: int):
+        self.offset = offset
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index: int) -> str:
+        if not 0 <= index < self.count:
+            if not -self.count <= index < 0:
+                raise IndexError("player index out of range")
+            index += self.count
+        return f"player_{self.offset + index}"
+
+    def __iter__(self) -> Iterator[str]:
+        offset = self.offset
+        return (f"player_{offset + index}" for index in range(self.count))
+
+
+def uniform_column(rng: random.Random, count: int, low: float, high: float) -> array:
+    """
+    count draws of rng.uniform(low, high) as an array('d'), built in bulk.
+
+    The values, and the generator state afterwards, are exactly those of calling
+    rng.uniform count times: each random() is made of two 32-bit Mersenne Twister
+    outputs, and getrandbits returns the same outputs in one call. NumPy does the
+    arithmetic when it's installed; otherwise this falls back to the plain loop.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        uniform = rng.uniform
+        return array('d', [uniform(low, high) for _ in range(count)])
+
+    column = array('d')
+    for start in range(0, count, _CHUNK):
+        size = min(_CHUNK, count - start)
+        words = np.frombuffer(rng.getrandbits(64 * size).to_bytes(8 * size, 'little'), dtype='<u4')
+        # random(): (a * 2**26 + b) / 2**53 from a 27-bit a and a 26-bit b
+        u = ((words[0::2] >> 5) * 67108864.0 + (words[1::2] >> 6)) / 9007199254740992.0
+        column.frombytes((low + (high - low) * u).tobytes())
+    return column
+
+
+class Player:
+    """
+    One player of a Population. Attributes read and write its columns, except
+    state and cooldown: the simulator files players by them (see PlayerIndex), so
+    they only change through its transitions.
+    """
+    __slots__ = ('population', 'index')
+
+    def __init__(self, population: "Population", index: int):
+        self.population = population
+        self.index = index
+
+    @property
+    def player_id(self) -> str:
+        return self.population.ids[self.index]
+
+    @property
+    def skill_level(self) -> float:
+        return self.population.skill[self.index]
+
+    @skill_level.setter
+    def skill_level(self, value: float):
+        self.population.skill[self.index] = value
+
+    @property
+    def current_map(self) -> Optional[str]:
+        code = self.population.map[self.index]
+        return self.population.map_names[code] if code != NO_MAP else None
+
+    @current_map.setter
+    def current_map(self, name: Optional[str]):
+        population = self.population
+        code = population.map_names.index(name) if name is not None else NO_MAP
+        population.map[self.index] = code
+
+    @property
+    def current_level(self) -> int:
+        return self.population.level[self.index]
+
+    @current_level.setter
+    def current_level(self, value: int):
+        self.population.level[self.index] = value
+
+    @property
+    def state(self) -> Enum:
+        return self.population.states(self.population.state[self.index])
+
+    @property
+    def deaths(self) -> int:
+        return self.population.deaths[self.index]
+
+    @deaths.setter
+    def deaths(self, value: int):
+        self.population.deaths[self.index] = value
+
+    @property
+    def cooldown(self) -> float:
+        return self.population.cooldown[self.index]
+
+    def __repr__(self) -> str:
+        return (f"Player(player_id={self.player_id!r}, skill_level={self.skill_level!r}, "
+                f"current_map={self.current_map!r}, current_level={self.current_level!r}, "
+                f"state={self.state!r}, deaths={self.deaths!r}, cooldown={self.cooldown!r})")
+
+
+class Population:
+    """
+    The simulator's players as typed columns, one entry per player: about 27 bytes
+    a player, against several hundred for an object each.
+
+    States are stored by their enum value and maps by their position in
+    map_names (NO_MAP for none); ids are derived from the index. Indexing gives a
+    Player that reads and writes through to the columns.
+    """
+
+    COLUMNS = {'skill': 'd', 'state': 'b', 'map': 'h', 'level': 'i', 'deaths': 'i', 'cooldown': 'd'}
+
+    def __init__(
+        self, skill: array, states: Type[Enum], map_names: Sequence[str], id_offset: int = 0
+    ):
+        count = len(skill)
+        self.ids = PlayerIds(id_offset, count)
+        self.states = states
+        self.map_names = tuple(map_names)
+        self.skill = skill
+        self.state = array('b', [states['OFFLINE'].value]) * count
+        self.map = array('h', [NO_MAP]) * count
+        self.level = array('i', [1]) * count
+        self.deaths = array('i', [0]) * count
+        self.cooldown = array('d', [0.0]) * count
+
+    def __len__(self) -> int:
+        return len(self.skill)
+
+    def __getitem__(self, index: int) -> Player:
+        count = len(self.skill)
+        if not -count <= index < count:
+            raise IndexError("player index out of range")
+        return Player(self, index % count)
+
+    def __iter__(self) -> Iterator[Player]:
+        return (Player(self, index) for index in range(len(self.skill)))
+
+    def snapshot_columns(self) -> Dict[str, array]:
+        return {name: getattr(self, name) for name in self.COLUMNS}
+
+    def restore_columns(self, columns: Dict[str, array]):
+        """
+        Replace every column, e.g. from a snapshot or the numpy engine's arrays.
+        """
+        for name, typecode in self.COLUMNS.items():
+            column = columns[name]
+            if column.typecode != typecode or len(column) != len(self.skill):
+                raise ValueError(f"Column {name} does not match this population")
+            setattr(self, name, column)
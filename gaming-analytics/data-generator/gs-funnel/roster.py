@@ -0,0 +1,264 @@
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+NO_SERVER = -1
+# drain target column codes in snapshots
+_NOT_DRAINING = -2
+_DRAINING = -1
+
+
+class ServerRoster:
+    """
+    Which players each server hosts, and which servers can take more.
+
+    Servers and players are referred to by their position in the simulator's
+    servers and players lists, so both backends share one roster. Each server
+    holds a set of the players in a game on it; a player leaves it when the game
+    ends. Servers that accept players (online and not draining) are filed in
+    buckets by free slots, so placement on the least loaded server, and every
+    update after a join or a leave, is O(1) whatever the number of servers.
+
+    A draining server takes no new players. Draining to a consolidation target,
+    its players move to the target as they change areas; the moves noted during a
+    step are applied together by run_migrations().
+    """
+
+    def __init__(self, capacities: Sequence[int], num_players: int):
+        self.capacity = list(capacities)
+        self.members: List[Set[int]] = [set() for _ in self.capacity]
+        self.server_of = array('i', [NO_SERVER]) * num_players
+        self.online = [False] * len(self.capacity)
+        self.draining: Set[int] = set()
+        self.consolidate_to: Dict[int, int] = {}
+        # Players on a consolidating server that changed areas this step
+        self.pending: Dict[int, Set[int]] = {}
+
+        self.buckets: List[List[int]] = [[] for _ in range(max(self.capacity, default=0) + 1)]
+        self.bucket_of = [NO_SERVER] * len(self.capacity)
+        self.slot = [0] * len(self.capacity)
+        # Most free slots of any accepting server; 0 when none has room
+        self.top = 0
+
+    def free(self, server: int) -> int:
+        return self.capacity[server] - len(self.members[server])
+
+    def has_room(self) -> bool:
+        return self.top > 0
+
+    def _file(self, server: int):
+        free = self.free(server)
+        bucket = self.buckets[free]
+        self.bucket_of[server] = free
+        self.slot[server] = len(bucket)
+        bucket.append(server)
+        if free > self.top:
+            self.top = free
+
+    def _detach(self, server: int):
+        bucket = self.buckets[self.bucket_of[server]]
+        last = bucket.pop()
+        if last != server:
+            position = self.slot[server]
+            bucket[position] = last
+            self.slot[last] = position
+        self.bucket_of[server] = NO_SERVER
+
+    def _lower_top(self):
+        buckets = self.buckets
+        while self.top > 0 and not buckets[self.top]:
+            self.top -= 1
+
+    def _refile(self, server: int):
+        """
+        Move a filed server to the bucket for its current free slots.
+        """
+        if self.bucket_of[server] == NO_SERVER or self.bucket_of[server] == self.free(server):
+            return
+        self._detach(server)
+        self._file(server)
+        # Filed first, so the scan stops at the server's new bucket at the latest
+        self._lower_top()
+
+    def _update_filing(self, server: int):
+        accepting = self.online[server] and server not in self.draining
+        if accepting and self.bucket_of[server] == NO_SERVER:
+            self._file(server)
+        elif not accepting and self.bucket_of[server] != NO_SERVER:
+            self._detach(server)
+            self._lower_top()
+
+    def set_online(self, server: int, online: bool):
+        self.online[server] = online
+        self._update_filing(server)
+
+    def _shift(self, server: int, bucket_index: int, new_index: int):
+        """
+        Move a filed server from its bucket to the bucket of a neighbouring free count.
+        """
+        bucket = self.buckets[bucket_index]
+        position = self.slot[server]
+        last = bucket.pop()
+        if last != server:
+            bucket[position] = last
+            self.slot[last] = position
+        new_bucket = self.buckets[new_index]
+        self.slot[server] = len(new_bucket)
+        new_bucket.append(server)
+        self.bucket_of[server] = new_index
+
+    def place(self, player: int, u: float) -> int:
+        """
+        Put a player on an accepting server with the most free slots, ties broken by
+        u, a uniform random number in [0, 1). Returns the server, or NO_SERVER if
+        no server has room.
+        """
+        top = self.top
+        if top == 0:
+            return NO_SERVER
+        bucket = self.buckets[top]
+        server = bucket[int(u * len(bucket))]
+        self._shift(server, top, top - 1)
+        if not bucket:
+            # The server just went one bucket down, so that one isn't empty
+            self.top = top - 1
+        self.members[server].add(player)
+        self.server_of[player] = server
+        return server
+
+    def place_many(self, players: Iterable[int], uniforms: Iterable[float]) -> List[int]:
+        place = self.place
+        return [place(player, u) for player, u in zip(players, uniforms)]
+
+    def remove(self, player: int) -> int:
+        """
+        Take a player off its server, e.g. when its game ends. Returns the server.
+        """
+        server = self.server_of[player]
+        if server == NO_SERVER:
+            return server
+        self.members[server].discard(player)
+        self.server_of[player] = NO_SERVER
+        if self.pending:
+            self.pending.get(server, set()).discard(player)
+        free = self.bucket_of[server]
+        if free != NO_SERVER:
+            self._shift(server, free, free + 1)
+            if free + 1 > self.top:
+                self.top = free + 1
+        return server
+
+    def remove_many(self, players: Iterable[int]):
+        remove = self.remove
+        for player in players:
+            remove(player)
+
+    def drain(self, server: int, target: Optional[int] = None):
+        """
+        Stop placing players on server. With a target, its players move there as
+        they change areas.
+        """
+        if target is not None:
+            if target == server:
+                raise ValueError("A server can't be consolidated into itself")
+            self.consolidate_to[server] = target
+        else:
+            self.consolidate_to.pop(server, None)
+        self.draining.add(server)
+        self._update_filing(server)
+
+    def resume(self, server: int):
+        """
+        Cancel a drain, so server takes players again while it's online.
+        """
+        self.draining.discard(server)
+        self.consolidate_to.pop(server, None)
+        self.pending.pop(server, None)
+        self._update_filing(server)
+
+    def changed_area(self, player: int):
+        """
+        Note that a player changed areas; on a consolidating server it migrates at
+        the next run_migrations().
+        """
+        server = self.server_of[player]
+        if server in self.consolidate_to:
+            self.pending.setdefault(server, set()).add(player)
+
+    def migrate(self, source: int, target: int, players: Optional[Set[int]] = None) -> int:
+        """
+        Move players (default: all) from source to target in one step, as many as
+        target has free slots for. Returns the number moved.
+        """
+        room = self.free(target)
+        if room <= 0 or not self.online[target]:
+            return 0
+        moving = self.members[source] if players is None else players & self.members[source]
+        if len(moving) > room:
+            # Lowest indices first, so a restored roster migrates the same players
+            moving = set(sorted(moving)[:room])
+        else:
+            moving = set(moving)
+        self.members[source] -= moving
+        self.members[target] |= moving
+        server_of = self.server_of
+        for player in moving:
+            server_of[player] = target
+        self._refile(source)
+        self._refile(target)
+        return len(moving)
+
+    def run_migrations(self) -> List[Tuple[int, int, int]]:
+        """
+        Move the players that changed areas on consolidating servers to their
+        targets. Returns (source, target, players moved) for each source that moved any.
+        """
+        moves = []
+        for source, players in self.pending.items():
+            target = self.consolidate_to[source]
+            moved = self.migrate(source, target, players)
+            if moved:
+                moves.append((source, target, moved))
+        self.pending = {}
+        return moves
+
+    def snapshot_columns(self) -> Dict[str, array]:
+        """
+        Player servers, drains and bucket order, so a restored roster places exactly
+        like this one. Taken between steps, when no migration is pending.
+        """
+        return {
+            'player_server': self.server_of,
+            'server_drain': array('i', [
+                self.consolidate_to.get(server, _DRAINING)
+                if server in self.draining else _NOT_DRAINING
+                for server in range(len(self.capacity))
+            ]),
+            'server_slot': array('i', self.slot),
+        }
+
+    def restore_columns(self, columns: Dict[str, array], online: Sequence[bool]):
+        self.server_of = columns['player_server']
+        self.members = [set() for _ in self.capacity]
+        for player, server in enumerate(self.server_of):
+            if server != NO_SERVER:
+                self.members[server].add(player)
+        self.online = list(online)
+        self.draining = set()
+        self.consolidate_to = {}
+        self.pending = {}
+        for server, drain in enumerate(columns['server_drain']):
+            if drain != _NOT_DRAINING:
+                self.draining.add(server)
+                if drain != _DRAINING:
+                    self.consolidate_to[server] = drain
+
+        self.buckets = [[] for _ in self.buckets]
+        self.bucket_of = [NO_SERVER] * len(self.capacity)
+        self.top = 0
+        slots = columns['server_slot']
+        accepting = [
+            server for server in range(len(self.capacity))
+            if self.online[server] and server not in self.draining
+        ]
+        for server in sorted(accepting, key=lambda server: slots[server]):
+            self._file(server)
@@ -0,0 +1,258 @@
+import argparse
+import copy
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import sys
+from datetime import datetime
+from typing import Any, Dict, Iterator, List
+
+
+def derive_seed(master_seed: int, name: str) -> int:
+    """
+    Derive a stable 64-bit seed for a named component from the master seed.
+    """
+    digest = hashlib.sha256(f"{master_seed}/{name}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def encode_events(events: List[Dict[str, Any]]) -> bytes:
+    return "".join(json.dumps(event) + "\n" for event in events).encode("utf-8")
+
+
+def _split_count(total: int, weights: List[int]) -> List[int]:
+    """
+    Split total across shards in proportion to weights, largest remainder first.
+    """
+    weight_sum = sum(weights)
+    if weight_sum == 0:
+        weights, weight_sum = [1] * len(weights), len(weights)
+    counts = [total * weight // weight_sum for weight in weights]
+    remainders = sorted(
+        range(len(weights)),
+        key=lambda shard: (-(total * weights[shard] % weight_sum), shard),
+    )
+    for shard in remainders[:total - sum(counts)]:
+        counts[shard] += 1
+    return counts
+
+
+def _shard_worker(conn, shard_config: Dict[str, Any], seed: int):
+    """
+    Own one slice of the players; apply the coordinator's server states and directives
+    and resolve the player draws it is assigned each step.
+    """
+    from main import GameEventSimulator, ServerState
+
+    simulator = GameEventSimulator(shard_config, seed=seed)
+    conn.send((simulator.count_logged_in(), simulator.count_active()))
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+        time_step, server_states, directives, event_count = message
+        simulator.current_time_step = time_step
+        for server, state in zip(simulator.servers, server_states):
+            if server.state.name != state:
+                simulator._set_server_state(server, ServerState[state])
+        for directive, *args in directives:
+            getattr(simulator, directive)(*args)
+        events = simulator.run_player_events(event_count)
+        simulator.event_clock.stamp(events, time_step)
+        payload = encode_events(events)
+        conn.send((payload, simulator.count_logged_in(), simulator.count_active()))
+    simulator.close()
+    conn.close()
+
+
+class ShardedSimulator:
+    """
+    Run a GameEventSimulator population split across worker processes.
+
+    Players are divided into contiguous slices, one per shard, each simulated in its own
+    process with a seed derived from the master seed. The coordinator owns the servers:
+    once per step it applies the Markov server transitions, draws the step's event
+    count from the population-wide logged in count, splits the draws across shards and
+    broadcasts the server states. Each shard places its players on its share of every
+    server's slots, and drain directives are passed on to all shards, so a consolidation
+    emits a server_migration event per shard. Each step's output is the coordinator's
+    server events followed by every shard's events in shard order, as NDJSON, so the
+    same seed and shard count give byte-identical output.
+    """
+
+    def __init__(self, config: Dict[str, Any], num_shards: int, seed: int):
+        if num_shards <= 0:
+            raise ValueError("num_shards must be positive")
+        from main import GameEventSimulator
+
+        self.num_shards = num_shards
+        self.seed = seed
+
+        config = copy.deepcopy(config)
+        event_time = config.get('event_time', {})
+        if event_time.get('clock') == 'synthetic' and event_time.get('start') is None:
+            # One start time for the coordinator and every shard
+            start = datetime.utcnow().replace(microsecond=0).isoformat()
+            config['event_time'] = dict(event_time, start=start)
+
+        # The coordinator simulator holds no players, only the maps and servers. Maps
+        # are generated here once, so a 'random' difficulty strategy is shared by all shards.
+        coordinator_config = copy.deepcopy(config)
+        coordinator_config['player_init'] = dict(config['player_init'], num_players=0)
+        coordinator_config['backend'] = 'python'
+        coordinator_config['event_log'] = {'policy': 'disabled'}
+        self.coordinator = GameEventSimulator(
+            coordinator_config, seed=derive_seed(seed, "coordinator")
+        )
+        self.player_sampling = self.coordinator.player_sampling
+        # drain_server/resume_server calls for the shards, sent with the next step
+        self.directives = []
+
+        self.shard_sizes = []
+        self.logged_in = []
+        self.active = []
+        self.conns = []
+        self.processes = []
+        for shard in range(num_shards):
+            shard_config = self._shard_config(config, shard)
+            self.shard_sizes.append(shard_config['player_init']['num_players'])
+            parent_conn, child_conn = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_shard_worker,
+                args=(child_conn, shard_config, derive_seed(seed, f"shard-{shard}")),
+                daemon=True,
+            )
+            process.start()
+            child_conn.close()
+            self.conns.append(parent_conn)
+            self.processes.append(process)
+        for conn in self.conns:
+            logged_in, active = conn.recv()
+            self.logged_in.append(logged_in)
+            self.active.append(active)
+
+        logging.info(f"Started {num_shards} simulator shards for {sum(self.shard_sizes)} players")
+
+    def _shard_config(self, config: Dict[str, Any], shard: int) -> Dict[str, Any]:
+        num_players = config['player_init']['num_players']
+        start = num_players * shard // self.num_shards
+        end = num_players * (shard + 1) // self.num_shards
+
+        shard_config = copy.deepcopy(config)
+        shard_config['player_init']['num_players'] = end - start
+        shard_config['player_init']['id_offset'] = config['player_init'].get('id_offset', 0) + start
+        # Each shard hosts its slice of the players on its share of every server's slots
+        shard_sizes = [
+            num_players * (i + 1) // self.num_shards - num_players * i // self.num_shards
+            for i in range(self.num_shards)
+        ]
+        for server_config in shard_config.get('servers', []):
+            shares = _split_count(server_config.get('max_players', 100), shard_sizes)
+            server_config['max_players'] = shares[shard]
+        shard_config['maps'] = [
+            {
+                'name': name,
+                'difficulty_strategy': 'fixed',
+                'difficulty_array': levels[0].difficulty_array if levels else [],
+            }
+            for name, levels in self.coordinator.maps.items()
+        ]
+        # The merged stream is the output; shards keep no history of their own
+        shard_config['event_log'] = {'policy': 'disabled'}
+        return shard_config
+
+    @property
+    def current_time_step(self) -> int:
+        return self.coordinator.current_time_step
+
+    def drain_server(self, server_id: str, target_id: str = None):
+        """
+        GameEventSimulator.drain_server across all shards, from the next step.
+        """
+        self.coordinator.drain_server(server_id, target_id)
+        self.directives.append(('drain_server', server_id, target_id))
+
+    def resume_server(self, server_id: str):
+        self.coordinator.resume_server(server_id)
+        self.directives.append(('resume_server', server_id))
+
+    def run_step(self) -> bytes:
+        """
+        Execute one time step across all shards and return its events as NDJSON.
+        """
+        coordinator = self.coordinator
+        coordinator.current_time_step += 1
+        server_events = coordinator._run_server_transitions()
+        coordinator.event_clock.stamp(server_events, coordinator.current_time_step)
+
+        event_count = coordinator._generate_event_count(sum(self.logged_in))
+        weights = self.active if self.player_sampling == 'active' else self.shard_sizes
+        shard_counts = _split_count(event_count, weights)
+
+        server_states = [server.state.name for server in coordinator.servers]
+        directives, self.directives = self.directives, []
+        for conn, count in zip(self.conns, shard_counts):
+            conn.send((coordinator.current_time_step, server_states, directives, count))
+
+        chunks = [encode_events(server_events)]
+        for shard, conn in enumerate(self.conns):
+            payload, self.logged_in[shard], self.active[shard] = conn.recv()
+            chunks.append(payload)
+        return b"".join(chunks)
+
+    def run_step_events(self) -> List[Dict[str, Any]]:
+        return [json.loads(line) for line in self.run_step().splitlines()]
+
+    def iter_steps(self, steps: int) -> Iterator[bytes]:
+        for _ in range(steps):
+            yield self.run_step()
+
+    def close(self):
+        for conn in self.conns:
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self.processes:
+            process.join(timeout=5)
+        for conn in self.conns:
+            conn.close()
+        self.conns = []
+        self.processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    from event_clock import add_event_time_arguments, event_time_config
+    from main import EXAMPLE_SIM_CONFIG
+
+    logging.basicConfig(
+        level=os.environ.get('PY_LOG', 'INFO').upper()
+    )
+
+    parser = argparse.ArgumentParser(description="Run the game event simulator across processes")
+    parser.add_argument("--shards", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--steps", type=int, default=5)
+    parser.add_argument("--players", type=int, default=None,
+                        help="override player_init.num_players")
+    add_event_time_arguments(parser)
+    args = parser.parse_args()
+
+    sim_config = copy.deepcopy(EXAMPLE_SIM_CONFIG)
+    if args.players is not None:
+        sim_config['player_init']['num_players'] = args.players
+    event_time = event_time_config(args)
+    if event_time is not None:
+        sim_config['event_time'] = event_time
+
+    with ShardedSimulator(sim_config, num_shards=args.shards, seed=args.seed) as simulator:
+        for payload in simulator.iter_steps(args.steps):
+            sys.stdout.buffer.write(payload)
@@ -0,0 +1,169 @@
+import math
+import random
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Sequence, Tuple
+
+PROBABILITY_TOLERANCE = 1e-6
+
+
+@dataclass(frozen=True)
+class AliasTable:
+    """
+    Walker/Vose alias table for O(1) sampling from a fixed discrete distribution.
+    """
+    outcomes: Tuple[str, ...]
+    probability: Tuple[float, ...]
+    alias: Tuple[int, ...]
+
+    @classmethod
+    def build(cls, weights: Mapping[str, float]) -> "AliasTable":
+        outcomes = tuple(weights.keys())
+        n = len(outcomes)
+        total = sum(weights.values())
+        scaled = [weight * n / total for weight in weights.values()]
+        probability = [1.0] * n
+        alias = list(range(n))
+
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, g = small.pop(), large.pop()
+            probability[s] = scaled[s]
+            alias[s] = g
+            scaled[g] -= 1.0 - scaled[s]
+            (small if scaled[g] < 1.0 else large).append(g)
+        # Leftovers are 1.0 up to rounding error
+        return cls(outcomes, tuple(probability), tuple(alias))
+
+    def sample(self, rng=random) -> str:
+        """
+        Draw an outcome using a single uniform variate.
+        """
+        u = rng.random() * len(self.outcomes)
+        i = int(u)
+        return self.outcomes[i] if u - i < self.probability[i] else self.outcomes[self.alias[i]]
+
+
+@dataclass(frozen=True)
+class CompiledConfig:
+    """
+    Validated, immutable form of the simulator config dict, built once at startup.
+
+    difficulty holds one tuple per map, indexed by level - 1, with out-of-band
+    overrides already applied.
+    """
+    map_names: Tuple[str, ...]
+    map_index: Mapping[str, int]
+    difficulty: Tuple[Tuple[float, ...], ...]
+    difficulty_by_map: Mapping[str, Tuple[float, ...]]
+    num_players: int
+    player_id_offset: int
+    skill_level_range: Tuple[float, float]
+    base_event_count: float
+    event_variance: float
+    server_state_transition_prob: float
+    server_transitions: Mapping[str, AliasTable]
+
+
+def _validate_distribution(name: str, weights: Mapping[str, float], known_states: Sequence[str]):
+    if not weights:
+        raise ValueError(f"server_state_transitions for {name} is empty")
+    for state, weight in weights.items():
+        if state not in known_states:
+            raise ValueError(
+                f"Unknown server state {state!r} in server_state_transitions for {name}"
+            )
+        if not isinstance(weight, (int, float)) or weight < 0:
+            raise ValueError(f"Invalid transition probability {weight!r} from {name} to {state}")
+    total = sum(weights.values())
+    if not math.isclose(total, 1.0, abs_tol=PROBABILITY_TOLERANCE):
+        raise ValueError(f"server_state_transitions for {name} sum to {total}, expected 1")
+
+
+def compile_config(
+    config: Dict[str, Any],
+    server_states: Sequence[str],
+    difficulty_arrays: Mapping[str, List[float]],
+) -> CompiledConfig:
+    """
+    Validate the simulator config and precompute the tables used by the hot loop.
+
+    server_states are the ServerState names; difficulty_arrays maps each map name to
+    its generated difficulty array. Raises ValueError on any configuration error.
+    """
+    player_init = config.get('player_init')
+    if player_init is None:
+        raise ValueError("player_init configuration is missing")
+    num_players = player_init.get('num_players')
+    if num_players is None:
+        raise ValueError("num_players is missing in player_init configuration")
+    skill_level_range = player_init.get('skill_level_range')
+    if skill_level_range is None:
+        raise ValueError(
+            "skill_level_range is missing in player_init configuration, e.g. [0.1, 0.9]"
+        )
+    if len(skill_level_range) != 2 or min(skill_level_range) <= 0:
+        raise ValueError(f"skill_level_range must be two positive numbers, got {skill_level_range}")
+
+    if not difficulty_arrays:
+        raise ValueError("maps configuration is missing or empty")
+    map_names = tuple(difficulty_arrays.keys())
+    difficulty = []
+    for name in map_names:
+        levels = list(difficulty_arrays[name])
+        if not levels:
+            raise ValueError(f"Map {name} has no levels")
+        difficulty.append(levels)
+
+    out_of_band_difficulty = config.get('out_of_band_difficulty', {})
+    for key, value in out_of_band_difficulty.items():
+        name, sep, level = key.rpartition('_level_')
+        if not sep or name not in difficulty_arrays or not level.isdigit() \
+                or not 1 <= int(level) <= len(difficulty_arrays[name]):
+            raise ValueError(f"out_of_band_difficulty key {key!r} does not name a map level")
+        difficulty[map_names.index(name)][int(level) - 1] = value
+    difficulty = tuple(tuple(levels) for levels in difficulty)
+
+    server_ids = [server_config.get('server_id') for server_config in config.get('servers', [])]
+    if len(set(server_ids)) != len(server_ids):
+        raise ValueError("server_id values in servers must be unique")
+    for server_config in config.get('servers', []):
+        initial_state = server_config.get('initial_state', 'OFFLINE')
+        if initial_state not in server_states:
+            server_id = server_config.get('server_id')
+            raise ValueError(f"Unknown initial_state {initial_state!r} for server {server_id}")
+        max_players = server_config.get('max_players', 100)
+        if not isinstance(max_players, int) or max_players < 0:
+            raise ValueError(
+                f"max_players must be a non-negative integer for server "
+                f"{server_config.get('server_id')}, got {max_players!r}"
+            )
+
+    transition_prob = config.get('server_state_transition_prob')
+    if transition_prob is None or not 0 <= transition_prob <= 1:
+        raise ValueError(f"server_state_transition_prob must be in [0, 1], got {transition_prob!r}")
+    transitions = config.get('server_state_transitions', {})
+    for name in transitions:
+        if name not in server_states:
+            raise ValueError(f"Unknown server state {name!r} in server_state_transitions")
+    server_transitions = {}
+    for name in server_states:
+        if name not in transitions:
+            raise ValueError(f"server_state_transitions is missing an entry for {name}")
+        _validate_distribution(name, transitions[name], server_states)
+        server_transitions[name] = AliasTable.build(transitions[name])
+
+    return CompiledConfig(
+        map_names=map_names,
+        map_index=MappingProxyType({name: m for m, name in enumerate(map_names)}),
+        difficulty=difficulty,
+        difficulty_by_map=MappingProxyType(dict(zip(map_names, difficulty))),
+        num_players=num_players,
+        player_id_offset=player_init.get('id_offset', 0),
+        skill_level_range=tuple(skill_level_range),
+        base_event_count=config.get('base_event_count', 10),
+        event_variance=config.get('event_variance', 0.3),
+        server_state_transition_prob=transition_prob,
+        server_transitions=MappingProxyType(server_transitions),
+    )
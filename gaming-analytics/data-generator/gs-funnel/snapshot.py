@@ -0,0 +1,53 @@
+import json
+import struct
+from array import array
+from typing import Any, Dict, Tuple
+
+MAGIC = b"GSSNAP01"
+_LENGTH = struct.Struct("<Q")
+
+
+def write_snapshot(path: str, header: Dict[str, Any], columns: Dict[str, array]) -> None:
+    """
+    Write a snapshot file: magic, a JSON header, then each column's raw bytes.
+
+    Columns are array.array (or anything with typecode and tobytes, such as a
+    NumPy-backed array converted with array(typecode, ndarray.tobytes())).
+    The header records each column's typecode and length so it can be read
+    back with a single frombytes per column.
+    """
+    layout = [[name, column.typecode, len(column)] for name, column in columns.items()]
+    header_bytes = json.dumps(dict(header, columns=layout)).encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(_LENGTH.pack(len(header_bytes)))
+        f.write(header_bytes)
+        for column in columns.values():
+            f.write(column.tobytes())
+
+
+def read_snapshot(path: str) -> Tuple[Dict[str, Any], Dict[str, array]]:
+    """
+    Read a snapshot file written by write_snapshot, returning (header, columns).
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a simulator snapshot")
+    offset = len(MAGIC)
+    (header_length,) = _LENGTH.unpack_from(data, offset)
+    offset += _LENGTH.size
+    header = json.loads(data[offset:offset + header_length])
+    offset += header_length
+
+    view = memoryview(data)
+    columns = {}
+    for name, typecode, length in header.pop("columns"):
+        column = array(typecode)
+        size = column.itemsize * length
+        column.frombytes(view[offset:offset + size])
+        offset += size
+        columns[name] = column
+    if offset != len(data):
+        raise ValueError(f"{path} has {len(data) - offset} trailing bytes, snapshot is corrupt")
+    return header, columns
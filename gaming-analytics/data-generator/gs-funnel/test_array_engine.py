@@ -0,0 +1,54 @@
+import copy
+import re
+from collections import Counter, defaultdict
+
+import pytest
+
+from main import EXAMPLE_SIM_CONFIG, GameEventSimulator
+
+PLAYER_EVENTS = {
+    'player_login': 'L', 'player_start_game': 'S', 'player_progression': 'P', 'player_death': 'D',
+}
+
+
+def run(backend, num_players, steps, seed):
+    config = copy.deepcopy(EXAMPLE_SIM_CONFIG)
+    config['backend'] = backend
+    config['player_init']['num_players'] = num_players
+    config['base_event_count'] = num_players
+    simulator = GameEventSimulator(config, seed=seed)
+    return [event for _ in range(steps) for event in simulator.run_step()]
+
+
+@pytest.mark.parametrize('backend', ['python', 'numpy'])
+def test_players_follow_the_state_machine(backend):
+    sequences = defaultdict(str)
+    levels = {}
+    for event in run(backend, 300, 40, seed=3):
+        code = PLAYER_EVENTS.get(event['event_type'])
+        if code is None:
+            continue
+        player = event['player_id']
+        sequences[player] += code
+        if code == 'S':
+            levels[player] = event['level']
+        elif code == 'P':
+            # Progression starts from the level the player is on and only a success moves it
+            assert event['current_level'] == levels[player]
+            if event['success']:
+                assert event['new_level'] == event['current_level'] + 1
+                levels[player] = event['new_level']
+    # Login, start a game, progress any number of times, die; then again after the cooldown
+    assert all(re.fullmatch(r'(LSP*D)*(L|LSP*)?', sequence) for sequence in sequences.values())
+
+
+def test_backends_emit_the_same_event_mix():
+    shares = {}
+    for backend in ('python', 'numpy'):
+        counts = Counter(event['event_type'] for event in run(backend, 2000, 30, seed=1))
+        total = sum(counts.values())
+        shares[backend] = (total, {event: count / total for event, count in counts.items()})
+    (python_total, python_shares), (numpy_total, numpy_shares) = shares['python'], shares['numpy']
+    assert numpy_total == pytest.approx(python_total, rel=0.02)
+    for event_type in PLAYER_EVENTS:
+        assert numpy_shares[event_type] == pytest.approx(python_shares[event_type], abs=0.01)
@@ -0,0 +1,41 @@
+import random
+from array import array
+from enum import Enum, auto
+
+import pytest
+
+from population import NO_MAP, Population, uniform_column
+
+
+class State(Enum):
+    LOGGED_IN = auto()
+    IN_GAME = auto()
+    IDLE = auto()
+    OFFLINE = auto()
+
+
+def test_uniform_column_matches_per_player_draws():
+    bulk, single = random.Random(7), random.Random(7)
+    column = uniform_column(bulk, 1000, 0.1, 0.9)
+    assert column.tolist() == [single.uniform(0.1, 0.9) for _ in range(1000)]
+    assert bulk.getstate() == single.getstate()
+
+
+def test_player_view_reads_and_writes_columns():
+    population = Population(array('d', [0.5, 0.7]), State, ["Forest", "Mountain"], id_offset=10)
+    player = population[-1]
+    assert player.player_id == "player_11"
+    assert player.state is State.OFFLINE
+    assert player.current_map is None
+
+    player.current_map = "Mountain"
+    player.current_level = 3
+    assert population.map[1] == 1 and population.level[1] == 3
+    player.current_map = None
+    assert population.map[1] == NO_MAP
+
+    # The simulator's per-state index keys on these, so the view can't change them
+    with pytest.raises(AttributeError):
+        player.state = State.IN_GAME
+    with pytest.raises(AttributeError):
+        player.cooldown = 2.0
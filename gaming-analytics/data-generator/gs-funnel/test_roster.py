@@ -0,0 +1,42 @@
+import copy
+
+from main import EXAMPLE_SIM_CONFIG, GameEventSimulator
+from roster import NO_SERVER, ServerRoster
+
+
+def test_place_fills_and_remove_frees_slots():
+    roster = ServerRoster([2, 1, 3], 5)
+    roster.set_online(0, True)
+    roster.set_online(1, True)
+    placed = [roster.place(player, 0.5) for player in range(4)]
+    # The least loaded server first; the offline one takes nobody
+    assert sorted(placed[:3]) == [0, 0, 1]
+    assert placed[3] == NO_SERVER
+    assert not roster.has_room()
+    assert roster.remove(placed.index(1)) == 1
+    assert roster.has_room()
+    roster.drain(1)
+    assert not roster.has_room()
+
+
+def full_server_simulator(num_players):
+    config = copy.deepcopy(EXAMPLE_SIM_CONFIG)
+    config['backend'] = 'python'
+    config['player_sampling'] = 'active'
+    config['servers'] = [{"server_id": "server_1", "initial_state": "ONLINE", "max_players": 0}]
+    config['player_init']['num_players'] = num_players
+    return GameEventSimulator(config, seed=5)
+
+
+def test_active_sampling_skips_players_waiting_for_a_full_server():
+    simulator = full_server_simulator(50)
+    # No server ever has room, so every draw logs in a new player and none is spent
+    # on players that already logged in and wait for a server
+    events = simulator.run_player_events(30)
+    assert [event['event_type'] for event in events] == ['player_login'] * 30
+    assert len({event['player_id'] for event in events}) == 30
+    assert simulator.count_active() == 20
+
+    events = simulator.run_player_events(30)
+    assert len(events) == 20
+    assert simulator.count_active() == 0
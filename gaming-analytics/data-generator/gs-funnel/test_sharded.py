@@ -0,0 +1,46 @@
+import copy
+import json
+
+from main import EXAMPLE_SIM_CONFIG
+from sharded import ShardedSimulator, derive_seed
+
+
+def sharded_config(num_players):
+    config = copy.deepcopy(EXAMPLE_SIM_CONFIG)
+    config['backend'] = 'python'
+    config['player_init']['num_players'] = num_players
+    config['base_event_count'] = num_players // 2
+    # Both servers up with room for everyone, so the drain in run() moves players
+    for server in config['servers']:
+        server['initial_state'] = "ONLINE"
+        server['max_players'] = num_players
+    config['event_time'] = {"clock": "synthetic", "start": "2024-01-01T00:00:00", "step_ms": 1000}
+    return config
+
+
+def run(seed, num_shards, steps=6):
+    with ShardedSimulator(sharded_config(300), num_shards, seed) as simulator:
+        output = []
+        for step in range(steps):
+            if step == 3:
+                simulator.drain_server("server_1", "server_2")
+            output.append(simulator.run_step())
+    return b"".join(output)
+
+
+def test_same_seed_and_shards_give_identical_output():
+    output = run(seed=42, num_shards=3)
+    assert output == run(seed=42, num_shards=3)
+    assert output != run(seed=43, num_shards=3)
+
+    events = [json.loads(line) for line in output.splitlines()]
+    assert any(event['event_type'] == 'server_migration' for event in events)
+    # Every shard's slice of the players takes part
+    players = {int(event['player_id'].split('_')[1]) for event in events if 'player_id' in event}
+    assert {player * 3 // 300 for player in players} == {0, 1, 2}
+
+
+def test_derived_seeds_are_stable_and_distinct():
+    assert derive_seed(42, "shard-0") == derive_seed(42, "shard-0")
+    seeds = {derive_seed(42, f"shard-{shard}") for shard in range(8)}
+    assert len(seeds | {derive_seed(42, "coordinator")}) == 9
@@ -0,0 +1,53 @@
+import copy
+
+import pytest
+
+from main import EXAMPLE_SIM_CONFIG, GameEventSimulator
+
+
+def simulator(backend, sampling='uniform', seed=None):
+    config = copy.deepcopy(EXAMPLE_SIM_CONFIG)
+    config['backend'] = backend
+    config['player_sampling'] = sampling
+    config['player_init']['num_players'] = 500
+    config['base_event_count'] = 200
+    return GameEventSimulator(config, seed=seed)
+
+
+def run(simulator, steps):
+    return [event for _ in range(steps) for event in simulator.run_step()]
+
+
+@pytest.mark.parametrize('backend, sampling', [
+    ('python', 'uniform'), ('python', 'active'), ('numpy', 'uniform'),
+])
+def test_restore_continues_like_the_snapshot_run(tmp_path, backend, sampling):
+    path = str(tmp_path / 'warm.snapshot')
+    original = simulator(backend, sampling, seed=7)
+    run(original, 10)
+    original.drain_server('server_1', 'server_2')
+    original.snapshot(path)
+    expected = run(original, 10)
+
+    # A different seed, so everything that matches comes from the snapshot
+    restored = simulator(backend, sampling, seed=8)
+    restored.restore(path)
+    assert restored.current_time_step == 10
+    assert run(restored, 10) == expected
+
+
+def test_same_seed_reproduces_a_run():
+    assert run(simulator('python', seed=3), 5) == run(simulator('python', seed=3), 5)
+    assert run(simulator('python', seed=3), 5) != run(simulator('python', seed=4), 5)
+
+
+def test_restore_rejects_another_backend_or_population(tmp_path):
+    path = str(tmp_path / 'warm.snapshot')
+    simulator('python', seed=1).snapshot(path)
+    with pytest.raises(ValueError):
+        simulator('numpy', seed=1).restore(path)
+
+    config = copy.deepcopy(EXAMPLE_SIM_CONFIG)
+    config['backend'] = 'python'
+    with pytest.raises(ValueError):
+        GameEventSimulator(config, seed=1).restore(path)
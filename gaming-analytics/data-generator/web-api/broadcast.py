@@ -0,0 +1,179 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Optional, Set
+
+from pacing import Pacer, RateProfile
+
+SLOW_CLIENT_POLICIES = ("drop", "disconnect", "block")
+
+
+class Subscriber:
+    """
+    One connected client: a bounded queue of encoded chunks, ended by None.
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped_chunks = 0
+        self.ended = False
+        # Set by end(), so a publisher blocked on the full queue gives up
+        self.left = asyncio.Event()
+
+    def end(self) -> None:
+        """
+        Discard anything not yet sent and tell the client's stream to finish.
+        """
+        if self.ended:
+            return
+        self.ended = True
+        self.left.set()
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class Broadcaster:
+    """
+    Single paced event source shared by every /stream_events client.
+
+    One background task encodes the due events into a chunk and puts the same
+    bytes on every subscriber's bounded queue, so generating and encoding cost
+    does not grow with the number of clients. The task runs while anyone is
+    subscribed. Events are coalesced for flush_interval seconds between chunks,
+    each event keeping its own delimiter, so a chunk can be split anywhere on
+    the delimiter and only whole chunks are ever dropped.
+
+    slow_client_policy decides what happens when a client's queue is full:
+    drop skips the chunk for that client, disconnect ends its stream, and block
+    waits for it, which holds back every other client too.
+
+    encode_in_thread runs encode_chunk on a thread of its own instead of the
+    event loop, for a source that may wait, such as a StagedPipeline. Calls
+    never overlap, even across a restart of the background task.
+    """
+
+    def __init__(
+        self,
+        encode_chunk: Callable[[int], bytes],
+        profile: RateProfile,
+        queue_size: int = 64,
+        slow_client_policy: str = "drop",
+        flush_interval: float = 0.05,
+        max_chunk_events: int = 10_000,
+        encode_in_thread: bool = False,
+    ):
+        if slow_client_policy not in SLOW_CLIENT_POLICIES:
+            raise ValueError(f"Unknown slow client policy {slow_client_policy!r}, expected one of {SLOW_CLIENT_POLICIES}")
+        if queue_size <= 0:
+            raise ValueError("queue_size must be positive")
+        self.encode_chunk = encode_chunk
+        self.profile = profile
+        self.queue_size = queue_size
+        self.slow_client_policy = slow_client_policy
+        self.flush_interval = flush_interval
+        self.max_chunk_events = max_chunk_events
+        self.encode_executor = ThreadPoolExecutor(1, thread_name_prefix="broadcast-encode") if encode_in_thread else None
+
+        self.subscribers: Set[Subscriber] = set()
+        self.task: Optional[asyncio.Task] = None
+        self.pacer: Optional[Pacer] = None
+        self.chunks = 0
+        self.events = 0
+        self.dropped_chunks = 0
+        self.disconnected = 0
+
+    def subscribe(self) -> Subscriber:
+        subscriber = Subscriber(self.queue_size)
+        self.subscribers.add(subscriber)
+        if self.task is None or self.task.done():
+            self.pacer = Pacer(self.profile, max_batch=self.max_chunk_events)
+            self.task = asyncio.get_running_loop().create_task(self._run())
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self.subscribers.discard(subscriber)
+        # Releases a block-policy publish waiting for room in this client's queue
+        subscriber.end()
+        if not self.subscribers and self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def _run(self):
+        try:
+            while self.subscribers:
+                count = await self.pacer.next_batch_async()
+                if self.encode_executor is not None:
+                    chunk = await asyncio.get_running_loop().run_in_executor(self.encode_executor, self.encode_chunk, count)
+                else:
+                    chunk = self.encode_chunk(count)
+                self.chunks += 1
+                self.events += count
+                await self._publish(chunk)
+                if count < self.max_chunk_events:
+                    # Let events accumulate into the next chunk unless we are behind
+                    await asyncio.sleep(self.flush_interval)
+        except Exception:
+            logging.exception("Event broadcaster failed, ending all streams")
+            for subscriber in list(self.subscribers):
+                subscriber.end()
+
+    async def _publish(self, chunk: bytes):
+        for subscriber in list(self.subscribers):
+            if subscriber.ended:
+                continue
+            try:
+                subscriber.queue.put_nowait(chunk)
+                continue
+            except asyncio.QueueFull:
+                pass
+            if self.slow_client_policy == "drop":
+                subscriber.dropped_chunks += 1
+                self.dropped_chunks += 1
+            elif self.slow_client_policy == "disconnect":
+                logging.warning("Disconnecting slow /stream_events client")
+                self.disconnected += 1
+                subscriber.end()
+            else:
+                await self._put_until_left(subscriber, chunk)
+
+    async def _put_until_left(self, subscriber: Subscriber, chunk: bytes):
+        """
+        Wait for room in the client's queue, or for the client to leave.
+        """
+        put = asyncio.ensure_future(subscriber.queue.put(chunk))
+        left = asyncio.ensure_future(subscriber.left.wait())
+        try:
+            await asyncio.wait({put, left}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            put.cancel()
+            left.cancel()
+
+    async def stream(self, duration: float = 0) -> AsyncIterator[bytes]:
+        """
+        Yield chunks for one client until it disconnects, or for duration seconds if set.
+        """
+        subscriber = self.subscribe()
+        deadline = None
+        if duration > 0:
+            deadline = asyncio.get_running_loop().call_later(duration, subscriber.end)
+        try:
+            while True:
+                chunk = await subscriber.queue.get()
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            if deadline is not None:
+                deadline.cancel()
+            self.unsubscribe(subscriber)
+
+    def stats(self):
+        return {
+            "subscribers": len(self.subscribers),
+            "chunks": self.chunks,
+            "events": self.events,
+            "dropped_chunks": self.dropped_chunks,
+            "disconnected": self.disconnected,
+            "lag": self.pacer.lag if self.pacer is not None else 0.0,
+        }
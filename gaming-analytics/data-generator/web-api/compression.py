@@ -0,0 +1,144 @@
+import asyncio
+import time
+import zlib
+from typing import AsyncIterator, Optional
+
+# Content codings in order of preference; zstd needs the optional zstandard package
+PREFERENCE = ("zstd", "gzip")
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def available_encodings():
+    return tuple(name for name in PREFERENCE if name != "zstd" or _zstandard() is not None)
+
+
+def negotiate(accept_encoding: Optional[str], allowed=None) -> Optional[str]:
+    """
+    The content coding to use for an Accept-Encoding header: the client's highest
+    q-value among the available ones, ties going to PREFERENCE order. None means
+    send the body as is.
+    """
+    if not accept_encoding:
+        return None
+    allowed = available_encodings() if allowed is None else allowed
+    quality = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        quality[name] = q
+    best, best_q = None, 0.0
+    for name in allowed:
+        q = quality.get(name, quality.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+class Compressor:
+    """
+    Streaming compressor for one response. compress() may hold data back;
+    flush() returns everything so far as a decodable prefix of the stream, and
+    finish() ends it.
+    """
+
+    def __init__(self, encoding: str, level: Optional[int] = None):
+        self.encoding = encoding
+        if encoding == "gzip":
+            # wbits 31: deflate with a gzip header and trailer
+            self.compressor = zlib.compressobj(6 if level is None else level, zlib.DEFLATED, 31)
+            self.sync_flush = zlib.Z_SYNC_FLUSH
+        elif encoding == "zstd":
+            zstandard = _zstandard()
+            if zstandard is None:
+                raise ValueError("zstd compression needs the zstandard package")
+            self.compressor = zstandard.ZstdCompressor(level=3 if level is None else level).compressobj()
+            self.sync_flush = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        else:
+            raise ValueError(f"Unknown content coding {encoding!r}, expected one of {PREFERENCE}")
+
+    def compress(self, data) -> bytes:
+        return self.compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self.compressor.flush(self.sync_flush)
+
+    def finish(self) -> bytes:
+        return self.compressor.flush()
+
+
+def compress(data: bytes, encoding: Optional[str], level: Optional[int] = None) -> bytes:
+    """
+    One-shot compression of a whole body; encoding None returns it unchanged.
+    """
+    if encoding is None:
+        return data
+    compressor = Compressor(encoding, level)
+    return compressor.compress(data) + compressor.finish()
+
+
+async def compressed_stream(
+    chunks: AsyncIterator[bytes],
+    encoding: str,
+    flush_interval: float = 0.05,
+    level: Optional[int] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Compress a stream of chunks for one client. Compressed output is flushed to
+    the client flush_interval seconds after the oldest chunk it holds, so a longer
+    interval trades latency for a better ratio; 0 flushes every chunk. Pending
+    data is flushed on time even if the next chunk is slow to come.
+    """
+    compressor = Compressor(encoding, level)
+    chunks = chunks.__aiter__()
+    pending_since = None
+    next_chunk = asyncio.ensure_future(chunks.__anext__())
+    try:
+        while True:
+            timeout = None
+            if pending_since is not None:
+                timeout = max(pending_since + flush_interval - time.monotonic(), 0.0)
+            done, _ = await asyncio.wait({next_chunk}, timeout=timeout)
+            if not done:
+                yield compressor.flush()
+                pending_since = None
+                continue
+            try:
+                chunk = next_chunk.result()
+            except StopAsyncIteration:
+                break
+            next_chunk = asyncio.ensure_future(chunks.__anext__())
+            data = compressor.compress(chunk)
+            if pending_since is None:
+                pending_since = time.monotonic()
+            if time.monotonic() - pending_since >= flush_interval:
+                data += compressor.flush()
+                pending_since = None
+            if data:
+                yield data
+        yield compressor.finish()
+    finally:
+        # Cancelling a pending read ends the source generator inside it; a finished
+        # read is awaited so its outcome isn't left unretrieved
+        next_chunk.cancel()
+        try:
+            await next_chunk
+        except (asyncio.CancelledError, StopAsyncIteration):
+            pass
+        aclose = getattr(chunks, "aclose", None)
+        if aclose is not None:
+            await aclose()
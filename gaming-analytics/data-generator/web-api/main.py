@@ -1,23 +1,85 @@
-from fastapi import FastAPI
-from fastapi.responses import StreamingResponse
-import random
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 import asyncio
+import os
+import random
+import sys
 from datetime import datetime
-import json
+from pathlib import Path
+from typing import Literal, Optional
+
+# Shared generator modules live in data-generator/common, and the simulator in gs-funnel
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "gs-funnel"))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "common"))
+from encoders import (
+    KEYED_EVENT, PLAYER_EVENT, PURCHASE_EVENT, SERVER_METRIC, BatchBuffer, TimestampCache, text_table,
+)
+from corpus import open_replay
+from event_stream import create_simulator, encode_topic_chunk, topic_chunks
+from pacing import parse_profile
+from pipeline import StagedPipeline
+from broadcast import Broadcaster
+from compression import available_encodings, compress, compressed_stream, negotiate
+from metrics import CONTENT_TYPE, REGISTRY, SamplingProfiler
+from workload import load_workload
 
 app = FastAPI()
 
+# Offered load per stream, events per second or a profile (see pacing.parse_profile)
+STREAM_RATE = os.environ.get("STREAM_RATE", "100")
+# How long each /stream_events connection runs, in seconds; 0 streams until the client leaves
+STREAM_DURATION = float(os.environ.get("STREAM_DURATION", 600))
+# Chunks buffered per client, and what to do when a client falls that far behind
+STREAM_QUEUE_CHUNKS = int(os.environ.get("STREAM_QUEUE_CHUNKS", 64))
+SLOW_CLIENT_POLICY = os.environ.get("SLOW_CLIENT_POLICY", "drop")
+# Time events are coalesced into one chunk
+STREAM_FLUSH_MS = int(os.environ.get("STREAM_FLUSH_MS", 50))
+# Replay a pre-built corpus file instead of generating events, optionally stamped with the send time
+STREAM_CORPUS = os.environ.get("STREAM_CORPUS")
+STREAM_REWRITE_TIMESTAMPS = os.environ.get("STREAM_REWRITE_TIMESTAMPS", "") == "1"
+# Stream the gs-funnel simulator's events instead: "simulator" runs it on a thread of its own,
+# ahead of ENCODE_WORKERS encoders by at most PIPELINE_CHUNKS chunks of SIM_CHUNK_SIZE player draws
+STREAM_SOURCE = os.environ.get("STREAM_SOURCE", "generators")
+SIM_PLAYERS = int(os.environ.get("SIM_PLAYERS", 10_000))
+SIM_SEED = int(os.environ["SIM_SEED"]) if os.environ.get("SIM_SEED") else None
+SIM_CHUNK_SIZE = int(os.environ.get("SIM_CHUNK_SIZE", 1000))
+ENCODE_WORKERS = int(os.environ.get("ENCODE_WORKERS", 2))
+ENCODE_EXECUTOR = os.environ.get("ENCODE_EXECUTOR", "thread")
+PIPELINE_CHUNKS = int(os.environ.get("PIPELINE_CHUNKS", 16))
+# Serve /debug/profile?seconds=N, a sampling profile of the server
+PROFILING = os.environ.get("PROFILING", "") == "1"
+# Players, items, servers, transaction ids and the event mix (see workload.load_workload)
+WORKLOAD_PROFILE = os.environ.get("WORKLOAD_PROFILE")
+# Most events one ?count=N request can ask for
+MAX_BULK_EVENTS = int(os.environ.get("MAX_BULK_EVENTS", 100_000))
+# Content codings offered to clients that accept them, in order of preference; empty to never compress
+COMPRESSION = os.environ.get("COMPRESSION", "zstd,gzip")
+# Compressed streams are flushed to the client this often; a longer interval compresses better
+STREAM_COMPRESS_FLUSH_MS = int(os.environ.get("STREAM_COMPRESS_FLUSH_MS", STREAM_FLUSH_MS))
+
+# Runtime metrics, served on /metrics
+STREAM_EVENTS = REGISTRY.counter("stream_events_generated", "Events generated for /stream_events")
+STREAM_CHUNK_SECONDS = REGISTRY.histogram("stream_chunk_encode_seconds", "Time to produce one chunk")
+STREAM_CHUNK_EVENTS = REGISTRY.histogram(
+    "stream_chunk_events", "Events per chunk", buckets=(1, 10, 100, 1_000, 10_000, 100_000),
+)
+STREAM_SUBSCRIBERS = REGISTRY.gauge("stream_subscribers", "Connected /stream_events clients")
+STREAM_DROPPED_CHUNKS = REGISTRY.counter("stream_dropped_chunks", "Chunks dropped for slow clients")
+STREAM_DISCONNECTED = REGISTRY.counter("stream_disconnected_clients", "Slow clients disconnected")
+STREAM_QUEUE_DEPTH = REGISTRY.gauge("stream_max_queue_depth", "Most chunks queued for any one client")
+STREAM_LAG = REGISTRY.gauge("stream_schedule_lag_seconds", "How far the stream is behind its pacing schedule")
+BULK_EVENTS = REGISTRY.counter("bulk_events_generated", "Events generated for ?count=N requests", ["endpoint"])
+
+workload = load_workload(WORKLOAD_PROFILE)
+
 # Sample data templates
-player_ids = [f"player_{i}" for i in range(1, 100)]
-items = ["sword", "shield", "potion", "armor", "skin_dragon", "skin_phoenix"]
 maps = ["map_01", "map_02", "map_03"]
 levels = ["level_01", "level_02", "level_03"]
-servers = ["server_1", "server_2", "server_3"]
 platforms = ["PC", "Console"]
 
 # Function to generate player event
 def generate_player_event():
-    player_id = random.choice(player_ids)
+    player_id = workload.players.draw()
     return {
         "key": player_id,
         "event": {
@@ -39,8 +101,8 @@ def generate_player_event():
 
 # Function to generate purchase event
 def generate_purchase_event():
-    transaction_id = f"trans_{random.randint(1000, 9999)}"
-    player_id = random.choice(player_ids)
+    transaction_id = f"trans_{workload.transaction_ids.next()}"
+    player_id = workload.players.draw()
     return {
         "key": transaction_id,
         "event": {
@@ -50,7 +112,7 @@ def generate_purchase_event():
                 "transaction_type": "purchase",
                 "currency": "USD",
                 "amount": round(random.uniform(0.99, 29.99), 2),
-                "item_id": random.choice(items),
+                "item_id": workload.items.draw(),
                 "item_type": "skin"
             },
             "event_timestamp": datetime.utcnow().isoformat(),
@@ -63,7 +125,7 @@ def generate_purchase_event():
 
 # Function to generate server metric event
 def generate_server_metric():
-    server_id = random.choice(servers)
+    server_id = workload.servers.draw()
     return {
         "key": server_id,
         "event": {
@@ -82,42 +144,237 @@ def generate_server_metric():
         }
     }
 
-# Async generator for streaming events
-async def event_stream():
-    start_time = datetime.now()
-    event_types = [generate_player_event, generate_purchase_event, generate_server_metric]
-    
-    while (datetime.now() - start_time).seconds < 600:  # Run for up to 10 minutes
-        # Randomly pick an event type and generate an event
-        event_func = random.choice(event_types)
-        event_data = event_func()
-        
-        # Format event data as JSON and append a newline
-        event_json = json.dumps(event_data) + "\n\n"
-        
-        # Yield the event as bytes
-        yield event_json.encode("utf-8")
-        
-        # Wait 0.01 seconds to achieve 100 events per second
-        await asyncio.sleep(0.01)
-
-# Streaming endpoint
+# The sample data pre-encoded for the byte-level encoders below
+map_bytes = text_table(maps)
+level_bytes = text_table(levels)
+platform_bytes = text_table(platforms)
+player_event_type_bytes = text_table(["move", "interaction", "level_complete"])
+timestamps = TimestampCache()
+
+# Encode player, purchase and server metric events straight to JSON bytes.
+# They make the same random draws as the generate_* functions and produce the
+# same bytes as json.dumps(event_data), without building the event dicts.
+def encode_player_event():
+    player_id = workload.players.draw_bytes()
+    event = PLAYER_EVENT.format % (
+        player_id,
+        b"session_%d" % random.randint(1000, 9999),
+        random.choice(player_event_type_bytes),
+        random.choice(level_bytes),
+        random.choice(map_bytes),
+        timestamps.now(),
+        player_id,
+        random.choice(platform_bytes),
+    )
+    return KEYED_EVENT.format % (player_id, event)
+
+def encode_purchase_event():
+    transaction_id = b"trans_%d" % workload.transaction_ids.next()
+    player_id = workload.players.draw_bytes()
+    event = PURCHASE_EVENT.format % (
+        transaction_id,
+        round(random.uniform(0.99, 29.99), 2),
+        workload.items.draw_bytes(),
+        timestamps.now(),
+        player_id,
+        random.choice(platform_bytes),
+    )
+    return KEYED_EVENT.format % (transaction_id, event)
+
+def encode_server_metric():
+    server_id = workload.servers.draw_bytes()
+    event = SERVER_METRIC.format % (
+        server_id,
+        random.randint(20, 100),
+        random.randint(30, 90),
+        random.randint(50, 300),
+        timestamps.now(),
+    )
+    return KEYED_EVENT.format % (server_id, event)
+
+event_types = {
+    "player-events": encode_player_event,
+    "purchase-events": encode_purchase_event,
+    "server-metrics": encode_server_metric,
+}
+# Events are written back to back into one reusable buffer, each followed by the delimiter
+chunk_buffer = BatchBuffer(delimiter=b"\n\n")
+
+# Encode count events, of types drawn with the workload's mix, as one chunk of bytes
+def encode_chunk(count):
+    chunk_buffer.clear()
+    choose_topic = workload.choose_topic
+    for _ in range(count):
+        chunk_buffer.append(event_types[choose_topic()]())
+    return bytes(chunk_buffer.getbuffer())
+
+# Corpus replay hands out slices of the mapped file, with no encoding at all
+replay = open_replay(STREAM_CORPUS, STREAM_REWRITE_TIMESTAMPS)
+
+# Simulator events, simulated, encoded and handed to the broadcaster in overlapping stages
+if STREAM_SOURCE not in ("generators", "simulator"):
+    raise ValueError(f"Unknown STREAM_SOURCE {STREAM_SOURCE!r}, expected generators or simulator")
+pipeline = None
+if replay is None and STREAM_SOURCE == "simulator":
+    pipeline = StagedPipeline(
+        topic_chunks(create_simulator(SIM_PLAYERS, SIM_SEED), SIM_CHUNK_SIZE),
+        encode_topic_chunk,
+        ENCODE_WORKERS,
+        PIPELINE_CHUNKS,
+        ENCODE_EXECUTOR,
+        name="web-api",
+    )
+
+def pipeline_chunk(count):
+    return b"".join(pipeline.take(count))
+
+# One paced source shared by all stream clients, so the cost of generating events
+# doesn't grow with the number of connections
+if replay is not None:
+    chunk_source = replay.next_chunk
+elif pipeline is not None:
+    chunk_source = pipeline_chunk
+else:
+    chunk_source = encode_chunk
+
+# Produce one chunk, recording its size and how long it took
+def timed_chunk(count):
+    with STREAM_CHUNK_SECONDS.time():
+        chunk = chunk_source(count)
+    STREAM_EVENTS.inc(count)
+    STREAM_CHUNK_EVENTS.observe(count)
+    return chunk
+
+broadcaster = Broadcaster(
+    timed_chunk,
+    parse_profile(STREAM_RATE),
+    queue_size=STREAM_QUEUE_CHUNKS,
+    slow_client_policy=SLOW_CLIENT_POLICY,
+    flush_interval=STREAM_FLUSH_MS / 1000,
+    # The pipeline may have to wait for the simulator
+    encode_in_thread=pipeline is not None,
+)
+
+# Gauges and counters read the broadcaster when scraped
+STREAM_SUBSCRIBERS.set_function(lambda: broadcaster.stats()["subscribers"])
+STREAM_DROPPED_CHUNKS.set_function(lambda: broadcaster.stats()["dropped_chunks"])
+STREAM_DISCONNECTED.set_function(lambda: broadcaster.stats()["disconnected"])
+STREAM_QUEUE_DEPTH.set_function(
+    lambda: max((subscriber.queue.qsize() for subscriber in broadcaster.subscribers), default=0)
+)
+STREAM_LAG.set_function(lambda: broadcaster.stats()["lag"])
+
+profiler = SamplingProfiler() if PROFILING else None
+
+@app.get("/metrics")
+async def metrics():
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+# Sampling profile in the collapsed stack format, for flame graph tools
+@app.get("/debug/profile")
+async def debug_profile(seconds: float = 10.0):
+    if profiler is None:
+        return PlainTextResponse("Profiling is disabled, set PROFILING=1\n", status_code=404)
+    profiler.start()
+    await asyncio.sleep(seconds)
+    return PlainTextResponse(profiler.stop())
+
+NDJSON = "application/x-ndjson"
+SSE = "text/event-stream"
+ENCODINGS = tuple(name for name in available_encodings() if name in COMPRESSION.split(","))
+
+def content_coding(request: Request) -> Optional[str]:
+    return negotiate(request.headers.get("accept-encoding"), ENCODINGS)
+
+def coding_headers(encoding: Optional[str]):
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return headers
+
+# Stream chunks hold records each followed by a blank line, as the HTTP source
+# connector splits them. NDJSON drops the blank lines; SSE makes each record a data event.
+def to_ndjson(chunk):
+    return bytes(chunk).replace(b"\n\n", b"\n")
+
+def to_sse(chunk):
+    if not chunk:
+        return b""
+    return b"data: " + bytes(chunk)[:-2].replace(b"\n\n", b"\n\ndata: ") + b"\n\n"
+
+STREAM_FORMATS = {
+    "delimited": (None, NDJSON),
+    "ndjson": (to_ndjson, NDJSON),
+    "sse": (to_sse, SSE),
+}
+
+async def reformatted(chunks, transform):
+    try:
+        async for chunk in chunks:
+            yield transform(chunk)
+    finally:
+        await chunks.aclose()
+
+# Streaming endpoint. format picks the framing, defaulting to SSE for clients
+# that accept only text/event-stream; the body is compressed if the client accepts it.
 @app.get("/stream_events")
-async def stream_events():
-    return StreamingResponse(event_stream(), media_type="application/json")
+async def stream_events(
+    request: Request,
+    output: Optional[Literal["delimited", "ndjson", "sse"]] = Query(None, alias="format"),
+):
+    if output is None:
+        output = "sse" if request.headers.get("accept", "").startswith(SSE) else "delimited"
+    transform, media_type = STREAM_FORMATS[output]
+    chunks = broadcaster.stream(STREAM_DURATION)
+    if transform is not None:
+        chunks = reformatted(chunks, transform)
+    encoding = content_coding(request)
+    if encoding is not None:
+        chunks = compressed_stream(chunks, encoding, STREAM_COMPRESS_FLUSH_MS / 1000)
+    headers = coding_headers(encoding)
+    if output == "sse":
+        headers["Cache-Control"] = "no-cache"
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
+
+# count events encoded in one pass, as NDJSON or a JSON array of {"key", "event"} objects
+def bulk_response(request: Request, endpoint: str, encode, count: int, output: str):
+    BULK_EVENTS.labels(endpoint).inc(count)
+    records = [encode() for _ in range(count)]
+    if output == "json":
+        body, media_type = b"[" + b", ".join(records) + b"]", "application/json"
+    else:
+        records.append(b"")
+        body, media_type = b"\n".join(records), NDJSON
+    encoding = content_coding(request)
+    return Response(compress(body, encoding), media_type=media_type, headers=coding_headers(encoding))
+
+BulkCount = Query(None, ge=1, le=MAX_BULK_EVENTS, description="events to return, as NDJSON or a JSON array")
+BulkFormat = Query("ndjson", alias="format")
 
-# Separate endpoints for single events
+# Separate endpoints for single events, or count of them in one response
 @app.get("/player_event")
-async def player_event():
+async def player_event(
+    request: Request, count: Optional[int] = BulkCount, output: Literal["ndjson", "json"] = BulkFormat,
+):
+    if count is not None:
+        return bulk_response(request, "player_event", encode_player_event, count, output)
     event = generate_player_event()
     return {"key": event["key"], "event": event["event"]}
 
 @app.get("/purchase_event")
-async def purchase_event():
+async def purchase_event(
+    request: Request, count: Optional[int] = BulkCount, output: Literal["ndjson", "json"] = BulkFormat,
+):
+    if count is not None:
+        return bulk_response(request, "purchase_event", encode_purchase_event, count, output)
     event = generate_purchase_event()
     return {"key": event["key"], "event": event["event"]}
 
 @app.get("/server_metric")
-async def server_metric():
+async def server_metric(
+    request: Request, count: Optional[int] = BulkCount, output: Literal["ndjson", "json"] = BulkFormat,
+):
+    if count is not None:
+        return bulk_response(request, "server_metric", encode_server_metric, count, output)
     event = generate_server_metric()
     return {"key": event["key"], "event": event["event"]}
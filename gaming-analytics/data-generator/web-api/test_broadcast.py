@@ -0,0 +1,30 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "common"))
+from broadcast import Broadcaster  # noqa: E402
+from pacing import ConstantRate  # noqa: E402
+
+
+def test_block_policy_client_leaving_while_blocked():
+    async def run():
+        broadcaster = Broadcaster(
+            lambda count: b"x" * count, ConstantRate(10_000), queue_size=1,
+            slow_client_policy="block", flush_interval=0.001,
+        )
+        slow = broadcaster.stream()
+        fast = broadcaster.stream()
+        await slow.__anext__()
+        await fast.__anext__()
+        # The slow client stops reading, and the broadcaster blocks on its full queue
+        await asyncio.sleep(0.05)
+        await slow.aclose()
+        received = 0
+        for _ in range(5):
+            await asyncio.wait_for(fast.__anext__(), timeout=1)
+            received += 1
+        await fast.aclose()
+        return received
+
+    assert asyncio.run(run()) == 5
@@ -0,0 +1,44 @@
+import importlib.util
+import json
+import sys
+from pathlib import Path
+
+from starlette.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "common"))
+from corpus import write_corpus  # noqa: E402
+
+
+def load_app(monkeypatch, **env):
+    # main.py reads its settings when imported, so each test loads a fresh copy
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    spec = importlib.util.spec_from_file_location(
+        "web_api_main", Path(__file__).resolve().parent / "main.py"
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_stream_rewritten_corpus_uncompressed(tmp_path, monkeypatch):
+    path = str(tmp_path / "stream.corpus")
+    write_corpus(path, (
+        ("player", b"player_%d" % i,
+         json.dumps({"n": i, "event_timestamp": "2020-01-01T00:00:00.000000"}).encode("utf-8"))
+        for i in range(10)
+    ))
+    main = load_app(
+        monkeypatch, STREAM_CORPUS=path, STREAM_REWRITE_TIMESTAMPS="1",
+        STREAM_RATE="2000", STREAM_FLUSH_MS="10", STREAM_DURATION="0.3",
+    )
+    with TestClient(main.app) as client:
+        response = client.get("/stream_events", headers={"accept-encoding": "identity"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    lines = response.content.split(b"\n\n")[:-1]
+    assert len(lines) > 10
+    events = [json.loads(line) for line in lines]
+    assert [event["event"]["n"] for event in events[:12]] == list(range(10)) + [0, 1]
+    assert all(event["event"]["event_timestamp"] > "2020" for event in events)
+    main.replay.corpus.close()
@@ -0,0 +1,120 @@
+import argparse
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Shared generator modules live in data-generator/common
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "common"))
+from corpus import Corpus  # noqa: E402
+from schema import SchemaCheck, load_schema  # noqa: E402
+from sinks import create_sink  # noqa: E402
+from windows import SERVICES, WindowEngine  # noqa: E402
+
+
+def corpus_batches(path: str, batch_size: int) -> Iterator[Tuple[str, List[bytes]]]:
+    """
+    Yield (topic, values) batches from a corpus file, in file order per topic.
+    """
+    with Corpus(path) as corpus:
+        for start in range(0, len(corpus), batch_size):
+            # Copied, so no view of the mapping outlives the corpus
+            records = [(topic, bytes(value)) for topic, _, value in corpus.records(start, batch_size)]
+            batches: Dict[str, List[bytes]] = {}
+            for topic, value in records:
+                batches.setdefault(topic, []).append(value)
+            yield from batches.items()
+
+
+def ndjson_batches(directory: str, batch_size: int) -> Iterator[Tuple[str, List[bytes]]]:
+    """
+    Yield (topic, values) batches from the <topic>.ndjson files a file sink writes.
+    """
+    for service in SERVICES:
+        path = os.path.join(directory, f"{service.source}.ndjson")
+        if not os.path.exists(path):
+            logging.warning(f"No {path}, skipping {service.name}")
+            continue
+        with open(path, "rb") as f:
+            batch = []
+            for line in f:
+                batch.append(line.rstrip(b"\n"))
+                if len(batch) == batch_size:
+                    yield service.source, batch
+                    batch = []
+            if batch:
+                yield service.source, batch
+
+
+def run(engine: WindowEngine, batches, sink, schema_check: Optional[SchemaCheck] = None) -> int:
+    """
+    Feed batches through engine and send each closed window to its sink topic,
+    checking it against the topic's type first if schema_check is given.
+    """
+    producers = {}
+
+    def emit(results):
+        for result in results:
+            service = result.service
+            if schema_check is not None:
+                schema_check.check(service.sink, result.rows)
+            if service.sink not in producers:
+                producers[service.sink] = sink.topic_producer(service.sink)
+            producers[service.sink].send(b"", result.encode())
+            logging.info(
+                f"{service.name} window {result.start_ms}-{result.end_ms}: {len(result.rows)} keys"
+                f"{' (closed early)' if result.forced else ''}"
+            )
+
+    events = 0
+    for topic, values in batches:
+        events += len(values)
+        emit(engine.process(topic, values))
+    emit(engine.finish())
+    for producer in producers.values():
+        producer.flush()
+    return events
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=os.environ.get('PY_LOG', 'INFO').upper()
+    )
+
+    parser = argparse.ArgumentParser(
+        description="Run the sdf/dataflow.yaml window services locally over recorded events"
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--corpus", help="corpus file written with --mode build-corpus")
+    source.add_argument("--input", help="directory of <topic>.ndjson files written by a file: sink")
+    parser.add_argument("--sink", default="null",
+                        help="where summaries go, e.g. file:summaries (see common/sinks.py)")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--lateness-ms", type=int, default=0, help="how far the watermark trails the newest event")
+    parser.add_argument("--max-open-windows", type=int, default=16)
+    parser.add_argument("--validate", action="store_true",
+                        help="check every summary against the types in the dataflow definition; needs PyYAML")
+    parser.add_argument("--dataflow", help="dataflow definition for --validate, by default sdf/dataflow.yaml")
+    args = parser.parse_args()
+
+    engine = WindowEngine(lateness_ms=args.lateness_ms, max_open_windows=args.max_open_windows)
+    if args.corpus:
+        batches = corpus_batches(args.corpus, args.batch_size)
+    else:
+        batches = ndjson_batches(args.input, args.batch_size)
+
+    schema_check = SchemaCheck(load_schema(args.dataflow)) if args.validate else None
+    sink = create_sink(args.sink)
+    try:
+        start = time.perf_counter()
+        events = run(engine, batches, sink, schema_check)
+        elapsed = time.perf_counter() - start
+    finally:
+        sink.close()
+    logging.info(f"Processed {events} events in {elapsed:.2f}s, {events / elapsed:,.0f} events/s")
+    for name, stats in engine.stats().items():
+        logging.info(f"{name}: {stats}")
+    if schema_check is not None:
+        logging.info(f"Summaries not matching the dataflow types: {schema_check.failures}")